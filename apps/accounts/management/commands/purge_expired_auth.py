@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from schedoserver.authentication import DEFAULT_BATCH_SIZE, purge_expired_sessions, purge_expired_tokens
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete API tokens older than TOKEN_TTL and expired sessions in bounded batches, reporting rows removed '
+        'per second. Meant to run periodically (e.g. daily from cron) instead of clearsessions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows deleted per statement.')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to sleep between batches, to leave room for other writes.')
+
+    def handle(self, *args, **options):
+        for label, purge in (('expired tokens', purge_expired_tokens), ('expired sessions', purge_expired_sessions)):
+            started = time.perf_counter()
+            deleted = purge(batch_size=options['batch_size'], pause=options['pause'])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f'Deleted {deleted:,} {label} in {elapsed:.2f}s ({deleted / elapsed if elapsed else 0:,.0f} rows/s)'
+            ))
@@ -51,6 +51,7 @@ class Profile(models.Model):
     bio = models.TextField(blank=True, null=True)  # Short biography or description of the user
     profile_picture = models.TextField(blank=True, null=True)  # URL/path for the user's profile picture (optional)
     location = models.CharField(max_length=100, blank=True, null=True)  # User's location or address
+    updated_at = models.DateTimeField(auto_now=True)  # Date and time when the profile was last updated
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
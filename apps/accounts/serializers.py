@@ -31,4 +31,5 @@ class ProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = Profile
         # Exclude the `user` field since it will be provided in the view, not by the user.
-        exclude = ['user']
+        # `updated_at` only validates cached copies (see get_profile).
+        exclude = ['user', 'updated_at']
@@ -1,3 +1,163 @@
-from django.test import TestCase
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from schedoserver.authentication import purge_expired_sessions, purge_expired_tokens
+from schedoserver.throttling import IPThrottle, RegistrationEventEmailThrottle, SlidingWindowThrottle
+from .models import User
+
+RATES = {'login_ip': '100/min', 'login_failure': '3/hour', 'signup_ip': '10/hour'}
+EVENT_RATES = {'registration_event_email': '2/hour'}
+
+
+@override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': RATES})
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(email='owner@example.com', password='correct-horse')
+
+    def login(self, password, ip='198.51.100.1'):
+        return self.client.post('/accounts/login/', {'email': 'owner@example.com', 'password': password},
+                                REMOTE_ADDR=ip)
+
+    def test_failed_logins_lock_out_only_the_client_that_failed(self):
+        for _ in range(3):
+            self.assertEqual(self.login('wrong', ip='203.0.113.66').status_code, 401)
+        self.assertEqual(self.login('correct-horse', ip='203.0.113.66').status_code, 429)
+        # The owner, on another connection, still gets in
+        self.assertEqual(self.login('correct-horse').status_code, 200)
+
+    def test_successful_logins_do_not_count(self):
+        for _ in range(5):
+            self.assertEqual(self.login('correct-horse').status_code, 200)
+        self.assertEqual(self.login('wrong').status_code, 401)
+
+
+class ThrottleCountTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_refused_requests_are_not_counted(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='203.0.113.7')
+        throttle = type('TestIPThrottle', (IPThrottle,), {'scope': 'test'})()
+        throttle.limit, throttle.window, throttle.timer = 2, 3600, lambda: 1800.0
+        self.assertEqual([throttle.allow_request(request, None) for _ in range(5)], [True, True, False, False, False])
+        current_key = throttle._windows(throttle.get_key(request, None))[0]
+        self.assertEqual(cache.get(current_key), 2)
+
+
+class ThrottleKeyTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def request(self, ip='203.0.113.7', forwarded_for=None, **data):
+        extra = {'HTTP_X_FORWARDED_FOR': forwarded_for} if forwarded_for else {}
+        request = RequestFactory().post('/', REMOTE_ADDR=ip, **extra)
+        request.data = data
+        return request
+
+    def test_forwarded_for_is_ignored_without_configured_proxies(self):
+        throttle = IPThrottle()
+        self.assertEqual(throttle.get_key(self.request(forwarded_for='198.51.100.1'), None), '203.0.113.7')
+        self.assertEqual(throttle.get_key(self.request(forwarded_for='198.51.100.2'), None), '203.0.113.7')
+
+    @override_settings(REST_FRAMEWORK={'NUM_PROXIES': 1})
+    def test_forwarded_for_names_the_client_behind_configured_proxies(self):
+        request = self.request(ip='10.0.0.2', forwarded_for='198.51.100.1, 10.0.0.1')
+        self.assertEqual(IPThrottle().get_key(request, None), '10.0.0.1')
+
+    @override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': EVENT_RATES})
+    def test_registrations_are_limited_per_event_and_email(self):
+        throttle = RegistrationEventEmailThrottle()
+
+        def allowed(event, email='ama@example.com'):
+            return throttle.allow_request(self.request(event=event, email=email), None)
+
+        self.assertEqual([allowed('1') for _ in range(3)], [True, True, False])
+        # Other events and other registrants keep their own limits
+        self.assertTrue(allowed('2'))
+        self.assertTrue(allowed('1', email='kofi@example.com'))
+        self.assertFalse(allowed('1', email=' AMA@example.com'))
+
+
+class TokenTestMixin:
+    def setUp(self):
+        patcher = mock.patch.object(SlidingWindowThrottle, 'allow_request', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(email='owner@example.com', password='correct-horse')
+
+    def login(self):
+        response = self.client_class().post('/accounts/login/', {'email': 'owner@example.com',
+                                                                 'password': 'correct-horse'})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['token']
+
+    def issued(self, user, seconds_ago):
+        token = Token.objects.create(user=user)
+        Token.objects.filter(pk=token.pk).update(created=timezone.now() - timedelta(seconds=seconds_ago))
+        return token.key
+
+
+@override_settings(TOKEN_TTL=3600)
+class TokenExpiryTests(TokenTestMixin, TestCase):
+    def get(self, key):
+        return self.client.get('/events/user/', HTTP_AUTHORIZATION=f'Token {key}')
+
+    def test_an_expired_token_is_refused_and_login_replaces_it(self):
+        expired = self.issued(self.user, 7200)
+        self.assertEqual(self.get(expired).status_code, 401)
+        key = self.login()
+        self.assertNotEqual(key, expired)
+        self.assertFalse(Token.objects.filter(key=expired).exists())
+        self.assertEqual(self.get(key).status_code, 200)
+
+    def test_login_keeps_a_live_token(self):
+        live = self.issued(self.user, 60)
+        self.assertEqual(self.login(), live)
+
+    def test_purging_keeps_live_tokens_and_sessions(self):
+        now = timezone.now()
+        users = [User.objects.create_user(email=f'user{number}@example.com') for number in range(5)]
+        live = {self.issued(user, 60) for user in users[:2]}
+        for user in users[2:]:
+            self.issued(user, 7200)
+        for number in range(5):
+            Session.objects.create(session_key=f'session{number}', session_data='',
+                                   expire_date=now + timedelta(days=1 if number < 2 else -1))
+
+        self.assertEqual(purge_expired_tokens(batch_size=2), 3)
+        self.assertEqual(set(Token.objects.values_list('key', flat=True)), live)
+        self.assertEqual(purge_expired_sessions(batch_size=2), 3)
+        self.assertEqual(set(Session.objects.values_list('session_key', flat=True)), {'session0', 'session1'})
+        out = StringIO()
+        call_command('purge_expired_auth', stdout=out)
+        self.assertIn('Deleted 0 expired tokens', out.getvalue())
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'SQLite serializes all writes')
+@override_settings(TOKEN_TTL=3600)
+class ConcurrentLoginTests(TokenTestMixin, TransactionTestCase):
+    def test_concurrent_logins_replace_an_expired_token_once(self):
+        expired = self.issued(self.user, 7200)
+
+        def login(_):
+            try:
+                return self.login()
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            keys = set(pool.map(login, range(8)))
+        self.assertEqual(keys, set(Token.objects.values_list('key', flat=True)))
+        self.assertNotIn(expired, keys)
@@ -1,18 +1,21 @@
-from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny
 from .serializers import UserSerializer, ProfileSerializer
 from django.contrib.auth import authenticate
 from rest_framework.permissions import IsAuthenticated
 from django.views.decorators.csrf import csrf_exempt
-from rest_framework.authentication import TokenAuthentication
+from schedoserver.authentication import ExpiringTokenAuthentication, issue_token
 from .models import Profile
+from apps.events import dashboard
+from schedoserver.conditional import conditional
+from schedoserver.throttling import LoginFailureThrottle, LoginIPThrottle, SignupIPThrottle
 
 @api_view(['POST'])
 @authentication_classes([])  # No authentication required for signup
 @permission_classes([AllowAny])  # Allow all users to access this view
+@throttle_classes([SignupIPThrottle])
 def signup(request):
     """
     Create a new user account using the provided details.
@@ -22,7 +25,7 @@ def signup(request):
     # Validate the incoming data
     if serializer.is_valid():
         user = serializer.save()  # User is created here; password is already hashed
-        token = Token.objects.create(user=user)  # Create token for the new user
+        token = issue_token(user)  # Create token for the new user
         
         # Return success response with token
         return Response(
@@ -47,6 +50,7 @@ def signup(request):
 @api_view(['POST'])
 @authentication_classes([])  # No authentication required for login
 @permission_classes([AllowAny])  # Allow all users to access this view
+@throttle_classes([LoginIPThrottle, LoginFailureThrottle])
 def login(request):
     """
     Authenticate a user and return a token if successful.
@@ -58,8 +62,8 @@ def login(request):
     user = authenticate(username=email, password=password)
 
     if user is not None:
-        # User is authenticated; check if token exists or create a new one
-        token, created = Token.objects.get_or_create(user=user)
+        # User is authenticated; reuse the token unless it has expired
+        token = issue_token(user)
         
         # Serialize user data excluding password
         serializer = UserSerializer(user)
@@ -75,6 +79,9 @@ def login(request):
             status=status.HTTP_200_OK
         )
     else:
+        # Only failed attempts count towards locking this email out from this client
+        LoginFailureThrottle().record_failure(request)
+
         # Return error response for invalid credentials
         return Response(
             {
@@ -87,7 +94,7 @@ def login(request):
 
 @csrf_exempt
 @api_view(['POST'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def logout(request):
     # print(f"Request Headers: {request.headers}")  # Debugging output
@@ -122,7 +129,7 @@ def logout(request):
 
 
 @api_view(['POST'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def create_profile(request):
     """
@@ -135,6 +142,7 @@ def create_profile(request):
     if serializer.is_valid():
         # Save the profile and associate it with the authenticated user
         serializer.save(user=request.user)
+        dashboard.invalidate(request.user.id)
         
         # Return success response
         return Response(
@@ -156,9 +164,15 @@ def create_profile(request):
     )
 
 
+def _profile_state(request):
+    updated_at = Profile.objects.filter(user=request.user).values_list('updated_at', flat=True).first()
+    return None if updated_at is None else (updated_at, 1)
+
+
 @api_view(['GET'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
+@conditional(_profile_state)
 def get_profile(request):
     """
     Retrieve the profile of the authenticated user.
@@ -188,7 +202,7 @@ def get_profile(request):
 
 
 @api_view(['PUT'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def edit_profile(request):
     """
@@ -200,6 +214,7 @@ def edit_profile(request):
         
         if serializer.is_valid():
             serializer.save()
+            dashboard.invalidate(request.user.id)
             return Response(
                 {
                     'status': 'success',
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class EventsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.events'
+
+    def ready(self):
+        from schedoserver.idempotency import create_cache_table
+
+        # Event creation and registrations use Idempotency-Key; their key table comes with migrate
+        post_migrate.connect(create_cache_table, sender=self)
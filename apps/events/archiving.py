@@ -0,0 +1,188 @@
+"""
+Moving events between the events table and the archive.
+
+`archive_events` and `restore_archives` are used by the archive/restore views
+and by `archive_past_events`, the periodic job that archives events whose end
+has passed (DEFAULT_GRACE after it, by default). The job walks candidate events
+by id in bounded batches, each in its own transaction, so it can be interrupted
+and rerun at any point: archived events leave the events table and are never
+picked up twice. An advisory lock keeps it to one node at a time.
+
+Registrations, tickets, analytics and broadcasts outlive the event row: they
+keep referring to its former id, which the archive records, and attach again
+when the archive is restored under that id. Only `delete_archives` removes
+them for good.
+"""
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from apps.notifications import services as notifications
+from apps.registrations.models import Attendee, Broadcast, RegistrationRollup
+from schedoserver.locks import advisory_lock
+from . import changes, dashboard, facets
+from .models import Archive, Event
+
+# Fields carried over between Event and Archive
+COPIED_FIELDS = (
+    'title', 'online_link', 'description', 'location', 'category', 'meeting_id', 'start_date', 'end_date',
+    'start_time', 'end_time', 'thumbnail', 'is_public', 'is_online', 'capacity',
+)
+# Accepted end_time formats; events with another format are treated as ending at the end of their end date
+TIME_FORMATS = ('%H:%M', '%H:%M:%S', '%I:%M %p', '%I:%M%p')
+AUTO_ARCHIVE_LOCK = 'events.archive_past_events'
+DEFAULT_BATCH_SIZE = 500
+# How long an event stays active after its end, for late check-ins, analytics and follow-ups
+DEFAULT_GRACE = timedelta(days=7)
+
+
+def _copy(source, model):
+    values = {field: getattr(source, field) for field in COPIED_FIELDS}
+    values['meeting_id'] = values['meeting_id'] or None
+    if model is Archive:
+        values['former_event_id'] = source.id
+    elif source.former_event_id:
+        # Back under its former id, so the registrations kept for it attach again
+        values['id'] = source.former_event_id
+    return model(created_by_id=source.created_by_id, **values)
+
+
+def archive_events(event_ids, message=None):
+    """
+    Move events to the archive in one transaction; their registrations are kept under the former event id.
+
+    :param event_ids: IDs of the events to archive; events that no longer exist are skipped
+    :param message: Notification sent to each event's registrants ('{title}' is filled in), or None
+    :return: A list of (former event id, Archive) pairs
+    """
+    with transaction.atomic():
+        # Locked so a concurrent archive of the same event waits and then finds it gone
+        events = list(Event.objects.select_for_update().filter(id__in=event_ids).order_by('id'))
+        if not events:
+            return []
+        archives = Archive.objects.bulk_create([_copy(event, Archive) for event in events])
+
+        Event.objects.filter(id__in=[event.id for event in events]).delete()
+        facets.record_facet_changes((facets.facet_snapshot(event), {}) for event in events)
+        changes.record_changes((event, event.is_public, True) for event in events)
+        for user_id in {event.created_by_id for event in events}:
+            dashboard.invalidate(user_id)
+        if message:
+            # Registrations keep the former event id, so its registrants are still found
+            for event in events:
+                notifications.fan_out_event_notification(event.id, message.format(title=event.title), keep_event=False)
+    return [(event.id, archive) for event, archive in zip(events, archives)]
+
+
+def restore_archives(archives):
+    """
+    Move archived events back to the events table in one transaction.
+
+    :param archives: Archive instances
+    :return: The new Event instances, in the same order
+    """
+    archives = list(archives)
+    former_ids = [archive.former_event_id for archive in archives if archive.former_event_id]
+    # Seats are not archived; the confirmed registrations that were kept tell how many are taken
+    seats = dict(
+        Attendee.objects.filter(event_id__in=former_ids, status='confirmed').values('event_id')
+        .annotate(taken=Count('id')).values_list('event_id', 'taken')
+    )
+    with transaction.atomic():
+        events = [_copy(archive, Event) for archive in archives]
+        for event in events:
+            event.seats_taken = seats.get(event.id, 0)
+        events = Event.objects.bulk_create(events)
+        facets.record_facet_changes(({}, facets.facet_snapshot(event)) for event in events)
+        changes.record_changes((event, False, False) for event in events)
+        Archive.objects.filter(id__in=[archive.id for archive in archives]).delete()
+        for user_id in {archive.created_by_id for archive in archives}:
+            dashboard.invalidate(user_id)
+    return events
+
+
+def delete_archives(archives):
+    """
+    Delete archived events for good, together with the registrations, analytics and broadcasts kept for them.
+
+    :param archives: Archive instances
+    """
+    archives = list(archives)
+    former_ids = [archive.former_event_id for archive in archives if archive.former_event_id]
+    with transaction.atomic():
+        # Tickets and broadcast deliveries go with the attendees and broadcasts
+        Attendee.objects.filter(event_id__in=former_ids).delete()
+        Broadcast.objects.filter(event_id__in=former_ids).delete()
+        RegistrationRollup.objects.filter(event_id__in=former_ids).delete()
+        Archive.objects.filter(id__in=[archive.id for archive in archives]).delete()
+
+
+def event_end(end_date, end_time):
+    """
+    Parse an event's stored end date and time.
+
+    :return: An aware datetime in the current time zone, or None when the date is not YYYY-MM-DD
+    """
+    try:
+        day = date.fromisoformat(end_date.strip())
+    except (AttributeError, ValueError):
+        return None
+    for time_format in TIME_FORMATS:
+        try:
+            moment = datetime.strptime((end_time or '').strip(), time_format).time()
+            break
+        except ValueError:
+            continue
+    else:
+        moment = dt_time.max
+    return timezone.make_aware(datetime.combine(day, moment))
+
+
+def archive_past_events(batch_size=DEFAULT_BATCH_SIZE, grace=DEFAULT_GRACE, now=None, max_batches=None, message=None,
+                        pause=0, on_batch=None):
+    """
+    Archive every event whose end has passed, in batches of `batch_size` candidates.
+
+    :param batch_size: Candidate events examined (and at most archived) per transaction
+    :param grace: How long an event stays active after its end
+    :param now: The current time (for tests and backfills)
+    :param max_batches: Stop after this many batches; a later run continues where this one left off
+    :param message: Notification sent to registrants of archived events, or None
+    :param pause: Seconds to sleep between batches, to spread the load of a large backlog
+    :param on_batch: Optional callback receiving (batches, examined, archived, seconds) after each batch
+    :return: The number of events archived, or None when another node holds the job lock
+    """
+    cutoff = (now or timezone.now()) - grace
+    # Dates are stored as YYYY-MM-DD text, so a string comparison narrows the candidates
+    last_day = timezone.localtime(cutoff).date().isoformat()
+
+    with advisory_lock(AUTO_ARCHIVE_LOCK) as acquired:
+        if not acquired:
+            return None
+        started = time.perf_counter()
+        last_id = batches = examined = archived = 0
+        while max_batches is None or batches < max_batches:
+            candidates = list(
+                Event.objects.filter(id__gt=last_id, end_date__lte=last_day).order_by('id').values_list(
+                    'id', 'end_date', 'end_time'
+                )[:batch_size]
+            )
+            if not candidates:
+                break
+            last_id = candidates[-1][0]
+            due = [
+                event_id for event_id, end_date, end_time in candidates
+                if (end := event_end(end_date, end_time)) is not None and end <= cutoff
+            ]
+            if due:
+                archived += len(archive_events(due, message=message))
+            batches += 1
+            examined += len(candidates)
+            if on_batch:
+                on_batch(batches, examined, archived, time.perf_counter() - started)
+            if pause:
+                time.sleep(pause)
+        return archived
@@ -0,0 +1,167 @@
+"""
+Delta sync of event lists.
+
+Every change to an event appends a row to the EventChange log: created,
+updated and restored events (which come back under a new id) as changes,
+archived events as removals. Clients keep an opaque cursor and ask for what
+happened after it, so a sync costs O(changes) instead of re-downloading the
+whole catalog. A response carries the current state of each changed event
+that is still visible, a tombstone (the id) for each one that is not, and the
+cursor for the next call.
+
+Log ids are handed out before the writing transaction commits, so a reader
+can see id 11 while id 10 is still in flight. The cursor therefore never moves
+past entries younger than SETTLE_SECONDS; those are returned but sent again on
+the next call, and clients apply changes idempotently.
+
+Changes to seats_taken are not logged: live counts come from the event and
+dashboard endpoints. Deleting an archive (delete_event) logs nothing, since its
+event was already removed when it was archived.
+
+Entries older than EVENT_CHANGES_RETENTION_DAYS are pruned by
+`prune_event_changes`, together with entries superseded by a later change to
+the same event; cursors older than the retention get `reset`, telling the
+client to reload the full list and carry on from the returned cursor.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Event, EventChange
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 1000
+# Longest a transaction writing the log is expected to stay open
+SETTLE_SECONDS = 10
+
+
+def record_changes(changes):
+    """
+    Log changes to events.
+
+    :param changes: Iterable of (event, was_public, removed) tuples
+    """
+    EventChange.objects.bulk_create([
+        EventChange(event_id=event.id, created_by_id=event.created_by_id, is_public=was_public or event.is_public,
+                    removed=removed)
+        for event, was_public, removed in changes
+    ])
+
+
+def record_change(event, was_public=False, removed=False):
+    """
+    Log a change to one event.
+
+    :param event: The event after the change
+    :param was_public: Whether the event was in the public catalog before the change
+    :param removed: Whether the event left the events table
+    """
+    record_changes([(event, was_public, removed)])
+
+
+def make_cursor(position, now):
+    return f'{position}.{int(now.timestamp())}'
+
+
+def parse_cursor(cursor, now):
+    """
+    Read a cursor returned by `sync`.
+
+    :return: The log position after which to continue, or None when the cursor has expired
+    :raises ValueError: If the cursor is malformed
+    """
+    try:
+        position, issued = (int(part) for part in cursor.split('.'))
+    except (AttributeError, ValueError):
+        raise ValueError('Invalid cursor')
+    if issued < now.timestamp() - settings.EVENT_CHANGES_RETENTION_DAYS * 86400:
+        return None
+    return position
+
+
+def _settled_head(now):
+    position = EventChange.objects.filter(
+        changed_at__lte=now - timedelta(seconds=SETTLE_SECONDS)
+    ).order_by('-id').values_list('id', flat=True).first()
+    return position or 0
+
+
+def sync(log_filter, event_filter, cursor=None, limit=DEFAULT_LIMIT, now=None):
+    """
+    Collect the changes to a list of events after a cursor.
+
+    :param log_filter: EventChange lookups selecting the list (e.g. {'is_public': True})
+    :param event_filter: Event lookups for the events currently on the list
+    :param cursor: The cursor of the previous sync, or None to start
+    :param limit: Maximum number of log entries read
+    :param now: The current time (for tests)
+    :return: A dict with the changed 'events', the 'removed' event ids, the next 'cursor', 'has_more'
+             (call again right away) and 'reset' (reload the full list first)
+    """
+    now = now or timezone.now()
+    position = None if cursor is None else parse_cursor(cursor, now)
+    if position is None:
+        # Taken before the client reloads the list, so changes made meanwhile are replayed
+        return {'events': [], 'removed': [], 'cursor': make_cursor(_settled_head(now), now), 'has_more': False,
+                'reset': True}
+
+    limit = max(1, min(limit, MAX_LIMIT))
+    entries = list(
+        EventChange.objects.filter(id__gt=position, **log_filter).order_by('id').values_list(
+            'id', 'event_id', 'changed_at'
+        )[:limit]
+    )
+    has_more = len(entries) == limit
+    settled_before = now - timedelta(seconds=SETTLE_SECONDS)
+    next_position = position
+    for entry_id, _, changed_at in entries:
+        if changed_at > settled_before:
+            # Earlier ids may still be in flight: stop here and resend the rest next time
+            has_more = False
+            break
+        next_position = entry_id
+
+    event_ids = {event_id for _, event_id, _ in entries}
+    events = list(Event.objects.filter(id__in=event_ids, **event_filter).order_by('id'))
+    current = {event.id for event in events}
+    return {
+        'events': events,
+        'removed': sorted(event_ids - current),
+        'cursor': make_cursor(next_position, now),
+        'has_more': has_more,
+        'reset': False,
+    }
+
+
+def prune(retention_days=None, batch_size=DEFAULT_LIMIT, now=None):
+    """
+    Delete expired and superseded log entries in batches.
+
+    An entry is superseded by a later entry for the same event that reaches at least the same lists, so
+    every cursor before it still sees the event's latest state.
+
+    :param retention_days: Days entries are kept (defaults to EVENT_CHANGES_RETENTION_DAYS)
+    :param batch_size: Entries deleted per statement
+    :param now: The current time (for tests)
+    :return: A (expired, superseded) tuple of deleted entry counts
+    """
+    now = now or timezone.now()
+    if retention_days is None:
+        retention_days = settings.EVENT_CHANGES_RETENTION_DAYS
+
+    expired = 0
+    old = EventChange.objects.filter(changed_at__lt=now - timedelta(days=retention_days))
+    while ids := list(old.order_by('id').values_list('id', flat=True)[:batch_size]):
+        expired += EventChange.objects.filter(id__in=ids).delete()[0]
+
+    later = EventChange.objects.filter(event_id=OuterRef('event_id'), id__gt=OuterRef('id')).filter(
+        Q(is_public=True) | Q(is_public=OuterRef('is_public'))
+    )
+    candidates = EventChange.objects.filter(changed_at__lte=now - timedelta(seconds=SETTLE_SECONDS))
+    superseded = last_id = 0
+    while batch := list(candidates.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]):
+        last_id = batch[-1]
+        superseded += EventChange.objects.filter(id__in=batch).filter(Exists(later)).delete()[0]
+    return expired, superseded
@@ -1,26 +1,33 @@
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
+import functools
 import re
 import os
 
-from dotenv import load_dotenv
+from schedoserver.metrics import track_outbound
 
-# Load environment variables from .env file
-load_dotenv()
 
-# Configure your Cloudinary credentials here
-cloudinary.config(
-    cloud_name=os.getenv("cloud_name"),
-    api_key=os.getenv("api_key"),
-    api_secret=os.getenv("api_secret")
-)
+@functools.cache
+def _sdk():
+    """Import and configure the Cloudinary SDK on first use, keeping it out of worker startup."""
+    import cloudinary
+    import cloudinary.api
+    import cloudinary.uploader
+
+    # Configure your Cloudinary credentials here
+    cloudinary.config(
+        cloud_name=os.getenv("cloud_name"),
+        api_key=os.getenv("api_key"),
+        api_secret=os.getenv("api_secret")
+    )
+    return cloudinary
+
 
 class CloudinaryService:
     def __init__(self):
         try:
             # Test the Cloudinary configuration to confirm it's valid
-            cloudinary.api.ping()
+            sdk = _sdk()
+            with track_outbound('cloudinary'):
+                sdk.api.ping()
             print("Cloudinary service initialized successfully")
         except Exception as e:
             print(f"Error initializing Cloudinary service: {e}")
@@ -38,11 +45,13 @@ class CloudinaryService:
         """
         try:
             print("Uploading file to Cloudinary...")
-            upload_result = cloudinary.uploader.upload(
-                file_data,
-                public_id=os.path.splitext(file_name)[0],  # Use file name without extension
-                resource_type="image"  # Adjust if uploading non-image files
-            )
+            sdk = _sdk()
+            with track_outbound('cloudinary'):
+                upload_result = sdk.uploader.upload(
+                    file_data,
+                    public_id=os.path.splitext(file_name)[0],  # Use file name without extension
+                    resource_type="image"  # Adjust if uploading non-image files
+                )
             print("File uploaded successfully:", upload_result)
             
             # Returning both public_id (for file management) and URL (for accessing the file)
@@ -73,7 +82,9 @@ class CloudinaryService:
                 print(f"Extracted public ID: {public_id}")
                 
                 # Delete the file using Cloudinary's destroy method
-                cloudinary.uploader.destroy(public_id)
+                sdk = _sdk()
+                with track_outbound('cloudinary'):
+                    sdk.uploader.destroy(public_id)
                 print("File deleted successfully")
                 return True
             else:
@@ -0,0 +1,121 @@
+"""
+The organizer dashboard in one round trip.
+
+`build_dashboard` always runs the same five queries, however many events the
+organizer has. Results are cached per user under a version number; anything
+that changes what the dashboard shows calls `invalidate(user_id)`, which bumps
+the version so the next request rebuilds it (stale entries simply expire).
+
+Versions must be shared by every worker: a bump made in one process would
+not reach the copy another process cached, which would keep serving it for up
+to CACHE_TIMEOUT. So dashboards are only cached with a shared cache
+(REDIS_URL); with a per-process cache every request builds them afresh.
+"""
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from apps.accounts.models import Profile
+from apps.accounts.serializers import ProfileSerializer
+from apps.registrations.models import Attendee, Ticket
+from schedoserver.db_router import read_from_primary
+from .models import Archive, Event
+from .serializers import EventSerializer
+
+CACHE_TIMEOUT = 60 * 10
+RECENT_REGISTRATIONS = 10
+RECENT_ARCHIVES = 5
+
+
+def _cache_shared():
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def _version_key(user_id):
+    return f'dashboard-version:{user_id}'
+
+
+def _bump(user_id):
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        # No version (never set or evicted): the next read starts a fresh one
+        pass
+
+
+def invalidate(user_id):
+    """Make the cached dashboard of a user stale once the current transaction commits."""
+    if _cache_shared():
+        transaction.on_commit(lambda: _bump(user_id))
+
+
+def build_dashboard(user):
+    """
+    Collect everything the organizer dashboard shows.
+
+    :param user: The organizer
+    :return: A dict with the profile, active events with counts, an archive summary and recent registrations
+    """
+    profile = Profile.objects.filter(user=user).first()
+
+    checked_in = Ticket.objects.filter(event=OuterRef('pk'), is_used=True).order_by().values('event').annotate(
+        total=Count('id')
+    ).values('total')
+    events = Event.objects.filter(created_by=user).annotate(
+        number_of_attendees=Count('attendee', filter=Q(attendee__status='confirmed')),
+        number_waitlisted=Count('attendee', filter=Q(attendee__status='waitlisted')),
+        number_checked_in=Coalesce(Subquery(checked_in, output_field=IntegerField()), Value(0)),
+    ).order_by('start_date', 'id')
+    active_events = []
+    for event in events:
+        data = EventSerializer(event).data
+        data['number_of_attendees'] = event.number_of_attendees
+        data['number_waitlisted'] = event.number_waitlisted
+        data['number_checked_in'] = event.number_checked_in
+        active_events.append(data)
+
+    archives = Archive.objects.filter(created_by=user)
+    recent_archives = list(archives.order_by('-id').values('id', 'title', 'start_date', 'end_date')[:RECENT_ARCHIVES])
+
+    recent_registrations = list(
+        Attendee.objects.filter(event__created_by=user).order_by('-registration_date').values(
+            'id', 'first_name', 'last_name', 'email', 'status', 'registration_date', 'event', 'event__title'
+        )[:RECENT_REGISTRATIONS]
+    )
+    for registration in recent_registrations:
+        registration['event_title'] = registration.pop('event__title')
+
+    return {
+        'profile': ProfileSerializer(profile).data if profile else None,
+        'events': active_events,
+        'archives': {
+            'count': archives.count(),
+            'recent': recent_archives,
+        },
+        'recent_registrations': recent_registrations,
+    }
+
+
+def get_dashboard(user):
+    """Return the dashboard of a user from the cache, rebuilding it when its version changed."""
+    if not _cache_shared():
+        return build_dashboard(user)
+    version_key = _version_key(user.pk)
+    version = cache.get(version_key)
+    if version is None:
+        # Start from a unique version so entries cached before an eviction are never served
+        cache.add(version_key, time.time_ns(), None)
+        version = cache.get(version_key)
+    key = f'dashboard:{user.pk}:{version}'
+    dashboard = cache.get(key)
+    if dashboard is None:
+        # A lagging replica would get its stale view cached until the next change
+        with read_from_primary():
+            dashboard = build_dashboard(user)
+        cache.set(key, dashboard, CACHE_TIMEOUT)
+    return dashboard
@@ -0,0 +1,193 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F
+
+from .models import Event, EventFacetCount
+
+# Fields of the public catalog that can be filtered on and counted
+FACET_FIELDS = ('category', 'is_online', 'location')
+
+# Maximum number of values returned per facet
+DEFAULT_FACET_LIMIT = 50
+
+
+def facet_table_enabled():
+    """Return True when facet counts are served from the EventFacetCount table."""
+    return getattr(settings, 'EVENT_FACET_COUNTS_TABLE', False)
+
+
+def parse_facet_filters(params):
+    """
+    Build queryset filters from the facet query parameters of a request.
+
+    :param params: The request query parameters
+    :return: A dict of field lookups for the selected facet values
+    """
+    filters = {}
+    category = params.get('category')
+    if category:
+        filters['category'] = category
+    is_online = params.get('is_online')
+    if is_online is not None and is_online != '':
+        filters['is_online'] = str(is_online).lower() == 'true'
+    location = params.get('location')
+    if location:
+        filters['location'] = location
+    return filters
+
+
+def _facet_key(field, value):
+    # Booleans are stored as 'true'/'false' in the facet table
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def _facet_value(field, key):
+    if field == 'is_online':
+        return key == 'true'
+    return key
+
+
+def _format_counts(counts, limit):
+    """Turn {field: Counter} into the sorted response structure."""
+    facets = {}
+    for field in FACET_FIELDS:
+        values = sorted(counts.get(field, {}).items(), key=lambda item: (-item[1], item[0]))
+        facets[field] = [
+            {'value': _facet_value(field, key), 'count': count}
+            for key, count in values[:limit] if count > 0
+        ]
+    return facets
+
+
+def _grouping_sets_counts(queryset):
+    """Count every facet in one grouped query using GROUPING SETS (PostgreSQL)."""
+    sql, params = queryset.values('category', 'is_online', 'location').query.sql_with_params()
+    query = (
+        'SELECT category, is_online, location, GROUPING(category), GROUPING(is_online), COUNT(*) '
+        'FROM ({}) AS filtered '
+        'GROUP BY GROUPING SETS ((category), (is_online), (location))'
+    ).format(sql)
+    counts = {field: Counter() for field in FACET_FIELDS}
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        for category, is_online, location, no_category, no_online, count in cursor.fetchall():
+            if not no_category:
+                counts['category'][_facet_key('category', category)] += count
+            elif not no_online:
+                counts['is_online'][_facet_key('is_online', is_online)] += count
+            else:
+                counts['location'][_facet_key('location', location)] += count
+    return counts
+
+
+def _combined_group_counts(queryset):
+    """Count every facet in one query grouped on all facet fields, folded per facet."""
+    counts = {field: Counter() for field in FACET_FIELDS}
+    rows = queryset.values(*FACET_FIELDS).annotate(count=Count('id')).order_by()
+    for row in rows:
+        for field in FACET_FIELDS:
+            counts[field][_facet_key(field, row[field])] += row['count']
+    return counts
+
+
+def _count_facets(queryset):
+    if connection.vendor == 'postgresql':
+        return _grouping_sets_counts(queryset)
+    return _combined_group_counts(queryset)
+
+
+def compute_facet_counts(filters=None, limit=DEFAULT_FACET_LIMIT):
+    """
+    Compute facet counts for the public catalog with a single grouped aggregation.
+
+    :param filters: Facet filters to narrow the counted events
+    :param limit: The maximum number of values returned per facet
+    :return: A dict mapping each facet to a list of {'value', 'count'} entries
+    """
+    if not filters and facet_table_enabled():
+        return _format_counts(read_facet_table(), limit)
+
+    queryset = Event.objects.filter(is_public=True, **(filters or {}))
+    return _format_counts(_count_facets(queryset), limit)
+
+
+def read_facet_table():
+    """Load the precomputed facet counts as {field: Counter}."""
+    counts = {field: Counter() for field in FACET_FIELDS}
+    for facet, value, count in EventFacetCount.objects.values_list('facet', 'value', 'count'):
+        if facet in counts:
+            counts[facet][value] = count
+    return counts
+
+
+def facet_snapshot(event):
+    """
+    Capture the facet values an event contributes to the public counts.
+
+    :param event: An Event instance (or None)
+    :return: A dict of facet keys, empty when the event is not public
+    """
+    if event is None or not event.is_public:
+        return {}
+    return {field: _facet_key(field, getattr(event, field)) for field in FACET_FIELDS}
+
+
+def record_facet_change(before, after):
+    """
+    Apply the difference between two facet snapshots to the EventFacetCount table.
+
+    :param before: The snapshot before the change ({} for a newly created event)
+    :param after: The snapshot after the change ({} for an archived event)
+    """
+    record_facet_changes([(before, after)])
+
+
+def record_facet_changes(changes):
+    """
+    Apply the net difference of several (before, after) snapshot pairs in one pass.
+
+    :param changes: An iterable of (before, after) snapshot pairs
+    """
+    if not facet_table_enabled():
+        return
+
+    deltas = Counter()
+    for before, after in changes:
+        for field, key in before.items():
+            deltas[(field, key)] -= 1
+        for field, key in after.items():
+            deltas[(field, key)] += 1
+    deltas = {facet: delta for facet, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        # Make sure every touched facet value has a row, then apply atomic increments
+        EventFacetCount.objects.bulk_create(
+            [EventFacetCount(facet=field, value=key, count=0) for field, key in deltas],
+            ignore_conflicts=True
+        )
+        for (field, key), delta in sorted(deltas.items()):
+            EventFacetCount.objects.filter(facet=field, value=key).update(count=F('count') + delta)
+
+
+def rebuild_facet_table():
+    """
+    Recompute the EventFacetCount table from the Event table.
+
+    :return: The number of facet rows written
+    """
+    counts = _count_facets(Event.objects.filter(is_public=True))
+    rows = [
+        EventFacetCount(facet=field, value=key, count=count)
+        for field in FACET_FIELDS
+        for key, count in counts[field].items()
+    ]
+    with transaction.atomic():
+        EventFacetCount.objects.all().delete()
+        EventFacetCount.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
@@ -0,0 +1,60 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.events import archiving
+from apps.events.models import Event
+
+
+class Command(BaseCommand):
+    help = (
+        'Archive events whose end has passed, in bounded batches with one transaction each. Meant to run '
+        'periodically (e.g. hourly from cron) on every node: an advisory lock lets one node do the work, and '
+        'an interrupted run is simply continued by the next one.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=archiving.DEFAULT_BATCH_SIZE,
+                            help='Candidate events examined per transaction.')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches.')
+        parser.add_argument('--grace-days', type=float, default=archiving.DEFAULT_GRACE / timedelta(days=1),
+                            help='Days an event stays active after its end.')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches.')
+        parser.add_argument('--notify', action='store_true',
+                            help='Notify registrants that the event was archived.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the events that are due.')
+
+    def handle(self, *args, **options):
+        grace = timedelta(days=options['grace_days'])
+        if options['dry_run']:
+            cutoff = timezone.now() - grace
+            candidates = Event.objects.filter(end_date__lte=timezone.localtime(cutoff).date().isoformat())
+            due = sum(
+                1 for end_date, end_time in candidates.values_list('end_date', 'end_time').iterator(chunk_size=5000)
+                if (end := archiving.event_end(end_date, end_time)) is not None and end <= cutoff
+            )
+            self.stdout.write(f'{due:,} events are due for archiving')
+            return
+
+        started = time.perf_counter()
+
+        def report(batches, examined, archived, seconds):
+            self.stdout.write(
+                f'  batch {batches:,}: {examined:,} examined, {archived:,} archived '
+                f'({archived / seconds if seconds else 0:,.0f} events/s)'
+            )
+
+        archived = archiving.archive_past_events(
+            batch_size=options['batch_size'], grace=grace, max_batches=options['max_batches'],
+            message='{title} has ended and was archived.' if options['notify'] else None,
+            pause=options['pause'], on_batch=report,
+        )
+        if archived is None:
+            self.stdout.write('Another node is archiving past events; nothing to do')
+            return
+        seconds = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived:,} past events in {seconds:.2f}s ({archived / seconds:,.0f} events/s)'
+        ))
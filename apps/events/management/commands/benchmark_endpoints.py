@@ -0,0 +1,230 @@
+import io
+import json
+import platform
+import time
+from contextlib import ExitStack, redirect_stdout
+from unittest import mock
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.authtoken.models import Token
+
+from apps.accounts.models import Profile, User
+from apps.events.models import Event
+from apps.registrations.models import Attendee, Ticket
+from schedoserver.throttling import SlidingWindowThrottle
+from schedoserver.middleware import QueryRecorder
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the hot API endpoints against a throwaway test database at several data scales '
+        'and report throughput, p50/p99 latency and query counts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='100,1000,10000',
+                            help='Comma-separated row counts (events per organizer and attendees per event).')
+        parser.add_argument('--iterations', type=int, default=50, help='Measured requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per endpoint.')
+        parser.add_argument('--login-iterations', type=int, default=5,
+                            help='Measured login requests (password hashing is deliberately slow).')
+        parser.add_argument('--output', default='benchmark-results.json', help='Where to write the JSON report.')
+        parser.add_argument('--baseline', help='A previous JSON report to compare against.')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Allowed relative p50 latency regression against the baseline.')
+
+    def handle(self, *args, **options):
+        scales = [int(scale) for scale in options['scales'].split(',') if scale.strip()]
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as handle:
+                baseline = json.load(handle)
+
+        report = {
+            'meta': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+            },
+            'scales': {},
+        }
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with ExitStack() as stack:
+                # Keep the benchmark off Cloudinary and EmailJS
+                stack.enter_context(mock.patch('apps.registrations.views.EmailServices.send_email', return_value=True))
+                stack.enter_context(mock.patch('apps.events.views.CloudinaryService'))
+                # Every request comes from one client; rate limits are not under test
+                stack.enter_context(mock.patch.object(SlidingWindowThrottle, 'allow_request', return_value=True))
+                # Silence the views' debug prints; command output goes through self.stdout
+                stack.enter_context(redirect_stdout(io.StringIO()))
+                for scale in scales:
+                    self.stdout.write(f'Seeding scale {scale}...')
+                    fixture = self.seed(scale)
+                    report['scales'][str(scale)] = self.run_scale(fixture, options)
+                    self.flush()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as handle:
+            json.dump(report, handle, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+        if baseline is not None:
+            regressions = self.compare(baseline, report, options['threshold'])
+            if regressions:
+                raise CommandError('Performance regressions:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def seed(self, scale):
+        """Create one organizer with `scale` events and one event with `scale` registrations."""
+        organizer = User.objects.create(email='organizer@example.com', password=make_password(BENCHMARK_PASSWORD))
+        Profile.objects.create(user=organizer, first_name='Bench', last_name='Organizer')
+        token = Token.objects.create(user=organizer)
+        Event.objects.bulk_create(
+            [
+                Event(
+                    title=f'Event {i}', description='Benchmark event', location='Accra', category='Tech',
+                    start_date='2030-01-01', end_date='2030-01-02', start_time='10:00', end_time='18:00',
+                    thumbnail='https://example.com/thumbnail.png', is_public=i % 2 == 0, created_by=organizer,
+                )
+                for i in range(scale)
+            ],
+            batch_size=1000,
+        )
+        event = Event.objects.filter(created_by=organizer).order_by('id').first()
+        attendees = Attendee.objects.bulk_create(
+            [
+                Attendee(first_name='Bench', last_name=str(i), email=f'attendee{i}@example.com',
+                         phone_number='0000000000', gender='other', event=event)
+                for i in range(scale)
+            ],
+            batch_size=1000,
+        )
+        Ticket.objects.bulk_create(
+            [
+                Ticket(event=event, attendee=attendee, event_title=event.title, first_name=attendee.first_name,
+                       last_name=attendee.last_name, ticket_code=f'BENCH{attendee.id:010d}', created_by=organizer)
+                for attendee in attendees
+            ],
+            batch_size=1000,
+        )
+        return {
+            'token': token.key,
+            'event_id': event.id,
+            'ticket_codes': list(Ticket.objects.filter(event=event).order_by('id').values_list('ticket_code', flat=True)),
+        }
+
+    def flush(self):
+        Ticket.objects.all().delete()
+        Attendee.objects.all().delete()
+        Event.objects.all().delete()
+        Token.objects.all().delete()
+        User.objects.all().delete()
+
+    def run_scale(self, fixture, options):
+        client = Client()
+        auth = {'HTTP_AUTHORIZATION': f"Token {fixture['token']}"}
+        event_id = fixture['event_id']
+        codes = iter(fixture['ticket_codes'])
+        registrations = iter(range(10 ** 9))
+
+        def register():
+            n = next(registrations)
+            return client.post('/registrations/attendee/create/', {
+                'email': f'new{n}@example.com', 'first_name': 'New', 'last_name': str(n),
+                'phone_number': '0000000000', 'gender': 'other', 'event': event_id,
+            })
+
+        # Each endpoint with the status of a successful call; anything else is not a valid sample
+        endpoints = {
+            'get_public_events': (lambda: client.get('/events/public/'), 200),
+            'get_user_events': (lambda: client.get('/events/user/', **auth), 200),
+            'get_event_attendance': (lambda: client.get('/events/attendance/', **auth), 200),
+            'create_attendee': (register, 201),
+            'fetch_attendees': (lambda: client.get(f'/registrations/attendees/{event_id}/', **auth), 200),
+            'fetch_ticket': (lambda: client.get(f"/registrations/ticket/{fixture['ticket_codes'][-1]}/"), 200),
+            'scan_ticket': (lambda: client.get(f'/registrations/ticket/scan/{next(codes)}/', **auth), 200),
+            'login': (lambda: client.post('/accounts/login/', {
+                'email': 'organizer@example.com', 'password': BENCHMARK_PASSWORD,
+            }), 200),
+        }
+
+        results = {}
+        for name, (call, expected_status) in endpoints.items():
+            iterations = options['login_iterations'] if name == 'login' else options['iterations']
+            if name == 'scan_ticket':
+                # Every scan consumes a ticket
+                iterations = min(iterations, len(fixture['ticket_codes']) - options['warmup'] - 1)
+            results[name] = self.measure(name, call, expected_status, iterations, options['warmup'])
+            self.stdout.write(
+                f"  {name:<22} {results[name]['throughput_rps']:>9.1f} req/s  "
+                f"p50 {results[name]['p50_ms']:>8.2f} ms  p99 {results[name]['p99_ms']:>8.2f} ms  "
+                f"{results[name]['queries']} queries"
+            )
+        return results
+
+    def measure(self, name, call, expected_status, iterations, warmup):
+        for _ in range(warmup):
+            self.check_status(name, call(), expected_status)
+        latencies = []
+        queries = []
+        started = time.perf_counter()
+        for _ in range(max(iterations, 1)):
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                request_started = time.perf_counter()
+                response = call()
+                latencies.append(time.perf_counter() - request_started)
+            self.check_status(name, response, expected_status)
+            queries.append(recorder.count)
+        total = time.perf_counter() - started
+        return {
+            'requests': len(latencies),
+            'throughput_rps': len(latencies) / total,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'queries': percentile(queries, 0.50),
+            'response_bytes': len(response.content),
+        }
+
+    def check_status(self, name, response, expected_status):
+        """Stop the run when a call did not succeed, so a 401, 404 or 429 is never timed as a sample."""
+        if response.status_code != expected_status:
+            raise CommandError(
+                f'{name} answered {response.status_code} instead of {expected_status}: {response.content[:200]!r}'
+            )
+
+    def compare(self, baseline, report, threshold):
+        regressions = []
+        for scale, endpoints in report['scales'].items():
+            for name, result in endpoints.items():
+                previous = baseline.get('scales', {}).get(scale, {}).get(name)
+                if previous is None:
+                    continue
+                if result['p50_ms'] > previous['p50_ms'] * (1 + threshold):
+                    regressions.append(
+                        f"{name} @ {scale}: p50 {result['p50_ms']:.2f} ms vs baseline {previous['p50_ms']:.2f} ms"
+                    )
+                if result['queries'] > previous['queries']:
+                    regressions.append(
+                        f"{name} @ {scale}: {result['queries']} queries vs baseline {previous['queries']}"
+                    )
+        return regressions
@@ -0,0 +1,82 @@
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from apps.events.models import Event
+from apps.events.seeding import CATEGORIES, LOCATIONS
+from apps.events.serializers import EventSerializer
+from schedoserver.middleware import CompressionMiddleware
+from schedoserver.renderers import ORJSONRenderer
+
+WORDS = (
+    'join us for an evening of talks demos and networking with local builders designers and founders '
+    'bring your laptop questions and friends doors open early light refreshments will be served'
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure encode time and bytes on the wire of a get_public_events response with many events: '
+        "DRF's JSONRenderer against ORJSONRenderer, then gzip and brotli as sent by CompressionMiddleware. "
+        'Events are built in memory, so no database is needed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=10000, help='Events in the payload.')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per step.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def payload(self, count, rng):
+        start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        events = []
+        for event_id in range(1, count + 1):
+            day = start + timedelta(days=rng.randrange(-180, 180))
+            location = rng.choice(LOCATIONS)
+            events.append(Event(
+                id=event_id, title=f'{rng.choice(CATEGORIES)} {event_id}',
+                description=' '.join(rng.choices(WORDS, k=rng.randrange(10, 40))),
+                thumbnail=f'https://res.cloudinary.com/seed/image/upload/v1/{rng.getrandbits(40):x}.png',
+                start_date=day.strftime('%Y-%m-%d'), end_date=day.strftime('%Y-%m-%d'),
+                start_time=f'{rng.randrange(8, 18):02d}:00', end_time=f'{rng.randrange(18, 23):02d}:00',
+                location=location, category=rng.choice(CATEGORIES), meeting_id='000',
+                is_public=True, is_online=location == 'Online',
+                capacity=rng.choice([None, 50, 100, 500]), seats_taken=rng.randrange(0, 50),
+            ))
+        return {'status': 'success', 'events': EventSerializer(events, many=True).data}
+
+    def time_call(self, call, repeat):
+        durations = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = call()
+            durations.append((time.perf_counter() - started) * 1000)
+        return result, statistics.median(durations)
+
+    def handle(self, *args, **options):
+        data = self.payload(options['events'], random.Random(options['seed']))
+        repeat = options['repeat']
+
+        baseline, baseline_ms = self.time_call(lambda: JSONRenderer().render(data), repeat)
+        body, body_ms = self.time_call(lambda: ORJSONRenderer().render(data), repeat)
+        if body != baseline:
+            raise CommandError('ORJSONRenderer output differs from JSONRenderer')
+
+        self.stdout.write(f"{options['events']:,} events, median of {repeat} runs\n")
+        self.stdout.write(f'{"step":<28}{"ms":>10}{"bytes":>14}{"ratio":>9}')
+        self.stdout.write(f'{"JSONRenderer":<28}{baseline_ms:>10.1f}{len(baseline):>14,}{1:>9.2f}')
+        self.stdout.write(
+            f'{"ORJSONRenderer":<28}{body_ms:>10.1f}{len(body):>14,}{1:>9.2f}'
+            f'   ({baseline_ms / body_ms:.1f}x faster)'
+        )
+        for encoding in CompressionMiddleware.ENCODINGS:
+            compressed, compress_ms = self.time_call(
+                lambda: CompressionMiddleware.compress(body, encoding), repeat
+            )
+            self.stdout.write(
+                f'{"+ " + encoding:<28}{compress_ms:>10.1f}{len(compressed):>14,}'
+                f'{len(compressed) / len(body):>9.2f}'
+            )
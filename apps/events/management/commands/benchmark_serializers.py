@@ -0,0 +1,119 @@
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from apps.accounts.models import User
+from apps.events.models import Archive, Event
+from apps.events.seeding import CATEGORIES, FIRST_NAMES, GENDERS, LAST_NAMES, LOCATIONS
+from apps.events.serializers import (
+    ArchiveSerializer, ArchiveValuesSerializer, EventSerializer, EventValuesSerializer,
+)
+from apps.registrations.models import Attendee, Ticket
+from apps.registrations.serializers import (
+    AttendeeSerializer, AttendeeValuesSerializer, TicketSerializer, TicketValuesSerializer,
+)
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the rows per second of the values-based list serializers and their ModelSerializers on '
+        'generated rows in a throwaway test database (their output is checked by the test suite).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000, help='Rows generated per model.')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per serializer (best is kept).')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def load(self, rows, rng):
+        organizer = User.objects.create(email='organizer@example.com')
+        start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+        def event_fields(number):
+            day = start + timedelta(days=rng.randrange(-180, 180))
+            location = rng.choice(LOCATIONS)
+            return dict(
+                title=f'{rng.choice(CATEGORIES)} {number} — Ünïcode', description='Generated event.',
+                online_link='https://meet.example.com/x' if location == 'Online' else None,
+                thumbnail=rng.choice([None, 'https://res.cloudinary.com/seed/image/upload/v1/seed.png']),
+                start_date=day.strftime('%Y-%m-%d'), end_date=day.strftime('%Y-%m-%d'), start_time='10:00',
+                end_time='18:00', location=location, category=rng.choice(CATEGORIES),
+                meeting_id=rng.choice([None, '000', 'abc-defg-hij']), created_by=organizer,
+                is_public=rng.random() < 0.7, is_online=location == 'Online',
+                capacity=rng.choice([None, 50, 100, 500]),
+            )
+
+        for first in range(0, rows, BATCH_SIZE):
+            count = min(BATCH_SIZE, rows - first)
+            Event.objects.bulk_create([
+                Event(seats_taken=rng.randrange(0, 50), **event_fields(first + index)) for index in range(count)
+            ])
+            Archive.objects.bulk_create([Archive(**event_fields(first + index)) for index in range(count)])
+
+        event_ids = list(Event.objects.values_list('id', flat=True))
+        for first in range(0, rows, BATCH_SIZE):
+            count = min(BATCH_SIZE, rows - first)
+            attendees = Attendee.objects.bulk_create([
+                Attendee(
+                    first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                    email=f'guest{first + index}@example.com', phone_number='0200000000',
+                    gender=rng.choice(GENDERS), event_id=rng.choice(event_ids),
+                    status=rng.choice(['confirmed', 'confirmed', 'waitlisted', 'cancelled']),
+                )
+                for index in range(count)
+            ])
+            Ticket.objects.bulk_create([
+                Ticket(
+                    event_id=attendee.event_id, attendee=attendee, event_title='Event', first_name=attendee.first_name,
+                    last_name=attendee.last_name, ticket_code=f'T{attendee.id:x}', created_by=organizer,
+                    is_used=rng.random() < 0.5,
+                )
+                for attendee in attendees
+            ])
+
+    def best_of(self, call, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = call()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return data, best
+
+    def run(self, options):
+        rows, repeat = options['rows'], options['repeat']
+        self.stdout.write(f'Loading {rows:,} events, archives, attendees and tickets')
+        self.load(rows, random.Random(options['seed']))
+
+        cases = [
+            ('events', EventSerializer, EventValuesSerializer, Event.objects.order_by('id')),
+            ('archives', ArchiveSerializer, ArchiveValuesSerializer, Archive.objects.order_by('id')),
+            # get_user_archives used to serialize archives with EventSerializer
+            ('archives (as events)', EventSerializer, ArchiveValuesSerializer, Archive.objects.order_by('id')),
+            ('attendees', AttendeeSerializer, AttendeeValuesSerializer, Attendee.objects.order_by('id')),
+            ('tickets', TicketSerializer, TicketValuesSerializer, Ticket.objects.order_by('id')),
+        ]
+        self.stdout.write(f'\n{"rows":<22}{"ModelSerializer":>18}{"ValuesSerializer":>18}{"speedup":>10}')
+        for label, model_serializer, values_serializer, queryset in cases:
+            data, model_seconds = self.best_of(lambda: model_serializer(queryset, many=True).data, repeat)
+            _, values_seconds = self.best_of(lambda: values_serializer(queryset).data, repeat)
+            count = len(data)
+            self.stdout.write(
+                f'{label:<22}{count / model_seconds:>14,.0f} r/s{count / values_seconds:>14,.0f} r/s'
+                f'{model_seconds / values_seconds:>9.1f}x'
+            )
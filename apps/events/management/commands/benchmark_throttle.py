@@ -0,0 +1,72 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory
+
+from schedoserver import throttling
+
+
+def benchmark_throttle(throttle_class, limit, window=3600):
+    """Instantiate a throttle under its own scope so benchmark counters never touch real limits."""
+    throttle = type(f'Benchmark{throttle_class.__name__}', (throttle_class,), {'scope': 'benchmark'})()
+    throttle.limit, throttle.window = limit, window
+    return throttle
+
+
+# Throttles of the registration endpoint, checked together on every registration
+REGISTRATION_THROTTLES = (
+    throttling.RegistrationIPThrottle, throttling.RegistrationEventIPThrottle,
+    throttling.RegistrationEventEmailThrottle,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the per-request overhead of the rate limiter against the configured cache, failing when '
+        'the registration endpoint\'s throttles together exceed --budget-ms, and check that a limit holds '
+        'under concurrent requests.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000, help='Throttle checks to time.')
+        parser.add_argument('--budget-ms', type=float, default=0.5,
+                            help='Allowed overhead per registration request, in milliseconds.')
+        parser.add_argument('--limit', type=int, default=100, help='Requests allowed per window in the accuracy check.')
+        parser.add_argument('--concurrency', type=int, default=16, help='Threads in the accuracy check.')
+
+    def handle(self, *args, **options):
+        request = APIRequestFactory().post('/registrations/attendee/create/', REMOTE_ADDR='203.0.113.7')
+        request.data = {'email': 'someone@example.com', 'event': '1'}
+        self.stdout.write(f"Cache backend: {caches['default'].__class__.__name__}")
+
+        total = 0.0
+        for throttle_class in REGISTRATION_THROTTLES:
+            throttle = benchmark_throttle(throttle_class, options['iterations'] * 2)
+            started = time.perf_counter()
+            for _ in range(options['iterations']):
+                throttle.allow_request(request, None)
+            per_request = (time.perf_counter() - started) / options['iterations']
+            total += per_request
+            self.stdout.write(f"{throttle_class.__name__:<32} {per_request * 1e6:>8.1f} us/request")
+            # Each class keys its own counters under the shared benchmark scope
+            caches['default'].delete_many(throttle._windows(throttle.get_key(request, None))[:2])
+        self.stdout.write(f"{'Registration endpoint':<32} {total * 1e6:>8.1f} us/request "
+                          f"(budget {options['budget_ms'] * 1000:.0f} us)")
+        if total * 1000 > options['budget_ms']:
+            raise CommandError(f"Rate limiting takes {total * 1000:.3f} ms per registration, over the "
+                               f"{options['budget_ms']} ms budget")
+
+        # Fire concurrent requests from a fresh client and count how many get through
+        request.META['REMOTE_ADDR'] = '198.51.100.9'
+
+        def attempt(_):
+            return benchmark_throttle(throttling.IPThrottle, options['limit']).allow_request(request, None)
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            allowed = sum(pool.map(attempt, range(options['limit'] * 5)))
+        self.stdout.write(f"Accuracy: {allowed} of {options['limit'] * 5} concurrent requests allowed "
+                          f"with a limit of {options['limit']}")
+        if allowed > options['limit']:
+            raise CommandError('The limit was exceeded under concurrency')
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.events import changes
+
+
+class Command(BaseCommand):
+    help = (
+        'Compact the event change log behind delta sync: delete entries older than the retention and entries '
+        'superseded by a later change to the same event. Meant to run periodically (e.g. daily from cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Days entries are kept (defaults to EVENT_CHANGES_RETENTION_DAYS).')
+        parser.add_argument('--batch-size', type=int, default=changes.DEFAULT_LIMIT,
+                            help='Entries deleted per statement.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        expired, superseded = changes.prune(retention_days=options['days'], batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {expired:,} expired and {superseded:,} superseded change log entries in {elapsed:.2f}s'
+        ))
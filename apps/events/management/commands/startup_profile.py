@@ -0,0 +1,93 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter, so every import is cold like in a newly started worker
+PROBE = '''
+import json, os, time
+started = time.perf_counter()
+import django
+django.setup()
+ready = time.perf_counter()
+from django.test import Client
+response = Client(HTTP_HOST=os.environ["STARTUP_PROFILE_HOST"]).get(os.environ["STARTUP_PROFILE_PATH"])
+responded = time.perf_counter()
+print(json.dumps({
+    "setup": ready - started,
+    "request": responded - ready,
+    "total": time.time() - float(os.environ["STARTUP_PROFILE_T0"]),
+    "status": response.status_code,
+}))
+'''
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+class Command(BaseCommand):
+    help = (
+        'Profile a cold start with the current settings: time to django.setup() (apps ready) and to the first '
+        'response, measured in fresh interpreters, and import time per package and module. Which imports '
+        'stay off the startup path is checked by the test suite.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/', help='URL requested as the first response.')
+        parser.add_argument('--runs', type=int, default=3, help='Cold starts timed (the median is reported).')
+        parser.add_argument('--top', type=int, default=15, help='Packages and modules listed.')
+
+    def probe(self, path, importtime=False):
+        host = next((host for host in settings.ALLOWED_HOSTS if host and '*' not in host and not host.startswith('.')),
+                    'localhost')
+        env = dict(os.environ, STARTUP_PROFILE_HOST=host, STARTUP_PROFILE_PATH=path,
+                   STARTUP_PROFILE_T0=repr(time.time()))
+        command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', PROBE]
+        result = subprocess.run(command, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise CommandError(f'Startup probe failed:\n{result.stderr[-2000:]}')
+        return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+    def handle(self, *args, **options):
+        env_settings = os.environ.get('DJANGO_SETTINGS_MODULE')
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)
+        try:
+            runs = [self.probe(options['path'])[0] for _ in range(max(1, options['runs']))]
+            _, imports = self.probe(options['path'], importtime=True)
+        finally:
+            if env_settings is None:
+                os.environ.pop('DJANGO_SETTINGS_MODULE', None)
+
+        def median(key):
+            return statistics.median(run[key] for run in runs) * 1000
+
+        total = median('total')
+        self.stdout.write(f'Cold start, median of {len(runs)} runs ({settings.SETTINGS_MODULE}, DEBUG={settings.DEBUG})')
+        self.stdout.write(f'  {"interpreter start":<34}{total - median("setup") - median("request"):>9.0f} ms')
+        self.stdout.write(f'  {"django.setup() (apps ready)":<34}{median("setup"):>9.0f} ms')
+        self.stdout.write(f'  {"first request (" + options["path"] + ")":<34}{median("request"):>9.0f} ms'
+                          f'   status {runs[-1]["status"]}')
+        self.stdout.write(f'  {"time to first response":<34}{total:>9.0f} ms')
+
+        packages, modules = Counter(), []
+        for line in imports.splitlines():
+            match = IMPORT_LINE.match(line)
+            if not match:
+                continue
+            own, cumulative, module = int(match[1]), int(match[2]), match[4]
+            parts = module.split('.')
+            # Our own apps are reported one by one
+            packages['.'.join(parts[:2]) if parts[0] == 'apps' else parts[0]] += own
+            modules.append((cumulative, module))
+
+        self.stdout.write(f'\nImport time by package (self time, {sum(packages.values()) / 1000:.0f} ms in total)')
+        for package, micros in packages.most_common(options['top']):
+            self.stdout.write(f'  {package:<40}{micros / 1000:>9.1f} ms')
+        self.stdout.write('\nSlowest imports (cumulative)')
+        for micros, module in sorted(modules, reverse=True)[:options['top']]:
+            self.stdout.write(f'  {module:<40}{micros / 1000:>9.1f} ms')
@@ -21,6 +21,20 @@ class Event(models.Model):
     is_active = models.BooleanField(default=True)  # Indicates if the event is currently active
     is_public = models.BooleanField(default=False)  # Indicates if the event is public
     is_online = models.BooleanField(default=False)  # Indicates if the event is online
+    capacity = models.PositiveIntegerField(null=True, blank=True)  # Maximum number of confirmed attendees (unlimited if empty)
+    seats_taken = models.PositiveIntegerField(default=0)  # Number of confirmed attendees, maintained atomically
+
+    class Meta:
+        indexes = [
+            # Faceted filtering of the public catalog
+            models.Index(fields=['is_public', 'category'], name='event_public_category_idx'),
+            models.Index(fields=['is_public', 'is_online'], name='event_public_online_idx'),
+            models.Index(fields=['is_public', 'location'], name='event_public_location_idx'),
+            # Finding past events to archive
+            models.Index(fields=['end_date'], name='event_end_date_idx'),
+            # Validating cached copies of an organizer's events
+            models.Index(fields=['created_by', 'updated_at'], name='event_owner_updated_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -46,6 +60,56 @@ class Archive(models.Model):
     is_active = models.BooleanField(default=True)  # Indicates if the event is currently active
     is_public = models.BooleanField(default=False)  # Indicates if the event is public
     is_online = models.BooleanField(default=False)  # Indicates if the event is online
+    capacity = models.PositiveIntegerField(null=True, blank=True)  # Maximum number of confirmed attendees (unlimited if empty)
+    former_event_id = models.IntegerField(null=True, blank=True)  # ID the event had, which its registrations still refer to
+
+    class Meta:
+        indexes = [
+            # Validating cached copies of an organizer's archives
+            models.Index(fields=['created_by', 'updated_at'], name='archive_owner_updated_idx'),
+            # Registrations kept for archived events
+            models.Index(fields=['former_event_id'], name='archive_former_event_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+
+# Model class for precomputed facet counts of the public catalog
+class EventFacetCount(models.Model):
+    id = models.AutoField(primary_key=True)  # Unique identifier for the facet count
+    facet = models.CharField(max_length=50)  # Name of the facet (e.g., category, is_online, location)
+    value = models.CharField(max_length=255)  # Facet value the count applies to
+    count = models.IntegerField(default=0)  # Number of public events with this facet value
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['facet', 'value'], name='unique_event_facet_value'),
+        ]
+
+    def __str__(self):
+        return f"{self.facet}={self.value}: {self.count}"
+
+
+# Model class for the change log behind delta sync of event lists
+class EventChange(models.Model):
+    id = models.BigAutoField(primary_key=True)  # Position in the change log, used as the sync cursor
+    event_id = models.IntegerField()  # ID of the changed event (not a foreign key: removed events keep their entries)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)  # Organizer of the changed event
+    is_public = models.BooleanField(default=False)  # Whether the public catalog is affected (public before or after)
+    removed = models.BooleanField(default=False)  # Whether the event left the events table (archived)
+    changed_at = models.DateTimeField(auto_now_add=True)  # Date and time when the change was logged
+
+    class Meta:
+        indexes = [
+            # Reading an organizer's changes or the public catalog's changes after a cursor
+            models.Index(fields=['created_by', 'id'], name='event_change_owner_idx'),
+            models.Index(fields=['is_public', 'id'], name='event_change_public_idx'),
+            # Finding entries superseded by a later change to the same event
+            models.Index(fields=['event_id', 'id'], name='event_change_event_idx'),
+            # Pruning old entries
+            models.Index(fields=['changed_at'], name='event_change_changed_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{'removed' if self.removed else 'changed'} event {self.event_id}"
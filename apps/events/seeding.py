@@ -0,0 +1,316 @@
+"""
+Deterministic synthetic data for reproducing production-scale behavior locally.
+
+Rows are generated as plain tuples with explicit primary keys, so references
+between tables are known up front and no database round trips are needed
+while generating. On PostgreSQL the tuples are streamed with COPY; other
+backends receive batched INSERTs (executemany).
+"""
+import io
+import math
+import random
+import string
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+
+from apps.accounts.models import Profile, User
+from apps.notifications.models import Notification, NotificationCounter
+from apps.registrations.models import Attendee, Ticket
+from .models import Archive, Event
+
+# Timestamps are generated relative to this fixed instant so output only depends on the seed
+BASE_TIME = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+CATEGORIES = ['Workshop', 'Conference', 'Meetup', 'Concert', 'Webinar', 'Sports', 'Festival', 'Seminar']
+LOCATIONS = ['Accra', 'Kumasi', 'Takoradi', 'Tamale', 'Cape Coast', 'Lagos', 'Nairobi', 'Online']
+FIRST_NAMES = ['Ama', 'Kwame', 'Kofi', 'Akosua', 'Yaw', 'Esi', 'Kojo', 'Abena', 'Kwesi', 'Adwoa', 'Fiifi', 'Efua']
+LAST_NAMES = ['Mensah', 'Owusu', 'Boateng', 'Asante', 'Appiah', 'Osei', 'Addo', 'Ofori', 'Agyeman', 'Darko']
+GENDERS = ['male', 'female', 'other']
+TICKET_ALPHABET = string.ascii_letters + string.digits
+
+USER_FIELDS = ('id', 'password', 'last_login', 'is_superuser', 'email', 'is_active', 'is_staff', 'date_joined')
+PROFILE_FIELDS = (
+    'id', 'user_id', 'first_name', 'last_name', 'phone_number', 'bio', 'profile_picture', 'location', 'updated_at',
+)
+EVENT_FIELDS = (
+    'id', 'title', 'online_link', 'description', 'thumbnail', 'start_date', 'end_date', 'start_time', 'end_time',
+    'location', 'category', 'meeting_id', 'created_by_id', 'created_at', 'updated_at', 'is_active', 'is_public',
+    'is_online', 'capacity',
+)
+ATTENDEE_FIELDS = (
+    'id', 'first_name', 'last_name', 'email', 'phone_number', 'gender', 'event_id', 'registration_date', 'status',
+)
+TICKET_FIELDS = (
+    'id', 'event_id', 'attendee_id', 'event_title', 'first_name', 'last_name', 'ticket_code', 'created_by_id',
+    'issued_date', 'is_used', 'used_at',
+)
+NOTIFICATION_FIELDS = ('id', 'user_id', 'message', 'timestamp', 'is_read', 'event_id')
+COUNTER_FIELDS = ('user_id', 'unread')
+
+
+def _columns(model, fields):
+    by_attname = {field.attname: field.column for field in model._meta.concrete_fields}
+    return [by_attname[name] for name in fields]
+
+
+def _copy_value(value):
+    # CSV for COPY: unquoted empty means NULL, so every string is quoted
+    if value is None:
+        return ''
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class TableWriter:
+    """Buffer rows for one table and flush them in batches."""
+
+    def __init__(self, model, fields, batch_size):
+        self.model = model
+        self.fields = fields
+        self.batch_size = batch_size
+        self.table = model._meta.db_table
+        self.columns = _columns(model, fields)
+        self.rows = []
+        self.written = 0
+        self.seconds = 0.0
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        started = time.perf_counter()
+        self.write(self.rows)
+        self.seconds += time.perf_counter() - started
+        self.written += len(self.rows)
+        self.rows = []
+
+    def write(self, rows):
+        raise NotImplementedError
+
+
+class CopyWriter(TableWriter):
+    """Load rows with PostgreSQL COPY ... FROM STDIN."""
+
+    def write(self, rows):
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write(','.join(_copy_value(value) for value in row))
+            buffer.write('\n')
+        buffer.seek(0)
+        quote = connection.ops.quote_name
+        sql = 'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+            quote(self.table), ', '.join(quote(column) for column in self.columns)
+        )
+        with connection.cursor() as cursor:
+            cursor.copy_expert(sql, buffer)
+
+
+class InsertWriter(TableWriter):
+    """Load rows with batched INSERT statements on backends without COPY."""
+
+    def write(self, rows):
+        quote = connection.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(self.table),
+            ', '.join(quote(column) for column in self.columns),
+            ', '.join(['%s'] * len(self.columns)),
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+
+
+class Seeder:
+    """
+    Generate referentially consistent users, profiles, events, archives,
+    attendees, tickets and notifications from a seed.
+
+    :param seed: Seed of the random generator
+    :param organizers: Number of organizer accounts
+    :param events_per_organizer: Mean number of events per organizer (exponentially distributed)
+    :param attendees_per_event: Mean number of registrations per event (log-normally distributed)
+    :param used_ratio: Fraction of tickets already scanned
+    :param archived_ratio: Fraction of events that live in the archive
+    :param public_ratio: Fraction of public events
+    :param members: Number of attendee accounts that can receive notifications
+    :param member_ratio: Fraction of registrations made by members rather than guests
+    :param notifications_per_member: Mean number of notifications per member
+    :param password: Plain password shared by every seeded account
+    :param batch_size: Rows buffered per table before writing
+    """
+
+    def __init__(self, seed=42, organizers=100, events_per_organizer=5, attendees_per_event=100, used_ratio=0.5,
+                 archived_ratio=0.1, public_ratio=0.7, members=1000, member_ratio=0.2, notifications_per_member=3,
+                 password='schedo-seed', batch_size=10000):
+        self.rng = random.Random(seed)
+        self.organizers = organizers
+        self.events_per_organizer = events_per_organizer
+        self.attendees_per_event = attendees_per_event
+        self.used_ratio = used_ratio
+        self.archived_ratio = archived_ratio
+        self.public_ratio = public_ratio
+        self.members = members
+        self.member_ratio = member_ratio
+        self.notifications_per_member = notifications_per_member
+        self.password = password
+        self.batch_size = batch_size
+
+    def _writer(self, model, fields):
+        writer_class = CopyWriter if connection.vendor == 'postgresql' else InsertWriter
+        return writer_class(model, fields, self.batch_size)
+
+    @staticmethod
+    def _next_id(model):
+        return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+    def _lognormal_count(self, mean):
+        if mean <= 0:
+            return 0
+        # sigma=1 gives a long tail of very popular events; mu keeps the requested mean
+        return int(self.rng.lognormvariate(math.log(mean) - 0.5, 1.0))
+
+    def _timestamp(self, days_before=365):
+        return BASE_TIME - timedelta(seconds=self.rng.randrange(days_before * 86400))
+
+    def run(self):
+        """
+        Generate and load every table.
+
+        :return: A dict mapping table names to (rows, seconds) tuples
+        """
+        # Hashing is deliberately slow, so every seeded account shares one hash
+        password_hash = make_password(self.password, salt='schedoseed')
+        rng = self.rng
+
+        users = self._writer(User, USER_FIELDS)
+        profiles = self._writer(Profile, PROFILE_FIELDS)
+        events = self._writer(Event, EVENT_FIELDS + ('seats_taken',))
+        archives = self._writer(Archive, EVENT_FIELDS)
+        attendees = self._writer(Attendee, ATTENDEE_FIELDS)
+        tickets = self._writer(Ticket, TICKET_FIELDS)
+        notifications = self._writer(Notification, NOTIFICATION_FIELDS)
+        counters = self._writer(NotificationCounter, COUNTER_FIELDS)
+        writers = [users, profiles, events, archives, attendees, tickets, notifications, counters]
+
+        user_id = self._next_id(User)
+        profile_id = self._next_id(Profile)
+        event_id = self._next_id(Event)
+        archive_id = self._next_id(Archive)
+        attendee_id = self._next_id(Attendee)
+        ticket_id = self._next_id(Ticket)
+        notification_id = self._next_id(Notification)
+
+        # Organizer and member accounts
+        organizer_ids = []
+        member_ids = []
+        for index in range(self.organizers + self.members):
+            is_organizer = index < self.organizers
+            email = f"{'organizer' if is_organizer else 'member'}{user_id}@seed.schedo.test"
+            joined = self._timestamp(730)
+            users.add((user_id, password_hash, None, False, email, True, False, joined))
+            if is_organizer:
+                organizer_ids.append(user_id)
+                profiles.add((
+                    profile_id, user_id, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+                    f'0{rng.randrange(200000000, 599999999)}', None, None, rng.choice(LOCATIONS), joined,
+                ))
+                profile_id += 1
+            else:
+                member_ids.append(user_id)
+            user_id += 1
+
+        # Events, with registrations and tickets for the active ones
+        live_event_ids = []
+        for organizer_id in organizer_ids:
+            for _ in range(max(1, round(rng.expovariate(1 / self.events_per_organizer)))):
+                start = BASE_TIME + timedelta(days=rng.randrange(-180, 180))
+                end = start + timedelta(days=rng.choice([0, 0, 0, 1, 2]))
+                created_at = self._timestamp(400)
+                title = f'{rng.choice(CATEGORIES)} {event_id}'
+                category = rng.choice(CATEGORIES)
+                location = rng.choice(LOCATIONS)
+                is_online = location == 'Online'
+                row = [
+                    None, title, 'https://meet.example.com/seed' if is_online else None,
+                    'Seeded event description.', 'https://res.cloudinary.com/seed/image/upload/v1/seed.png',
+                    start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'),
+                    f'{rng.randrange(8, 18):02d}:00', f'{rng.randrange(18, 23):02d}:00', location, category, '000',
+                    organizer_id, created_at, created_at, True, rng.random() < self.public_ratio, is_online, None,
+                ]
+                if rng.random() < self.archived_ratio:
+                    row[0] = archive_id
+                    archives.add(tuple(row))
+                    archive_id += 1
+                    continue
+                row[0] = event_id
+                live_event_ids.append(event_id)
+
+                seen_members = set()
+                registrations = self._lognormal_count(self.attendees_per_event)
+                # Every seeded registration is confirmed and holds a seat
+                events.add(tuple(row) + (registrations,))
+                for _ in range(registrations):
+                    first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                    member = rng.choice(member_ids) if member_ids and rng.random() < self.member_ratio else None
+                    if member is not None and member not in seen_members:
+                        seen_members.add(member)
+                        email = f'member{member}@seed.schedo.test'
+                    else:
+                        email = f'guest{attendee_id}@seed.example.com'
+                    registered = created_at + timedelta(seconds=rng.randrange(1, 60 * 86400))
+                    attendees.add((
+                        attendee_id, first_name, last_name, email, f'0{rng.randrange(200000000, 599999999)}',
+                        rng.choice(GENDERS), event_id, registered, 'confirmed',
+                    ))
+                    code = ''.join(rng.choice(TICKET_ALPHABET) for _ in range(4)) + format(ticket_id, 'x')
+                    is_used = rng.random() < self.used_ratio
+                    tickets.add((
+                        ticket_id, event_id, attendee_id, title, first_name, last_name, code, organizer_id,
+                        registered, is_used, max(start, registered) if is_used else None,
+                    ))
+                    attendee_id += 1
+                    ticket_id += 1
+                event_id += 1
+
+        # Notifications and matching unread counters for members
+        for member in member_ids:
+            unread = 0
+            for _ in range(round(rng.expovariate(1 / self.notifications_per_member)) if self.notifications_per_member else 0):
+                is_read = rng.random() < 0.5
+                unread += not is_read
+                linked = rng.choice(live_event_ids) if live_event_ids and rng.random() < 0.8 else None
+                notifications.add((
+                    notification_id, member, 'An event you registered for has been updated.', self._timestamp(90),
+                    is_read, linked,
+                ))
+                notification_id += 1
+            if unread:
+                counters.add((member, unread))
+
+        for writer in writers:
+            writer.flush()
+        self._reset_sequences([User, Profile, Event, Archive, Attendee, Ticket, Notification])
+        return {writer.table: (writer.written, writer.seconds) for writer in writers}
+
+    @staticmethod
+    def _reset_sequences(models):
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
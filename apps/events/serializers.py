@@ -1,5 +1,6 @@
 from .models import Event, Archive
 from rest_framework import serializers
+from schedoserver.serializers import ValuesSerializer
 
 class EventSerializer(serializers.ModelSerializer):
     class Meta:
@@ -18,8 +19,10 @@ class EventSerializer(serializers.ModelSerializer):
             'thumbnail',
             'is_public',
             'is_online',
+            'capacity',
+            'seats_taken',
         ]
-        read_only_fields = ['id']
+        read_only_fields = ['id', 'seats_taken']
 
 class ArchiveSerializer(serializers.ModelSerializer):
     class Meta:
@@ -38,6 +41,15 @@ class ArchiveSerializer(serializers.ModelSerializer):
             'thumbnail',
             'is_public',
             'is_online',
+            'capacity',
         ]
         read_only_fields = ['id']
 
+
+class EventValuesSerializer(ValuesSerializer):
+    """Read-only EventSerializer for lists, built from value rows."""
+    model_serializer = EventSerializer
+
+class ArchiveValuesSerializer(ValuesSerializer):
+    """Read-only ArchiveSerializer for lists, built from value rows."""
+    model_serializer = ArchiveSerializer
@@ -1,3 +1,572 @@
-from django.test import TestCase
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.authtoken.models import Token
+
+from apps.accounts.models import User
+from apps.registrations import capacity, signing
+from apps.registrations.models import Attendee, RegistrationRollup, Ticket
+from schedoserver.db_router import ReplicaRouter
+from schedoserver.middleware import ReplicaRoutingMiddleware
+from schedoserver.renderers import dumps
+from schedoserver.throttling import SlidingWindowThrottle
+from . import archiving, changes, dashboard, facets
+from .models import Archive, Event, EventChange
+from .serializers import ArchiveSerializer, ArchiveValuesSerializer, EventSerializer, EventValuesSerializer
+
+
+def use_shared_cache(test):
+    """Give a test a default cache shared across processes, as Redis is (a file-based one)."""
+    cache_dir = tempfile.TemporaryDirectory()
+    test.addCleanup(cache_dir.cleanup)
+    shared = override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir.name,
+    }})
+    shared.enable()
+    test.addCleanup(shared.disable)
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaPinCacheTests(SimpleTestCase):
+    def test_replicas_with_a_per_process_cache_fail_at_startup(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            with self.assertRaises(ImproperlyConfigured):
+                ReplicaRoutingMiddleware(lambda request: None)
+
+    def test_replicas_with_a_shared_cache_start(self):
+        use_shared_cache(self)
+        ReplicaRoutingMiddleware(lambda request: None)
+
+
+class ArchivingTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create(email='organizer@example.com')
+
+    def event(self, ended_days_ago, title='Workshop'):
+        day = (timezone.localdate() - timedelta(days=ended_days_ago)).isoformat()
+        event = Event.objects.create(
+            title=title, description='Hands-on', location='Accra', category='Tech', start_date=day, end_date=day,
+            start_time='10:00', end_time='18:00', created_by=self.organizer, capacity=10, seats_taken=1,
+        )
+        attendee = Attendee.objects.create(email='guest@example.com', first_name='Ama', last_name='Mensah',
+                                           phone_number='0200000000', gender='female', event=event)
+        Ticket.objects.create(attendee=attendee, event=event, created_by=self.organizer, ticket_code=f'CODE-{title}',
+                              first_name='Ama', last_name='Mensah', event_title=title)
+        RegistrationRollup.objects.create(event=event, bucket=timezone.now(), gender='female', registrations=1)
+        return event
+
+    def test_recent_events_stay_active_for_the_default_grace_period(self):
+        recent, old = self.event(1, 'Recent'), self.event(8, 'Old')
+        self.assertEqual(archiving.archive_past_events(), 1)
+        self.assertEqual(list(Event.objects.values_list('id', flat=True)), [recent.id])
+        self.assertEqual(Archive.objects.get().former_event_id, old.id)
+
+    def test_registrations_survive_archiving_and_reattach_on_restore(self):
+        event = self.event(30)
+        [(_, archive)] = archiving.archive_events([event.id])
+        self.assertFalse(Event.objects.filter(pk=event.id).exists())
+        self.assertEqual(Attendee.objects.filter(event_id=event.id).count(), 1)
+        self.assertEqual(Ticket.objects.filter(event_id=event.id).count(), 1)
+        self.assertEqual(RegistrationRollup.objects.filter(event_id=event.id).count(), 1)
+        self.assertEqual(self.client.post('/registrations/ticket/CODE-Workshop/cancel/').status_code, 400)
+
+        [restored] = archiving.restore_archives([archive])
+        self.assertEqual(restored.id, event.id)
+        restored.refresh_from_db()
+        self.assertEqual(restored.seats_taken, 1)
+        self.assertEqual(restored.attendee_set.count(), 1)
+
+    @override_settings(TICKET_SIGNING_KEYS={'1': 'secret'}, TICKET_SIGNING_KEY_ID='1')
+    def test_tickets_of_archived_events_stop_working(self):
+        event = self.event(30)
+        ticket = Ticket.objects.get()
+        signed = Ticket.objects.create(attendee_id=ticket.attendee_id, event=event, created_by=self.organizer,
+                                       first_name='Ama', last_name='Mensah', event_title='Workshop')
+        signed.ticket_code = signing.sign_ticket(signed.id, event.id)
+        signed.save()
+        archiving.archive_events([event.id])
+        auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=self.organizer).key}'}
+        for code in ('CODE-Workshop', signed.ticket_code):
+            with self.subTest(code=code):
+                self.assertEqual(self.client.get(f'/registrations/ticket/{code}/').json()['message'],
+                                 'Event has been archived')
+                self.assertEqual(self.client.get(f'/registrations/ticket/scan/{code}/', **auth).json(),
+                                 {'status': 'Not Registered', 'message': 'Event has been archived'})
+        self.assertFalse(Ticket.objects.filter(is_used=True).exists())
+        self.assertEqual(RegistrationRollup.objects.get().check_ins, 0)
+        # The admin lists them under the former event id
+        self.assertEqual(str(Attendee.objects.get()), f'Ama Mensah attending archived event {event.id}')
+        self.assertTrue(str(ticket).endswith(f'to archived event {event.id}'))
+
+    def test_deleting_an_archive_deletes_what_was_kept_for_it(self):
+        event = self.event(30)
+        [(_, archive)] = archiving.archive_events([event.id])
+        archiving.delete_archives([archive])
+        self.assertFalse(Archive.objects.exists())
+        self.assertFalse(Attendee.objects.filter(event_id=event.id).exists())
+        self.assertFalse(Ticket.objects.filter(event_id=event.id).exists())
+        self.assertFalse(RegistrationRollup.objects.filter(event_id=event.id).exists())
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create(email='organizer@example.com')
+
+    def add_event(self, title):
+        return Event.objects.create(
+            title=title, description='Hands-on', location='Accra', category='Tech', start_date='2030-01-01',
+            end_date='2030-01-01', start_time='10:00', end_time='18:00', created_by=self.organizer,
+        )
+
+    def titles(self):
+        return [event['title'] for event in dashboard.get_dashboard(self.organizer)['events']]
+
+    def test_per_process_cache_is_not_used(self):
+        self.add_event('First')
+        self.assertEqual(self.titles(), ['First'])
+        # Without an invalidation, as if it had happened in another worker
+        self.add_event('Second')
+        self.assertEqual(self.titles(), ['First', 'Second'])
+
+    def test_shared_cache_serves_until_invalidated(self):
+        use_shared_cache(self)
+        self.add_event('First')
+        self.assertEqual(self.titles(), ['First'])
+        self.add_event('Second')
+        self.assertEqual(self.titles(), ['First'])
+        with self.captureOnCommitCallbacks(execute=True):
+            dashboard.invalidate(self.organizer.id)
+        self.assertEqual(self.titles(), ['First', 'Second'])
+
+
+class EventsTestMixin:
+    """An organizer with a token, with thumbnail uploads, notifications and rate limits off."""
+
+    def setUp(self):
+        self.addCleanup(mock.patch.stopall)
+        self.cloudinary = mock.patch('apps.events.views.CloudinaryService').start()
+        self.cloudinary.return_value.upload_file.return_value = {'url': 'https://example.com/thumbnail.png'}
+        mock.patch.object(SlidingWindowThrottle, 'allow_request', return_value=True).start()
+        mock.patch('apps.notifications.services.fan_out_event_notification').start()
+        self.organizer = User.objects.create(email='organizer@example.com')
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=self.organizer).key}'}
+
+    def create_event(self, title='Conditional', auth=None):
+        return self.client.post('/events/create/', {
+            'title': title, 'description': 'Cached', 'location': 'Accra', 'category': 'Tech',
+            'start_date': '2030-01-01', 'end_date': '2030-01-01', 'start_time': '10:00', 'end_time': '18:00',
+            'capacity': 10, 'thumbnail': SimpleUploadedFile('thumbnail.png', b'\x89PNG', 'image/png'),
+        }, **(auth or self.auth))
+
+
+class ConditionalGetTests(EventsTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.assertEqual(self.create_event().status_code, 201)
+        self.event = Event.objects.get(title='Conditional')
+        self.event_url = f'/events/event/{self.event.id}/'
+
+    def get(self, url, etag=None, since=None):
+        headers = dict(self.auth)
+        if etag:
+            headers['HTTP_IF_NONE_MATCH'] = etag
+        if since:
+            headers['HTTP_IF_MODIFIED_SINCE'] = since
+        return self.client.get(url, **headers)
+
+    def assertRevalidates(self, url, change):
+        """Check a current copy of url answers 304 with a single probe query, and a 200 after `change`."""
+        first = self.get(url)
+        etag = first.get('ETag')
+        self.assertIsNotNone(etag)
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.get(url, etag=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertFalse(cached.content)
+        # Token authentication and the probe
+        self.assertLessEqual(len(queries), 2)
+        change()
+        refreshed = self.get(url, etag=etag)
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertNotIn(refreshed.get('ETag'), (None, etag))
+        return refreshed
+
+    def update(self):
+        self.client.put(f'/events/update/{self.event.id}/', {'title': 'Conditional (edited)'},
+                        content_type='application/json', **self.auth)
+
+    def archive(self):
+        self.client.post(f'/events/archive/{self.event.id}/', **self.auth)
+
+    def test_creating_an_event_changes_the_user_events(self):
+        self.assertRevalidates('/events/user/', lambda: self.create_event('Another'))
+
+    def test_updating_an_event_changes_it_and_the_user_events(self):
+        self.assertRevalidates(self.event_url, self.update)
+        self.assertRevalidates('/events/user/', self.update)
+
+    def test_taking_a_seat_changes_the_event(self):
+        self.assertRevalidates(self.event_url, lambda: capacity.allocate_seat(self.event.id))
+
+    def test_dates_are_honoured_for_single_events_only(self):
+        response = self.get(self.event_url)
+        self.assertEqual(self.get(self.event_url, since=response['Last-Modified']).status_code, 304)
+        self.assertEqual(self.get(self.event_url, since=http_date(0)).status_code, 200)
+        response = self.get('/events/user/')
+        self.assertEqual(self.get('/events/user/', since=response['Last-Modified']).status_code, 200)
+        # A weak (compressed) ETag still validates
+        self.assertEqual(self.get('/events/user/', etag='W/' + response['ETag']).status_code, 304)
+
+    def test_archiving_and_restoring_change_the_lists(self):
+        self.assertRevalidates('/events/archives/', self.archive)
+        events = self.get('/events/user/')
+        self.assertEqual(events.json()['events'], [])
+        missing = self.get(self.event_url)
+        self.assertEqual(missing.status_code, 404)
+        self.assertFalse(missing.has_header('ETag'))
+
+        archive_id = Archive.objects.get(created_by=self.organizer).id
+        self.assertRevalidates('/events/archives/',
+                               lambda: self.client.post(f'/events/restore/{archive_id}/', **self.auth))
+        restored = self.get('/events/user/', etag=events['ETag'])
+        self.assertEqual(restored.status_code, 200)
+        self.assertEqual(len(restored.json()['events']), 1)
+
+    def test_editing_the_profile_changes_it(self):
+        self.client.post('/accounts/profile/create/', {'first_name': 'Ama', 'last_name': 'Mensah'}, **self.auth)
+        profile = self.assertRevalidates('/accounts/profile/', lambda: self.client.put(
+            '/accounts/profile/edit/', {'first_name': 'Esi', 'last_name': 'Mensah'},
+            content_type='application/json', **self.auth
+        )).json()['profile']
+        self.assertNotIn('updated_at', profile)
+        self.assertEqual(profile['first_name'], 'Esi')
+
+
+class FacetCountTests(EventsTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.events = [
+            Event.objects.create(
+                title=title, description='Hands-on', location=location, category=category, start_date='2030-01-01',
+                end_date='2030-01-01', start_time='10:00', end_time='18:00', created_by=self.organizer,
+                is_online=is_online, is_public=is_public,
+            )
+            for title, category, location, is_online, is_public in (
+                ('Django', 'Tech', 'Accra', False, True),
+                ('Rust', 'Tech', 'Accra', False, True),
+                ('Highlife', 'Music', 'Kumasi', True, True),
+                ('Board meeting', 'Tech', 'Kumasi', False, False),
+            )
+        ]
+
+    def facets(self, **params):
+        response = self.client.get('/events/public/facets/', params)
+        self.assertEqual(response.status_code, 200)
+        return {field: [(value['value'], value['count']) for value in values]
+                for field, values in response.json()['facets'].items()}
+
+    def test_public_events_are_counted_per_value(self):
+        self.assertEqual(self.facets(), {
+            'category': [('Tech', 2), ('Music', 1)],
+            'is_online': [(False, 2), (True, 1)],
+            'location': [('Accra', 2), ('Kumasi', 1)],
+        })
+
+    def test_filters_and_limit(self):
+        self.assertEqual(self.facets(location='Kumasi'), {
+            'category': [('Music', 1)], 'is_online': [(True, 1)], 'location': [('Kumasi', 1)],
+        })
+        self.assertEqual(self.facets(is_online='false', limit=1)['location'], [('Accra', 2)])
+        self.assertEqual(self.facets(category='Dance'), {'category': [], 'is_online': [], 'location': []})
+
+    def test_grouped_counts_fold_into_each_facet(self):
+        # The query every database but PostgreSQL uses
+        counts = facets._combined_group_counts(Event.objects.filter(is_public=True))
+        self.assertEqual(counts, {
+            'category': Counter({'Tech': 2, 'Music': 1}),
+            'is_online': Counter({'false': 2, 'true': 1}),
+            'location': Counter({'Accra': 2, 'Kumasi': 1}),
+        })
+        if connection.vendor == 'postgresql':
+            self.assertEqual(facets._grouping_sets_counts(Event.objects.filter(is_public=True)), counts)
+
+    @override_settings(EVENT_FACET_COUNTS_TABLE=True)
+    def test_the_facet_table_follows_changes(self):
+        facets.rebuild_facet_table()
+        django, rust, highlife, board = self.events
+        self.client.put(f'/events/update/{django.id}/', {'category': 'Music', 'location': 'Kumasi'},
+                        content_type='application/json', **self.auth)
+        self.client.put(f'/events/update/{board.id}/', {'is_public': True}, content_type='application/json',
+                        **self.auth)
+        archiving.archive_events([highlife.id])
+
+        maintained = self.facets()
+        self.assertEqual(maintained, {
+            'category': [('Tech', 2), ('Music', 1)],
+            'is_online': [(False, 3)],
+            'location': [('Kumasi', 2), ('Accra', 1)],
+        })
+        facets.rebuild_facet_table()
+        self.assertEqual(self.facets(), maintained)
+
+
+class EventChangeTests(EventsTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # Every entry is settled as soon as it is written, except where a test says otherwise
+        mock.patch.object(changes, 'SETTLE_SECONDS', 0).start()
+
+    def add_event(self, title, is_public=True):
+        event = Event.objects.create(
+            title=title, description='Hands-on', location='Accra', category='Tech', start_date='2030-01-01',
+            end_date='2030-01-01', start_time='10:00', end_time='18:00', created_by=self.organizer,
+            is_public=is_public,
+        )
+        changes.record_change(event)
+        return event
+
+    def sync(self, url='/events/public/changes/', **params):
+        response = self.client.get(url, params, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def start(self, url='/events/public/changes/'):
+        first = self.sync(url)
+        self.assertEqual((first['reset'], first['events']), (True, []))
+        return first['cursor']
+
+    def test_events_leaving_the_catalog_leave_tombstones(self):
+        public_cursor, user_cursor = self.start(), self.start('/events/user/changes/')
+        hidden, archived = self.add_event('Hidden'), self.add_event('Archived')
+        self.assertEqual(self.client.put(f'/events/update/{hidden.id}/', {'is_public': False},
+                                         content_type='application/json', **self.auth).status_code, 200)
+        archiving.archive_events([archived.id])
+
+        public = self.sync(cursor=public_cursor)
+        self.assertEqual((public['events'], public['removed']), ([], [hidden.id, archived.id]))
+        # The organizer still sees the private event; only the archived one is gone
+        own = self.sync('/events/user/changes/', cursor=user_cursor)
+        self.assertEqual([event['id'] for event in own['events']], [hidden.id])
+        self.assertEqual(own['removed'], [archived.id])
+
+        # Nothing happened since
+        again = self.sync(cursor=public['cursor'])
+        self.assertEqual((again['events'], again['removed'], again['has_more']), ([], [], False))
+
+    def test_pages_until_has_more_is_false(self):
+        cursor = self.start()
+        events = [self.add_event(f'Event {number}') for number in range(5)]
+        self.add_event('Private', is_public=False)
+        seen, pages = [], 0
+        while True:
+            page = self.sync(cursor=cursor, limit=2)
+            seen += [event['id'] for event in page['events']]
+            cursor, pages = page['cursor'], pages + 1
+            if not page['has_more']:
+                break
+        self.assertEqual(seen, [event.id for event in events])
+        self.assertEqual(pages, 3)
+
+    def test_unsettled_entries_are_sent_again(self):
+        cursor = changes.sync({'is_public': True}, {'is_public': True})['cursor']
+        event = self.add_event('In flight')
+        with mock.patch.object(changes, 'SETTLE_SECONDS', 60):
+            result = changes.sync({'is_public': True}, {'is_public': True}, cursor=cursor)
+        self.assertEqual(result['events'], [event])
+        self.assertEqual(result['cursor'].split('.')[0], cursor.split('.')[0])
+        self.assertEqual(changes.sync({'is_public': True}, {'is_public': True}, cursor=result['cursor'])['events'],
+                         [event])
+
+    def test_expired_and_malformed_cursors(self):
+        self.add_event('Old news')
+        issued = timezone.now() - timedelta(days=settings.EVENT_CHANGES_RETENTION_DAYS + 1)
+        expired = self.sync(cursor=changes.make_cursor(0, issued))
+        self.assertEqual((expired['reset'], expired['events']), (True, []))
+        # The reset cursor is at the head of the log: the reloaded list already has the event
+        self.assertEqual(self.sync(cursor=expired['cursor'])['events'], [])
+        self.assertEqual(self.client.get('/events/public/changes/', {'cursor': 'latest'}).status_code, 400)
+
+    def test_prune_drops_expired_and_superseded_entries(self):
+        expired = self.add_event('Expired')
+        EventChange.objects.filter(event_id=expired.id).update(
+            changed_at=timezone.now() - timedelta(days=settings.EVENT_CHANGES_RETENTION_DAYS + 1)
+        )
+        # Updated twice: only the last entry matters
+        updated = self.add_event('Updated')
+        changes.record_change(updated, was_public=True)
+        # A private edit after a public entry does not replace it in the public log
+        private = self.add_event('Private later', is_public=True)
+        Event.objects.filter(pk=private.pk).update(is_public=False)
+        private.is_public = False
+        changes.record_change(private)
+
+        self.assertEqual(changes.prune(now=timezone.now() + timedelta(seconds=1)), (1, 1))
+        self.assertEqual(
+            sorted(EventChange.objects.values_list('event_id', 'is_public')),
+            [(updated.id, True), (private.id, False), (private.id, True)],
+        )
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'], REPLICA_PIN_SECONDS=1)
+class ReplicaRoutingTests(EventsTestMixin, TransactionTestCase):
+    """Routing decisions, recorded while every read is actually served by the test database."""
+
+    def setUp(self):
+        super().setUp()
+        use_shared_cache(self)
+
+        self.routed, self.lagging = set(), False
+        db_for_read = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            alias = db_for_read(router, model, **hints)
+            self.routed.add((model, alias))
+            if self.lagging and model is Token and alias != 'default':
+                # A lagging replica has not received the tokens issued since
+                raise Token.DoesNotExist
+            return 'default'
+
+        mock.patch.object(ReplicaRouter, 'db_for_read', record).start()
+        other = User.objects.create(email='other@example.com')
+        self.other = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=other).key}'}
+
+    def reads(self, url, auth, model=None):
+        """Return the databases the reads of a request were routed to, optionally only those of one model."""
+        self.routed.clear()
+        self.assertEqual(self.client.get(url, **auth).status_code, 200)
+        return {alias for read_model, alias in self.routed if model in (None, read_model)}
+
+    def test_safe_requests_read_from_the_replica(self):
+        self.assertEqual(self.reads('/events/user/', self.auth), {'replica_1'})
+
+    def test_a_write_pins_its_client_to_the_primary_for_a_while(self):
+        self.assertEqual(self.create_event().status_code, 201)
+        self.assertEqual(self.reads('/events/user/', self.auth), {'default'})
+        self.assertEqual(self.reads('/events/user/', self.other), {'replica_1'})
+        time.sleep(1.2)
+        self.assertEqual(self.reads('/events/user/', self.auth), {'replica_1'})
+
+    def test_a_get_that_writes_reads_from_the_primary_and_pins(self):
+        self.create_event()
+        time.sleep(1.2)
+        event = Event.objects.get()
+        attendee = Attendee.objects.create(email='guest@example.com', first_name='Ama', last_name='Mensah',
+                                           phone_number='0200000000', gender='female', event=event)
+        Ticket.objects.create(attendee=attendee, event=event, created_by=self.organizer, ticket_code='PRIMARY-ONLY',
+                              first_name='Ama', last_name='Mensah', event_title=event.title)
+        # Token authentication runs before the view and may still read from the replica
+        self.assertEqual(self.reads('/registrations/ticket/scan/PRIMARY-ONLY/', self.auth, Ticket), {'default'})
+        self.assertEqual(self.reads('/events/user/', self.auth), {'default'})
+
+    def test_a_token_issued_at_login_or_signup_is_read_from_the_primary(self):
+        User.objects.create_user(email='returning@example.com', password='correct-horse')
+        self.lagging = True
+        for url, email in (('/accounts/login/', 'returning@example.com'), ('/accounts/signup/', 'new@example.com')):
+            with self.subTest(url=url):
+                response = self.client.post(url, {'email': email, 'password': 'correct-horse'},
+                                            content_type='application/json')
+                auth = {'HTTP_AUTHORIZATION': f'Token {response.json()["token"]}'}
+                self.assertEqual(self.reads('/events/user/', auth, Token), {'default'})
+
+
+class ValuesSerializerTests(TestCase):
+    def setUp(self):
+        organizer = User.objects.create(email='organizer@example.com')
+        for number, (link, thumbnail, meeting_id, capacity_) in enumerate([
+            (None, None, None, None),
+            ('https://meet.example.com/x', 'https://res.cloudinary.com/seed/image/upload/v1/seed.png', '000', 50),
+            ('', '', 'abc-defg-hij', 0),
+        ]):
+            fields = dict(
+                title=f'Workshop {number} — Ünïcode', description='Generated "event".', online_link=link,
+                thumbnail=thumbnail, start_date='2030-01-01', end_date='2030-01-02', start_time='10:00',
+                end_time='18:00', location='Accra', category='Tech', meeting_id=meeting_id, created_by=organizer,
+                is_public=bool(number % 2), is_online=link is not None, capacity=capacity_,
+            )
+            Event.objects.create(seats_taken=number, **fields)
+            Archive.objects.create(**fields)
+
+    def assertSameJSON(self, model_serializer, values_serializer, queryset):
+        self.assertEqual(dumps(values_serializer(queryset).data), dumps(model_serializer(queryset, many=True).data))
+
+    def test_events_render_like_the_model_serializer(self):
+        self.assertSameJSON(EventSerializer, EventValuesSerializer, Event.objects.order_by('id'))
+
+    def test_archives_render_like_the_model_serializer(self):
+        self.assertSameJSON(ArchiveSerializer, ArchiveValuesSerializer, Archive.objects.order_by('id'))
+        # get_user_archives used to serialize archives with EventSerializer
+        self.assertSameJSON(EventSerializer, ArchiveValuesSerializer, Archive.objects.order_by('id'))
+
+
+class StartupImportTests(SimpleTestCase):
+    # Packages only some requests need, imported when first used
+    DEFERRED = ('cloudinary',)
+    # Run in a fresh interpreter, so nothing is imported yet, like in a newly started worker
+    PROBE = '''
+import json, sys
+import django
+django.setup()
+import schedoserver.urls
+print(json.dumps([name for name in sys.argv[1:] if name in sys.modules]))
+'''
+
+    def test_deferred_packages_stay_off_the_startup_path(self):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        result = subprocess.run([sys.executable, '-c', self.PROBE, *self.DEFERRED], env=env, capture_output=True,
+                                text=True)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        self.assertEqual(json.loads(result.stdout.strip().splitlines()[-1]), [])
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'SQLite serializes all writes')
+class ConcurrentIdempotencyTests(EventsTestMixin, TransactionTestCase):
+    """Identical requests racing with one Idempotency-Key, as a client retrying over a flaky network."""
+    duplicates = 20
+
+    def setUp(self):
+        super().setUp()
+        self.key = str(uuid.uuid4())
+
+    def fire(self, request):
+        def run(_):
+            try:
+                return request()
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.duplicates) as pool:
+            return list(pool.map(run, range(self.duplicates)))
+
+    def assertReplayed(self, responses):
+        """Check every duplicate got the first response back."""
+        self.assertEqual(len({response.content for response in responses}), 1)
+        replayed = [response for response in responses if response.get('Idempotent-Replayed') == 'true']
+        self.assertEqual(len(replayed), self.duplicates - 1)
+
+    def test_an_event_is_created_and_uploaded_once(self):
+        responses = self.fire(lambda: self.client_class().post('/events/create/', {
+            'title': 'Uploaded once', 'description': 'Hands-on', 'location': 'Accra', 'category': 'Tech',
+            'start_date': '2030-02-01', 'end_date': '2030-02-01', 'start_time': '10:00', 'end_time': '18:00',
+            'thumbnail': SimpleUploadedFile('thumbnail.png', b'\x89PNG', 'image/png'),
+        }, HTTP_IDEMPOTENCY_KEY=self.key, **self.auth))
+        self.assertReplayed(responses)
+        self.assertEqual(Event.objects.filter(title='Uploaded once').count(), 1)
+        self.assertEqual(self.cloudinary.return_value.upload_file.call_count, 1)
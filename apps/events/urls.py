@@ -5,9 +5,13 @@ app_name = 'events'
 
 urlpatterns = [
     path('public/', views.get_public_events, name='public_events'),
+    path('public/facets/', views.get_public_event_facets, name='public_event_facets'),
+    path('public/changes/', views.get_public_event_changes, name='public_event_changes'),
     path('user/', views.get_user_events, name='user_events'),
+    path('user/changes/', views.get_user_event_changes, name='user_event_changes'),
     path('archives/', views.get_user_archives, name='user_archives'),
     path('event/<int:event_id>/', views.get_event, name='event'),
+    path('dashboard/', views.get_dashboard, name='dashboard'),
     path('attendance/', views.get_event_attendance, name='event_attendance'),
     path('create/', views.create_event, name='creat_event'),
     path('update/<int:event_id>/', views.update_event, name='update_event'),
@@ -2,20 +2,29 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from .models import Event, Archive
-from apps.registrations.models import Attendee
-from .serializers import EventSerializer, ArchiveSerializer
+from .serializers import EventSerializer, ArchiveSerializer, EventValuesSerializer, ArchiveValuesSerializer
 from rest_framework.permissions import AllowAny
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import TokenAuthentication
+from schedoserver.authentication import ExpiringTokenAuthentication
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.parsers import MultiPartParser
 from .cloudinary import CloudinaryService  
 from django.conf import settings
+from django.db.models import Count, Max, Q
+from . import archiving
+from . import changes
+from . import facets
+from . import dashboard
+from apps.notifications import services as notifications
+from apps.registrations import capacity
+from schedoserver.conditional import conditional
+from schedoserver.idempotency import idempotent
 
 
 @api_view(['POST'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
+@idempotent
 def create_event(request):
     try:
         # Parse file from the request
@@ -64,6 +73,9 @@ def create_event(request):
         if serializer.is_valid():
             # Save event data (thumbnail is already in data)
             event = serializer.save(created_by=request.user)
+            facets.record_facet_change({}, facets.facet_snapshot(event))
+            changes.record_change(event)
+            dashboard.invalidate(request.user.id)
             # print("Event Created Successfully:", event)
             return Response({
                 'status': 'success',
@@ -95,10 +107,10 @@ def create_event(request):
 @permission_classes([AllowAny])
 def get_public_events(request):
     try:
-        # Fetch all events where is_public is True
-        public_events = Event.objects.filter(is_public=True)
+        # Fetch all events where is_public is True, narrowed by any facet filters
+        public_events = Event.objects.filter(is_public=True, **facets.parse_facet_filters(request.query_params))
         # Serialize the queryset
-        serializer = EventSerializer(public_events, many=True)
+        serializer = EventValuesSerializer(public_events)
         # Return the serialized data
         return Response({
             'status': 'success',
@@ -116,14 +128,48 @@ def get_public_events(request):
 
 
 @api_view(['GET'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def get_public_event_facets(request):
+    """
+    Return per-value counts of the public catalog facets (category, is_online, location).
+
+    Accepts the same facet filters as get_public_events plus an optional `limit`
+    on the number of values returned per facet.
+    """
+    try:
+        limit = int(request.query_params.get('limit', facets.DEFAULT_FACET_LIMIT))
+        filters = facets.parse_facet_filters(request.query_params)
+        return Response({
+            'status': 'success',
+            'facets': facets.compute_facet_counts(filters, limit=limit)
+        }, status=status.HTTP_200_OK)
+    except Exception as e:
+        # Handle any errors that might occur
+        return Response(
+            {
+                'status': 'error',
+                'errors': [str(e)]
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+
+def _user_events_state(request):
+    state = Event.objects.filter(created_by=request.user).aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    return state['last_modified'], state['count']
+
+
+@api_view(['GET'])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
+@conditional(_user_events_state, use_dates=False)
 def get_user_events(request):
     try:
         # Fetch events with the given user_id
         user_events = Event.objects.filter(created_by=request.user)
         # Serialize the queryset
-        serializer = EventSerializer(user_events, many=True)
+        serializer = EventValuesSerializer(user_events)
         # Return the serialized data
         return Response({
             'status': 'success',
@@ -140,29 +186,88 @@ def get_user_events(request):
         )
 
 
+def _event_changes_response(request, log_filter, event_filter):
+    result = changes.sync(
+        log_filter, event_filter, cursor=request.query_params.get('cursor'),
+        limit=int(request.query_params.get('limit', changes.DEFAULT_LIMIT))
+    )
+    return Response({
+        'status': 'success',
+        'events': EventSerializer(result['events'], many=True).data,
+        'removed': result['removed'],
+        'cursor': result['cursor'],
+        'has_more': result['has_more'],
+        'reset': result['reset']
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def get_public_event_changes(request):
+    """
+    Return the changes to the public catalog after `cursor`.
+
+    Without a cursor, or with an expired one, the response only has `reset` and a
+    cursor: reload get_public_events, then sync from that cursor.
+    """
+    try:
+        return _event_changes_response(request, {'is_public': True}, {'is_public': True})
+    except Exception as e:
+        # Handle any errors that might occur
+        return Response(
+            {
+                'status': 'error',
+                'errors': [str(e)]
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+
+@api_view(['GET'])
+@authentication_classes([ExpiringTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def get_user_event_changes(request):
+    """
+    Return the changes to the authenticated user's events after `cursor`.
+
+    Without a cursor, or with an expired one, the response only has `reset` and a
+    cursor: reload get_user_events, then sync from that cursor.
+    """
+    try:
+        return _event_changes_response(request, {'created_by': request.user}, {'created_by': request.user})
+    except Exception as e:
+        # Handle any errors that might occur
+        return Response(
+            {
+                'status': 'error',
+                'errors': [str(e)]
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+
 @api_view(['GET'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def get_event_attendance(request):
     try:
-        # Fetch events created by the authenticated user
-        user_events = Event.objects.filter(created_by=request.user)
-        
+        # Fetch events created by the authenticated user, counting confirmed attendees in the same query
+        user_events = Event.objects.filter(created_by=request.user).annotate(
+            attendee_count=Count('attendee', filter=Q(attendee__status='confirmed'))
+        ).values('id', 'title', 'start_date', 'attendee_count')
+
         # Initialize an empty list to store the results
         event_data = []
 
-        # Loop through the fetched events and count the number of attendees for each event
         for event in user_events:
-            # Count the number of confirmed attendees for the event
-            attendee_count = Attendee.objects.filter(event=event, status='confirmed').count()
-
             # Append the event data and number of attendees to the result list
             event_data.append({
-                'id': event.id,
-                'event': event.id,
-                'title': event.title,
-                'start_date': event.start_date,
-                'number_of_attendees': attendee_count
+                'id': event['id'],
+                'event': event['id'],
+                'title': event['title'],
+                'start_date': event['start_date'],
+                'number_of_attendees': event['attendee_count']
             })
 
         # Return the result as a response
@@ -182,8 +287,38 @@ def get_event_attendance(request):
     
 
 @api_view(['GET'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
+def get_dashboard(request):
+    """
+    Fetch everything the organizer dashboard shows in one round trip: the profile,
+    active events with attendance counts, an archive summary and recent registrations.
+
+    :param request: The request
+    :return: A JSON response containing the dashboard
+    """
+    try:
+        return Response({
+            'status': 'success',
+            'dashboard': dashboard.get_dashboard(request.user)
+        }, status=status.HTTP_200_OK)
+    except Exception as e:
+        # Handle any errors that might occur
+        return Response({
+            'status': 'error',
+            'errors': [str(e)]
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _event_state(request, event_id):
+    updated_at = Event.objects.filter(pk=event_id).values_list('updated_at', flat=True).first()
+    return None if updated_at is None else (updated_at, 1)
+
+
+@api_view(['GET'])
+@authentication_classes([ExpiringTokenAuthentication])
+@permission_classes([IsAuthenticated])
+@conditional(_event_state)
 def get_event(request, event_id):
     try:
         # Fetch the event with the given event_id
@@ -216,7 +351,7 @@ def get_event(request, event_id):
 
 
 @api_view(['PUT'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def update_event(request, event_id):
     try:
@@ -232,9 +367,26 @@ def update_event(request, event_id):
                 status=status.HTTP_403_FORBIDDEN
             )
         # Update the event using the given data
+        before = facets.facet_snapshot(event)
+        was_public = event.is_public
+        details = notifications.notified_details(event)
         serializer = EventSerializer(event, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            event = serializer.save()
+            facets.record_facet_change(before, facets.facet_snapshot(event))
+            changes.record_change(event, was_public=was_public)
+            dashboard.invalidate(request.user.id)
+            if 'capacity' in serializer.validated_data:
+                # Recount the seats and hand any new ones to the waitlist
+                capacity.sync_seats_taken(event.id)
+                capacity.promote_waitlist(event.id)
+                event.refresh_from_db(fields=['seats_taken'])
+            # Registrants only hear about changes that affect them, not every edit of the description
+            changed = notifications.changed_details(details, event)
+            if changed:
+                notifications.fan_out_event_notification(
+                    event.id, f'{event.title} has been updated: new {", ".join(changed)}.'
+                )
             return Response(
                 {
                     'status': 'success',
@@ -272,7 +424,7 @@ def update_event(request, event_id):
 
 
 @api_view(['POST'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def archive_event(request, event_id):
     try: 
@@ -288,32 +440,16 @@ def archive_event(request, event_id):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        # Create a new instance of the Archive model
-        archive = Archive(
-            title=event.title,
-            description=event.description,
-            location=event.location,
-            category=event.category,
-            meeting_id=event.meeting_id if event.meeting_id else None,
-            start_date=event.start_date,
-            end_date=event.end_date,
-            start_time=event.start_time,
-            end_time=event.end_time,
-            thumbnail=event.thumbnail,
-            is_public=event.is_public,
-            is_online=event.is_online,
-            created_by=request.user
-        )
-
-        # Save the Archive instance
-        archive.save()
+        # Move the event to the archive; its registrations are kept for a restore
+        archived = archiving.archive_events([event.id], message='{title} has been archived by the organizer.')
+        if not archived:
+            # Archived concurrently (e.g. by archive_past_events)
+            raise Event.DoesNotExist
+        [(_, archive)] = archived
         print(f"Event {event_id} archived successfully as {archive.id}")
 
         # Serialize the archived event
         serializer = ArchiveSerializer(archive)
-
-        # Delete the event from the Event table
-        event.delete()
         print(f"Event {event_id} deleted after being archived")
 
         return Response(
@@ -348,7 +484,7 @@ def archive_event(request, event_id):
 
 
 @api_view(['DELETE'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def delete_all_events(request):
     try:
@@ -356,8 +492,9 @@ def delete_all_events(request):
         archived_events = Archive.objects.filter(created_by=request.user)
         # Serialize the queryset
         serializer = ArchiveSerializer(archived_events, many=True)
-        # Delete all archived events
-        archived_events.delete()
+        # Delete all archived events, with the registrations kept for them
+        archiving.delete_archives(archived_events)
+        dashboard.invalidate(request.user.id)
         return Response(
             {
                 'status': 'success',
@@ -378,38 +515,14 @@ def delete_all_events(request):
 
 
 @api_view(['POST'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def restore_all_events(request):
     try:
         # Fetch all archived events with the given user_id
         archived_events = Archive.objects.filter(created_by=request.user)
-        # Loop through the events and restore them to the events table
-        restored_events = []
-        for event in archived_events:
-            # Create a new event instance
-            new_event = Event(
-                title=event.title,
-                description=event.description,
-                location=event.location,
-                category=event.category,
-                meeting_id = event.meeting_id if event.meeting_id else None,
-                start_date=event.start_date,
-                end_date=event.end_date,
-                start_time=event.start_time,
-                end_time=event.end_time,
-                thumbnail=event.thumbnail,
-                is_public=event.is_public,
-                is_online=event.is_online,
-                created_by=request.user
-            )
-            # Save the new event instance
-            new_event.save()
-            # Serialize the restored event
-            serializer = EventSerializer(new_event)
-            restored_events.append(serializer.data)
-            # Delete the instance from the Archive table
-            event.delete()
+        # Move them back to the events table
+        restored_events = EventSerializer(archiving.restore_archives(archived_events), many=True).data
         return Response(
             {
                 'status': 'success',
@@ -429,7 +542,7 @@ def restore_all_events(request):
         )
 
 @api_view(['DELETE'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def delete_event(request, event_id):
     try:
@@ -458,8 +571,9 @@ def delete_event(request, event_id):
         else:
             print("Failed to upload file to Cloudinary.")
 
-        # Delete the event from the Archive table
-        event.delete()
+        # Delete the event from the Archive table, with the registrations kept for it
+        archiving.delete_archives([event])
+        dashboard.invalidate(request.user.id)
         return Response(
             {
                 'status': 'success',
@@ -489,7 +603,7 @@ def delete_event(request, event_id):
 
 
 @api_view(['POST'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def restore_event(request, event_id):
     try:
@@ -504,28 +618,10 @@ def restore_event(request, event_id):
                 },
                 status=status.HTTP_403_FORBIDDEN
             )
-        # Create a new event instance
-        new_event = Event(
-            title=event.title,
-            description=event.description,
-            location=event.location,
-            category=event.category,
-            meeting_id=event.meeting_id if event.meeting_id else None,
-            start_date=event.start_date,
-            end_date=event.end_date,
-            start_time=event.start_time,
-            end_time=event.end_time,
-            thumbnail=event.thumbnail,
-            is_public=event.is_public,
-            is_online=event.is_online,
-            created_by=request.user
-        )
-        # Save the new event instance
-        new_event.save()
+        # Move the event back to the events table
+        [new_event] = archiving.restore_archives([event])
         # Serialize the new event instance
         serializer = EventSerializer(new_event)
-        # Delete the instance from the Archive table
-        event.delete()
         return Response(
             {
                 'status': 'success',
@@ -553,15 +649,21 @@ def restore_event(request, event_id):
         )
 
     
+def _user_archives_state(request):
+    state = Archive.objects.filter(created_by=request.user).aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    return state['last_modified'], state['count']
+
+
 @api_view(['GET'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
+@conditional(_user_archives_state, use_dates=False)
 def get_user_archives(request):
     try:
         # Fetch all archived events with the given user_id
         archived_events = Archive.objects.filter(created_by=request.user)
-        # Serialize the queryset
-        serializer = EventSerializer(archived_events, many=True)
+        # Serialize the queryset (the archive fields are the event fields without seats_taken)
+        serializer = ArchiveValuesSerializer(archived_events)
         # Return the serialized data
         return Response(
             {
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from apps.notifications.models import Notification
+from apps.notifications.models import Notification, NotificationCounter, NotificationFanOut
 
 # Register your models here.
-admin.site.register(Notification)
\ No newline at end of file
+admin.site.register(Notification)
+admin.site.register(NotificationCounter)
+admin.site.register(NotificationFanOut)
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.notifications.models import NotificationFanOut
+from apps.notifications.services import run_fan_out
+
+
+class Command(BaseCommand):
+    help = (
+        'Fan out event notifications in the foreground, resuming each after the last recipient notified. '
+        'Without IDs, every unfinished fan-out is picked up, e.g. after a worker crashed or restarted mid-run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('fan_out_ids', nargs='*', type=int, help='Fan-outs to run (failed ones included).')
+
+    def handle(self, *args, **options):
+        fan_outs = NotificationFanOut.objects.order_by('id')
+        if options['fan_out_ids']:
+            fan_outs = fan_outs.filter(id__in=options['fan_out_ids'])
+        else:
+            fan_outs = fan_outs.filter(status__in=['pending', 'running'])
+
+        for fan_out_id in fan_outs.values_list('id', flat=True):
+            started = time.perf_counter()
+            fan_out = run_fan_out(fan_out_id)
+            if fan_out is None:
+                self.stdout.write(self.style.WARNING(f'Fan-out {fan_out_id} is being run by another process'))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f'Fan-out {fan_out.id}: {fan_out.created:,} notifications in {time.perf_counter() - started:.1f}s'
+            ))
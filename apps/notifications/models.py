@@ -8,7 +8,45 @@ class Notification(models.Model):
     message = models.TextField()  # The notification message
     timestamp = models.DateTimeField(auto_now_add=True)  # Date and time when the notification was created
     is_read = models.BooleanField(default=False)  # Indicates if the notification has been read
-    event = models.ForeignKey(Event, on_delete=models.CASCADE, null=True, blank=True)  # Link to the Event model (optional)
+    event = models.ForeignKey(Event, on_delete=models.SET_NULL, null=True, blank=True)  # Link to the Event model (optional, kept when the event is archived)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of a user's inbox (newest first) and unread lookups
+            models.Index(fields=['user', '-id'], name='notification_inbox_idx'),
+            models.Index(fields=['user', 'is_read'], name='notification_unread_idx'),
+        ]
 
     def __str__(self):
         return f"Notification for {self.user.email}: {self.message[:20]}..."
+
+
+# Model class for the maintained unread notification counter of a user
+class NotificationCounter(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')  # Owner of the counter
+    unread = models.IntegerField(default=0)  # Number of unread notifications for the user
+
+    def __str__(self):
+        return f"{self.unread} unread notifications for {self.user_id}"
+
+
+# Model class for the notification of every registrant of an event, resumed where it stopped after a restart
+class NotificationFanOut(models.Model):
+    id = models.AutoField(primary_key=True)  # Unique identifier for the fan-out
+    event = models.ForeignKey(Event, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')  # The event whose registrants are notified (kept when it is archived)
+    message = models.TextField()  # The notification message
+    link_event = models.BooleanField(default=True)  # Whether the notifications link to the event (not once it is archived)
+    status = models.CharField(max_length=20, choices=[  # Progress of the fan-out
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed')
+    ], default='pending')
+    last_user_id = models.IntegerField(default=0)  # Highest recipient id notified so far; a resumed run starts after it
+    created = models.PositiveIntegerField(default=0)  # Number of notifications created so far
+    error = models.TextField(blank=True, default='')  # Failure reason, if any
+    created_at = models.DateTimeField(auto_now_add=True)  # Date and time when the fan-out was requested
+    finished_at = models.DateTimeField(null=True, blank=True)  # Date and time when the last notification was created
+
+    def __str__(self):
+        return f"Fan-out {self.id} for event {self.event_id} ({self.status})"
@@ -8,6 +8,7 @@ class NotificationSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'message', 'timestamp', 'is_read', 'event']
 
     def to_representation(self, instance):
+        # Querysets should use select_related('user', 'event') so these lookups hit the joined rows
         data = super().to_representation(instance)
         data['user'] = instance.user.email
         if instance.event:
@@ -0,0 +1,169 @@
+"""
+Inbox notifications, fanned out to every registrant of an event.
+
+A fan-out is recorded as a NotificationFanOut row in the transaction that
+changes the event, then run in the background once that transaction commits.
+Recipients are walked in user id order, a chunk at a time, and each chunk is
+written in the same transaction as the fan-out's cursor, so a run stopped by a
+crash or a restart is resumed with `send_notifications` without notifying
+anyone twice.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.events.models import Event
+from apps.registrations.models import Attendee
+from schedoserver.locks import advisory_lock
+from .models import Notification, NotificationCounter, NotificationFanOut
+
+logger = logging.getLogger(__name__)
+
+# Number of notifications written per bulk_create batch
+FAN_OUT_CHUNK_SIZE = 1000
+# Event fields whose changes registrants are told about
+NOTIFIED_FIELDS = ('title', 'start_date', 'end_date', 'start_time', 'end_time', 'location', 'online_link', 'is_online')
+# The cache fallback of the run lock expires on its own after this long
+LOCK_TIMEOUT = 3600
+
+# Background workers so fan-out never runs on the request path
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='notifications')
+
+
+def notified_details(event):
+    """Return the values of the event fields registrants are notified about."""
+    return {field: getattr(event, field) for field in NOTIFIED_FIELDS}
+
+
+def changed_details(before, event):
+    """
+    Name the notified fields that differ from an earlier snapshot.
+
+    :param before: The notified_details of the event before the change
+    :param event: The changed event
+    :return: The verbose names of the changed fields, in NOTIFIED_FIELDS order
+    """
+    after = notified_details(event)
+    return [Event._meta.get_field(field).verbose_name for field in NOTIFIED_FIELDS if before[field] != after[field]]
+
+
+def registrant_user_ids(event_id):
+    """
+    Return the ids of user accounts registered for an event.
+
+    Attendees are matched to user accounts by email; registrations without an
+    account have no inbox and are skipped.
+
+    :param event_id: The ID of the event
+    :return: A lazy queryset of user ids
+    """
+    emails = Attendee.objects.filter(event_id=event_id).exclude(status='cancelled').values('email')
+    return User.objects.filter(email__in=emails).values_list('id', flat=True)
+
+
+def _notify_chunk(fan_out, user_ids, event_id):
+    with transaction.atomic():
+        Notification.objects.bulk_create(
+            [Notification(user_id=user_id, message=fan_out.message, event_id=event_id) for user_id in user_ids]
+        )
+        NotificationCounter.objects.bulk_create(
+            [NotificationCounter(user_id=user_id) for user_id in user_ids],
+            ignore_conflicts=True
+        )
+        NotificationCounter.objects.filter(user_id__in=user_ids).update(unread=F('unread') + 1)
+        # Committed with the chunk, so a resumed run starts after it
+        NotificationFanOut.objects.filter(pk=fan_out.id).update(
+            last_user_id=user_ids[-1], created=F('created') + len(user_ids)
+        )
+    return len(user_ids)
+
+
+def mark_read(user, ids=None):
+    """
+    Mark a user's notifications as read with a single UPDATE and adjust the unread counter.
+
+    :param user: The owner of the notifications
+    :param ids: The notification ids to mark, or None for all of them
+    :return: The number of notifications that changed from unread to read
+    """
+    notifications = Notification.objects.filter(user=user, is_read=False)
+    if ids is not None:
+        notifications = notifications.filter(id__in=ids)
+    with transaction.atomic():
+        updated = notifications.update(is_read=True)
+        if updated:
+            NotificationCounter.objects.filter(user=user).update(unread=Greatest(F('unread') - updated, 0))
+    return updated
+
+
+def unread_count(user):
+    """Return the maintained unread counter of a user."""
+    counter = NotificationCounter.objects.filter(user=user).values_list('unread', flat=True).first()
+    return counter or 0
+
+
+def run_fan_out(fan_out_id, chunk_size=FAN_OUT_CHUNK_SIZE):
+    """
+    Notify every registrant of a fan-out's event, or resume it after the last recipient notified.
+
+    :param fan_out_id: The ID of the NotificationFanOut
+    :param chunk_size: Number of notifications written per batch
+    :return: The NotificationFanOut, or None if another process is running it
+    """
+    with advisory_lock(f'notifications.fan_out:{fan_out_id}', timeout=LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            return None
+        fan_out = NotificationFanOut.objects.get(pk=fan_out_id)
+        if fan_out.status == 'done':
+            return fan_out
+
+        NotificationFanOut.objects.filter(pk=fan_out.id).update(status='running', error='')
+        linked_event_id = fan_out.event_id if fan_out.link_event else None
+        recipients = registrant_user_ids(fan_out.event_id).order_by('id')
+        last_user_id = fan_out.last_user_id
+        try:
+            while True:
+                user_ids = list(recipients.filter(id__gt=last_user_id)[:chunk_size])
+                if not user_ids:
+                    break
+                _notify_chunk(fan_out, user_ids, linked_event_id)
+                last_user_id = user_ids[-1]
+        except Exception as exc:
+            logger.exception("Notification fan-out %s failed for event %s", fan_out.id, fan_out.event_id)
+            NotificationFanOut.objects.filter(pk=fan_out.id).update(status='failed', error=str(exc))
+            raise
+
+        NotificationFanOut.objects.filter(pk=fan_out.id).update(status='done', finished_at=timezone.now())
+        fan_out.refresh_from_db()
+        logger.info("Sent %s notifications for event %s", fan_out.created, fan_out.event_id)
+        return fan_out
+
+
+def _run_in_background(fan_out_id):
+    try:
+        run_fan_out(fan_out_id)
+    except Exception:
+        # Already recorded on the fan-out
+        pass
+    finally:
+        close_old_connections()
+
+
+def fan_out_event_notification(event_id, message, keep_event=True):
+    """
+    Record a notification of every registrant of an event and send it in the background once the
+    current transaction commits.
+
+    :param event_id: The ID of the event; registrations keep it when the event is archived
+    :param message: The notification message
+    :param keep_event: Whether the notifications should link to the event
+    :return: The NotificationFanOut
+    """
+    fan_out = NotificationFanOut.objects.create(event_id=event_id, message=message, link_event=keep_event)
+    transaction.on_commit(lambda: _executor.submit(_run_in_background, fan_out.id))
+    return fan_out
@@ -1,3 +1,167 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from apps.accounts.models import User
+from apps.events import archiving
+from apps.events.models import Event
+from apps.registrations.models import Attendee
+from schedoserver.throttling import SlidingWindowThrottle
+from . import services
+from .models import Notification, NotificationCounter, NotificationFanOut
+
+
+class NotificationTestCase(TestCase):
+    def setUp(self):
+        self.addCleanup(mock.patch.stopall)
+        mock.patch.object(SlidingWindowThrottle, 'allow_request', return_value=True).start()
+        self.executor = mock.patch.object(services, '_executor').start()
+        self.organizer = User.objects.create(email='organizer@example.com')
+        self.organizer_auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=self.organizer).key}'}
+        self.event = Event.objects.create(
+            title='Workshop', description='Hands-on', location='Accra', category='Tech', start_date='2030-01-01',
+            end_date='2030-01-01', start_time='10:00', end_time='18:00', created_by=self.organizer,
+        )
+
+    def register(self, count, event=None):
+        """Register `count` attendees with user accounts and return the users."""
+        users = []
+        for number in range(count):
+            user = User.objects.create(email=f'member{number}@example.com')
+            Attendee.objects.create(email=user.email, first_name='Ama', last_name=str(number),
+                                    phone_number='0200000000', gender='female', event=event or self.event)
+            users.append(user)
+        return users
+
+    def unread(self, user):
+        return NotificationCounter.objects.get(user=user).unread
+
+
+class FanOutTests(NotificationTestCase):
+    def update(self, **changes):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(f'/events/update/{self.event.id}/', changes,
+                                       content_type='application/json', **self.organizer_auth)
+        self.assertEqual(response.status_code, 200)
+        return NotificationFanOut.objects.order_by('id').last()
+
+    def test_only_changes_that_affect_registrants_are_notified(self):
+        self.register(2)
+        self.assertIsNone(self.update(description='Now with snacks', capacity=50))
+        self.executor.submit.assert_not_called()
+
+        fan_out = self.update(start_time='11:00', location='Kumasi')
+        self.assertEqual(fan_out.message, 'Workshop has been updated: new start time, location.')
+        self.executor.submit.assert_called_once_with(services._run_in_background, fan_out.id)
+
+        fan_out = services.run_fan_out(fan_out.id)
+        self.assertEqual((fan_out.status, fan_out.created), ('done', 2))
+        self.assertEqual(Notification.objects.filter(event=self.event).count(), 2)
+
+    def test_a_failed_run_resumes_after_the_last_chunk(self):
+        users = self.register(5)
+        Attendee.objects.filter(email='member4@example.com').update(status='cancelled')
+        fan_out = services.fan_out_event_notification(self.event.id, 'Moved to Kumasi')
+        notify_chunk = services._notify_chunk
+        calls = []
+
+        def crash_on_second_chunk(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError('worker restarted')
+            return notify_chunk(*args)
+
+        with mock.patch.object(services, '_notify_chunk', side_effect=crash_on_second_chunk):
+            with self.assertRaises(RuntimeError), self.assertLogs('apps.notifications.services', 'ERROR'):
+                services.run_fan_out(fan_out.id, chunk_size=2)
+        fan_out.refresh_from_db()
+        self.assertEqual((fan_out.status, fan_out.created, fan_out.last_user_id), ('failed', 2, users[1].id))
+
+        out = StringIO()
+        call_command('send_notifications', fan_out.id, stdout=out)
+        self.assertIn(f'Fan-out {fan_out.id}: 4 notifications', out.getvalue())
+        self.assertEqual(
+            sorted(Notification.objects.values_list('user_id', flat=True)), [user.id for user in users[:4]]
+        )
+        self.assertEqual([self.unread(user) for user in users[:4]], [1, 1, 1, 1])
+
+    def test_pending_fan_outs_are_picked_up_after_a_restart(self):
+        self.register(1)
+        pending = services.fan_out_event_notification(self.event.id, 'Moved to Kumasi')
+        done = services.run_fan_out(services.fan_out_event_notification(self.event.id, 'Doors at 9').id)
+        call_command('send_notifications', stdout=StringIO())
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, 'done')
+        self.assertEqual(Notification.objects.filter(message='Doors at 9').count(), done.created)
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_registrants_of_archived_events_are_notified_without_a_link(self):
+        day = (timezone.localdate() - timedelta(days=30)).isoformat()
+        Event.objects.filter(pk=self.event.pk).update(start_date=day, end_date=day)
+        [user] = self.register(1)
+        archiving.archive_events([self.event.id], message='{title} has been archived')
+
+        fan_out = services.run_fan_out(NotificationFanOut.objects.get().id)
+        self.assertEqual(fan_out.created, 1)
+        notification = Notification.objects.get(user=user)
+        self.assertEqual(notification.message, 'Workshop has been archived')
+        self.assertIsNone(notification.event_id)
+
+
+class InboxTests(NotificationTestCase):
+    def setUp(self):
+        super().setUp()
+        [self.member, self.other] = self.register(2)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=self.member).key}'}
+        for number in range(5):
+            services.run_fan_out(services.fan_out_event_notification(self.event.id, f'Update {number}').id)
+        self.ids = list(Notification.objects.filter(user=self.member).order_by('-id').values_list('id', flat=True))
+
+    def page(self, **params):
+        response = self.client.get('/notifications/', params, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def mark_read(self, data):
+        return self.client.post('/notifications/read/', data, content_type='application/json', **self.auth)
+
+    def test_pages_follow_the_cursor_newest_first(self):
+        seen = []
+        params = {'limit': 2}
+        while True:
+            page = self.page(**params)
+            seen += [notification['id'] for notification in page['notifications']]
+            if page['next_cursor'] is None:
+                break
+            params['before'] = page['next_cursor']
+        self.assertEqual(seen, self.ids)
+        self.assertEqual(self.page(limit=2)['notifications'][0]['message'], 'Update 4')
+        self.assertEqual(self.page(limit=5)['next_cursor'], None)
+
+    def test_unread_filter_and_counter(self):
+        self.assertEqual(self.client.get('/notifications/unread-count/', **self.auth).json()['unread_count'], 5)
+        response = self.mark_read({'ids': self.ids[:2]})
+        self.assertEqual(response.json(), {'status': 'success', 'updated': 2, 'unread_count': 3})
+        unread = [notification['id'] for notification in self.page(unread='true')['notifications']]
+        self.assertEqual(unread, self.ids[2:])
+
+        # Marking again changes nothing and never drives the counter below the real count
+        self.assertEqual(self.mark_read({'ids': self.ids[:2]}).json()['updated'], 0)
+        self.assertEqual(self.unread(self.member), 3)
+
+    def test_bulk_mark_read_only_touches_the_users_own_notifications(self):
+        others = list(Notification.objects.filter(user=self.other).values_list('id', flat=True))
+        self.assertEqual(self.mark_read({'ids': others}).json()['updated'], 0)
+        self.assertEqual(self.mark_read({'all': True}).json(), {'status': 'success', 'updated': 5, 'unread_count': 0})
+        self.assertEqual(self.unread(self.other), 5)
+        self.assertFalse(Notification.objects.filter(user=self.other, is_read=True).exists())
 
-# Create your tests here.
+    def test_invalid_requests_are_rejected(self):
+        self.assertEqual(self.mark_read({}).status_code, 400)
+        self.assertEqual(self.mark_read({'ids': ['first']}).status_code, 400)
+        self.assertEqual(self.client.get('/notifications/', {'before': 'last'}, **self.auth).status_code, 400)
@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+app_name = 'notifications'
+
+urlpatterns = [
+    path('', views.list_notifications, name='list_notifications'),
+    path('read/', views.mark_notifications_read, name='mark_notifications_read'),
+    path('unread-count/', views.get_unread_count, name='unread_count'),
+]
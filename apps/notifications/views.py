@@ -1,3 +1,95 @@
-from django.shortcuts import render
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from schedoserver.authentication import ExpiringTokenAuthentication
+from rest_framework.response import Response
+from rest_framework import status
+from .models import Notification
+from .serializers import NotificationSerializer
+from . import services
 
-# Create your views here.
+# Default and maximum page sizes of the inbox
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+@api_view(['GET'])
+@authentication_classes([ExpiringTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def list_notifications(request):
+    """
+    List the authenticated user's notifications, newest first, with keyset pagination.
+
+    :param request: The request, optionally with `before` (cursor), `limit` and `unread` query params
+    :return: A JSON response containing a page of notifications and the next cursor
+    """
+    try:
+        limit = min(int(request.query_params.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        notifications = Notification.objects.filter(user=request.user)
+        before = request.query_params.get('before')
+        if before:
+            notifications = notifications.filter(id__lt=int(before))
+        if str(request.query_params.get('unread', 'false')).lower() == 'true':
+            notifications = notifications.filter(is_read=False)
+        # Join the user and event rows instead of fetching them per notification
+        page = list(
+            notifications.select_related('user', 'event')
+            .only('id', 'message', 'timestamp', 'is_read', 'user__email', 'event__title')
+            .order_by('-id')[:limit + 1]
+        )
+        has_more = len(page) > limit
+        page = page[:limit]
+        serializer = NotificationSerializer(page, many=True)
+        return Response({
+            'status': 'success',
+            'notifications': serializer.data,
+            'next_cursor': page[-1].id if has_more else None
+        }, status=status.HTTP_200_OK)
+    except ValueError as e:
+        return Response({
+            'status': 'error',
+            'errors': [str(e)]
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['POST'])
+@authentication_classes([ExpiringTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def mark_notifications_read(request):
+    """
+    Mark notifications as read in bulk.
+
+    :param request: The request containing `ids` (a list of notification ids) or `all: true`
+    :return: A JSON response with the number of updated notifications and the new unread count
+    """
+    ids = request.data.get('ids')
+    mark_all = str(request.data.get('all', 'false')).lower() == 'true'
+    if not mark_all and not isinstance(ids, list):
+        return Response({
+            'status': 'error',
+            'message': 'Provide a list of notification ids or all=true'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        updated = services.mark_read(request.user, None if mark_all else [int(i) for i in ids])
+    except (TypeError, ValueError) as e:
+        return Response({
+            'status': 'error',
+            'errors': [str(e)]
+        }, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'status': 'success',
+        'updated': updated,
+        'unread_count': services.unread_count(request.user)
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@authentication_classes([ExpiringTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def get_unread_count(request):
+    """
+    Return the authenticated user's unread notification count from the maintained counter.
+    """
+    return Response({
+        'status': 'success',
+        'unread_count': services.unread_count(request.user)
+    }, status=status.HTTP_200_OK)
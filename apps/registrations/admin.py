@@ -1,6 +1,9 @@
 from django.contrib import admin
-from apps.registrations.models import Ticket, Attendee
+from apps.registrations.models import Ticket, Attendee, BadgeJob, RegistrationRollup, Broadcast
 
 # Register your models here.
 admin.site.register(Ticket)
 admin.site.register(Attendee)
+admin.site.register(BadgeJob)
+admin.site.register(RegistrationRollup)
+admin.site.register(Broadcast)
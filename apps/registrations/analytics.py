@@ -0,0 +1,175 @@
+"""
+Registration analytics from hourly rollups.
+
+RegistrationRollup keeps per-event, per-hour, per-gender counters of
+registrations, cancellations and check-ins. They are bumped on write, in the
+same transaction as the change they count, so the analytics endpoints only
+read a handful of rollup rows instead of scanning attendees and tickets.
+`rebuild_rollups` recomputes them from the raw rows (Attendee.registration_date
+and cancelled_at, Ticket.used_at), e.g. after a bulk import.
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone as dt_timezone
+
+from django.db import connection, connections, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from apps.events.models import Event
+from .models import Attendee, RegistrationRollup, Ticket
+
+COUNTERS = ('registrations', 'cancellations', 'check_ins')
+
+
+def hour_bucket(moment):
+    """Return the start of the (UTC) hour a moment falls in."""
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _bump(event_id, gender, counter, moment=None):
+    bucket = hour_bucket(moment or timezone.now())
+    with transaction.atomic():
+        # Make sure the bucket has a row, then apply an atomic increment
+        RegistrationRollup.objects.bulk_create(
+            [RegistrationRollup(event_id=event_id, bucket=bucket, gender=gender)],
+            ignore_conflicts=True
+        )
+        RegistrationRollup.objects.filter(event_id=event_id, bucket=bucket, gender=gender).update(
+            **{counter: F(counter) + 1}
+        )
+
+
+def record_registration(attendee):
+    """Count a new registration (confirmed or waitlisted)."""
+    _bump(attendee.event_id, attendee.gender, 'registrations', attendee.registration_date)
+
+
+def record_cancellation(attendee):
+    """Count a cancelled registration."""
+    _bump(attendee.event_id, attendee.gender, 'cancellations', attendee.cancelled_at)
+
+
+def record_check_in(ticket_id, event_id=None):
+    """Count a scanned ticket (passing its event lets a partitioned ticket table prune the lookup)."""
+    tickets = Ticket.objects.filter(pk=ticket_id)
+    if event_id is not None:
+        tickets = tickets.filter(event_id=event_id)
+    event_id, gender, used_at = tickets.values_list('event_id', 'attendee__gender', 'used_at').get()
+    _bump(event_id, gender, 'check_ins', used_at)
+
+
+def event_summary(event_id):
+    """
+    Summarize an event from its rollups.
+
+    :param event_id: The ID of the event
+    :return: Totals, the check-in rate and the gender breakdown of active registrations
+    """
+    by_gender = {
+        row['gender']: row
+        for row in RegistrationRollup.objects.filter(event_id=event_id).values('gender').annotate(
+            **{counter: Sum(counter) for counter in COUNTERS}
+        )
+    }
+    totals = {counter: sum(row[counter] for row in by_gender.values()) for counter in COUNTERS}
+    active = totals['registrations'] - totals['cancellations']
+    return {
+        'event': event_id,
+        'totals': dict(totals, active=active),
+        'check_in_rate': round(totals['check_ins'] / active, 4) if active > 0 else 0.0,
+        'gender': {gender: row['registrations'] - row['cancellations'] for gender, row in sorted(by_gender.items())},
+    }
+
+
+def event_timeline(event_id, granularity='hour', since=None, until=None):
+    """
+    Registrations, cancellations and check-ins of an event over time.
+
+    :param event_id: The ID of the event
+    :param granularity: 'hour' or 'day' (UTC days)
+    :param since: Only buckets at or after this moment
+    :param until: Only buckets before this moment
+    :return: A list of buckets in chronological order
+    """
+    rollups = RegistrationRollup.objects.filter(event_id=event_id)
+    if since is not None:
+        rollups = rollups.filter(bucket__gte=since)
+    if until is not None:
+        rollups = rollups.filter(bucket__lt=until)
+    period = TruncDay('bucket', tzinfo=dt_timezone.utc) if granularity == 'day' else F('bucket')
+    return list(
+        rollups.annotate(period=period).values('period').annotate(
+            **{counter: Sum(counter) for counter in COUNTERS}
+        ).order_by('period')
+    )
+
+
+def rebuild_rollups(event_ids):
+    """
+    Recompute the rollups of some events from the raw attendee and ticket rows.
+
+    :param event_ids: The IDs of the events to rebuild
+    :return: The number of rollup rows written
+    """
+    counts = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    sources = (
+        ('registrations', Attendee.objects.filter(event_id__in=event_ids), 'registration_date', 'gender'),
+        ('cancellations', Attendee.objects.filter(event_id__in=event_ids, cancelled_at__isnull=False),
+         'cancelled_at', 'gender'),
+        ('check_ins', Ticket.objects.filter(event_id__in=event_ids, used_at__isnull=False),
+         'used_at', 'attendee__gender'),
+    )
+    for counter, rows, moment, gender in sources:
+        hourly = rows.annotate(hour=TruncHour(moment, tzinfo=dt_timezone.utc))
+        for row in hourly.values('event_id', 'hour', gender).annotate(total=Count('id')).order_by():
+            counts[(row['event_id'], row['hour'], row[gender])][counter] = row['total']
+
+    with transaction.atomic():
+        RegistrationRollup.objects.filter(event_id__in=event_ids).delete()
+        RegistrationRollup.objects.bulk_create(
+            [
+                RegistrationRollup(event_id=event_id, bucket=bucket, gender=gender, **values)
+                for (event_id, bucket, gender), values in counts.items()
+            ],
+            batch_size=1000
+        )
+    return len(counts)
+
+
+def rebuild_all_rollups(chunk_size=500, workers=4, event_ids=None, on_chunk=None):
+    """
+    Rebuild the rollups of every event (or the given ones) in parallel chunks of events.
+
+    :param chunk_size: Events rebuilt per chunk (one transaction each)
+    :param workers: Chunks rebuilt concurrently, each on its own database connection
+    :param event_ids: Only rebuild these events
+    :param on_chunk: Optional callback receiving (events done, rollup rows written) after each chunk
+    :return: The total number of rollup rows written
+    """
+    if event_ids is None:
+        event_ids = list(Event.objects.order_by('id').values_list('id', flat=True))
+    chunks = [event_ids[start:start + chunk_size] for start in range(0, len(event_ids), chunk_size)]
+
+    def rebuild_chunk(chunk):
+        try:
+            return len(chunk), rebuild_rollups(chunk)
+        finally:
+            connections.close_all()
+
+    if workers <= 1 or connection.vendor == 'sqlite':
+        # SQLite serializes writers anyway
+        return _collect(((len(chunk), rebuild_rollups(chunk)) for chunk in chunks), on_chunk)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return _collect(pool.map(rebuild_chunk, chunks), on_chunk)
+
+
+def _collect(results, on_chunk):
+    events_done = rows = 0
+    for events, written in results:
+        events_done += events
+        rows += written
+        if on_chunk:
+            on_chunk(events_done, rows)
+    return rows
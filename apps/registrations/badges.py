@@ -0,0 +1,283 @@
+"""
+Printable badges for whole events.
+
+A badge job streams the tickets of an event from the database, renders pages
+of badges (name, event title and a vector QR code) in a process pool and
+appends them to a PDF written straight to disk. Only a bounded number of pages
+is in flight at any time, so memory stays flat however large the event is;
+the PDF cross-reference table (a few integers per page) is the only state that
+grows with the document.
+
+Jobs start on a background thread of the web worker. Forking a multi-threaded
+process can leave children holding locks no thread will release, so the pool
+spawns fresh interpreters instead. A job runs under an advisory lock; when
+its worker dies mid-job the job stays 'running' with the lock released, and
+`run_badge_jobs` (or running the job again) renders it from the start.
+"""
+import logging
+import multiprocessing
+import os
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+
+import django
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from schedoserver.locks import advisory_lock
+from . import qr
+from .models import BadgeJob, Ticket
+
+logger = logging.getLogger(__name__)
+
+# A4 portrait in points, laid out as a grid of badges
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN = 28
+COLUMNS, ROWS = 2, 4
+BADGES_PER_PAGE = COLUMNS * ROWS
+# Badges per PDF inside a ZIP
+BADGES_PER_FILE = 1000
+# Tickets fetched from the database per round trip
+STREAM_CHUNK_SIZE = 2000
+# Progress is saved after this many pages
+PROGRESS_EVERY_PAGES = 25
+# The cache fallback of the run lock expires on its own after this long
+LOCK_TIMEOUT = 6 * 3600
+
+# Runs jobs off the request path; each job brings its own process pool
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='badges')
+
+
+def _pdf_text(value, limit):
+    """Encode a string for a PDF literal in the standard (WinAnsi) font encoding."""
+    value = value if len(value) <= limit else value[:limit - 1] + '…'
+    encoded = value.encode('cp1252', errors='replace')
+    return encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _badge_commands(index, badge):
+    """Return the content stream operators drawing one badge in its grid cell."""
+    first_name, last_name, event_title, ticket_code = badge
+    width = (PAGE_WIDTH - 2 * MARGIN) / COLUMNS
+    height = (PAGE_HEIGHT - 2 * MARGIN) / ROWS
+    left = MARGIN + (index % COLUMNS) * width
+    bottom = PAGE_HEIGHT - MARGIN - (index // COLUMNS + 1) * height
+
+    commands = [
+        b'0.5 w 0.6 G %.2f %.2f %.2f %.2f re S 0 g' % (left + 4, bottom + 4, width - 8, height - 8),
+        b'BT /F2 16 Tf %.2f %.2f Td (%s) Tj ET' % (left + 16, bottom + height - 40, _pdf_text(f'{first_name} {last_name}', 24)),
+        b'BT /F1 10 Tf %.2f %.2f Td (%s) Tj ET' % (left + 16, bottom + height - 58, _pdf_text(event_title, 40)),
+        b'BT /F1 7 Tf %.2f %.2f Td (%s) Tj ET' % (left + 16, bottom + 16, _pdf_text(ticket_code, 48)),
+    ]
+
+    # The QR code as filled rectangles, one per run of dark modules
+    matrix = qr.qr_matrix(qr.ticket_url(ticket_code))
+    modules = len(matrix)
+    side = min(height - 70, width / 2)
+    cell = side / modules
+    origin_x = left + width - side - 12
+    origin_y = bottom + 12
+    for y, row in enumerate(matrix):
+        for x, length in qr._dark_runs(row):
+            commands.append(b'%.2f %.2f %.2f %.2f re' % (
+                origin_x + x * cell, origin_y + (modules - y - 1) * cell, length * cell, cell
+            ))
+    commands.append(b'f')
+    return commands
+
+
+def render_page(badges):
+    """
+    Render one page of badges (runs in a worker process).
+
+    :param badges: Up to BADGES_PER_PAGE (first_name, last_name, event_title, ticket_code) tuples
+    :return: The compressed page content stream
+    """
+    commands = []
+    for index, badge in enumerate(badges):
+        commands.extend(_badge_commands(index, badge))
+    return zlib.compress(b'\n'.join(commands), 6)
+
+
+class PdfWriter:
+    """
+    Write a PDF incrementally: pages are appended as they arrive and the page
+    tree, cross-reference table and trailer are written on close.
+    """
+    CATALOG, PAGES, FONT, BOLD_FONT = 1, 2, 3, 4
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.position = 0
+        self.offsets = {}
+        self.pages = []
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self._object(self.CATALOG, b'<< /Type /Catalog /Pages 2 0 R >>')
+        self._object(self.FONT, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+        self._object(self.BOLD_FONT, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>')
+        self.next_number = 5
+
+    def _write(self, data):
+        # Offsets are tracked by hand so non-seekable streams (ZIP members) work
+        self.stream.write(data)
+        self.position += len(data)
+
+    def _object(self, number, body):
+        self.offsets[number] = self.position
+        self._write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+
+    def add_page(self, content):
+        """Append a page from its compressed content stream."""
+        content_number, page_number = self.next_number, self.next_number + 1
+        self.next_number += 2
+        self._object(
+            content_number,
+            b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(content) + content + b'\nendstream'
+        )
+        self._object(page_number, (
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>'
+        ) % (PAGE_WIDTH, PAGE_HEIGHT, content_number))
+        self.pages.append(page_number)
+
+    def close(self):
+        kids = b' '.join(b'%d 0 R' % number for number in self.pages)
+        self._object(self.PAGES, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self.pages)))
+        xref_position = self.position
+        self._write(b'xref\n0 %d\n0000000000 65535 f \n' % self.next_number)
+        for number in range(1, self.next_number):
+            self._write(b'%010d 00000 n \n' % self.offsets[number])
+        self._write(
+            b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (self.next_number, xref_position)
+        )
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _write_pages(writer, pool, pages, max_in_flight, on_page):
+    """Render pages in the pool and append them in order, keeping at most `max_in_flight` pending."""
+    pending = deque()
+    for page in pages:
+        pending.append((pool.submit(render_page, page), len(page)))
+        if len(pending) >= max_in_flight:
+            future, count = pending.popleft()
+            writer.add_page(future.result())
+            on_page(count)
+    while pending:
+        future, count = pending.popleft()
+        writer.add_page(future.result())
+        on_page(count)
+
+
+def badge_root():
+    return getattr(settings, 'BADGE_ROOT', os.path.join(settings.BASE_DIR, 'badges'))
+
+
+def _render_pool(workers):
+    # Spawned workers load Django themselves before unpickling the rendering calls
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup
+    )
+
+
+def run_badge_job(job_id, workers=None, on_progress=None):
+    """
+    Render every badge of a job's event into a PDF (or a ZIP of PDFs) on local storage.
+
+    A job left 'running' by a worker that died is rendered again from the start.
+
+    :param job_id: The ID of the BadgeJob
+    :param workers: Size of the rendering process pool (defaults to the CPU count)
+    :param on_progress: Optional callback receiving (processed, total)
+    :return: The finished BadgeJob, or None if another process is running it
+    """
+    with advisory_lock(f'registrations.badges:{job_id}', timeout=LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            return None
+        job = BadgeJob.objects.get(pk=job_id)
+        if job.status == 'done':
+            return job
+        return _render_job(job, workers, on_progress)
+
+
+def _render_job(job, workers, on_progress):
+    tickets = Ticket.objects.filter(event_id=job.event_id, cancelled_at__isnull=True).order_by('id')
+    job.total, job.processed, job.status, job.error, job.finished_at = tickets.count(), 0, 'running', '', None
+    job.save(update_fields=['total', 'processed', 'status', 'error', 'finished_at'])
+
+    os.makedirs(badge_root(), exist_ok=True)
+    path = os.path.join(badge_root(), f'event-{job.event_id}-badges-{job.id}.{job.format}')
+    partial = path + '.part'
+    rows = tickets.values_list('first_name', 'last_name', 'event_title', 'ticket_code').iterator(
+        chunk_size=STREAM_CHUNK_SIZE
+    )
+    processed = 0
+    pages_since_save = 0
+
+    def on_page(count):
+        nonlocal processed, pages_since_save
+        processed += count
+        pages_since_save += 1
+        if pages_since_save >= PROGRESS_EVERY_PAGES:
+            pages_since_save = 0
+            BadgeJob.objects.filter(pk=job.id).update(processed=processed)
+            if on_progress:
+                on_progress(processed, job.total)
+
+    workers = workers or os.cpu_count() or 1
+    # Enough queued pages to keep every worker busy, few enough to bound memory
+    max_in_flight = 4 * workers
+    try:
+        with _render_pool(workers) as pool:
+            if job.format == 'zip':
+                with zipfile.ZipFile(partial, 'w', compression=zipfile.ZIP_STORED) as archive:
+                    for part, chunk in enumerate(_batched(rows, BADGES_PER_FILE), start=1):
+                        with archive.open(f'badges-{part:04d}.pdf', 'w', force_zip64=True) as member:
+                            writer = PdfWriter(member)
+                            _write_pages(writer, pool, _batched(chunk, BADGES_PER_PAGE), max_in_flight, on_page)
+                            writer.close()
+            else:
+                with open(partial, 'wb') as handle:
+                    writer = PdfWriter(handle)
+                    _write_pages(writer, pool, _batched(rows, BADGES_PER_PAGE), max_in_flight, on_page)
+                    writer.close()
+        os.replace(partial, path)
+    except Exception as exc:
+        logger.exception("Badge job %s failed", job.id)
+        if os.path.exists(partial):
+            os.remove(partial)
+        BadgeJob.objects.filter(pk=job.id).update(
+            status='failed', processed=processed, error=str(exc), finished_at=timezone.now()
+        )
+        raise
+
+    BadgeJob.objects.filter(pk=job.id).update(
+        status='done', processed=processed, file_path=path, finished_at=timezone.now()
+    )
+    if on_progress:
+        on_progress(processed, job.total)
+    job.refresh_from_db()
+    return job
+
+
+def _run_in_background(job_id):
+    try:
+        run_badge_job(job_id)
+    except Exception:
+        # Already recorded on the job
+        pass
+    finally:
+        close_old_connections()
+
+
+def start_badge_job(job):
+    """Run a badge job in the background once the current transaction commits."""
+    transaction.on_commit(lambda: _executor.submit(_run_in_background, job.id))
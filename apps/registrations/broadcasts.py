@@ -0,0 +1,259 @@
+"""
+Messages from organizers to every registrant of an event.
+
+A broadcast runs in two phases. Queuing streams the event's registrants from
+the database (a server-side cursor on PostgreSQL) into one BroadcastDelivery
+row per recipient. Sending then walks the pending deliveries in id order, a
+batch at a time: each batch is personalized, handed to a thread pool whose
+sends are spaced by a shared rate limit, and its outcome is written back with
+a few bulk updates.
+
+Progress lives in the delivery rows, so a run that crashes is resumed by
+running the broadcast again: queuing skips recipients already queued and
+sending starts at the first pending delivery. Delivery is at least once; a
+crash can repeat the messages of the batch in flight, never skip one.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from string import Template
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from schedoserver.locks import advisory_lock
+from .email_service import EmailServices
+from .models import Attendee, Broadcast, BroadcastDelivery
+
+logger = logging.getLogger(__name__)
+
+# Placeholders available in subjects and messages
+PLACEHOLDERS = ('first_name', 'last_name', 'full_name', 'event_title')
+# Registrants fetched from the database per round trip while queuing
+STREAM_CHUNK_SIZE = 2000
+# Deliveries sent and recorded together
+SEND_BATCH_SIZE = 500
+# Sends tried per recipient before giving up
+MAX_ATTEMPTS = 3
+# Pause before retrying the failed sends of a pass
+RETRY_DELAY_SECONDS = 5
+# The cache fallback of the run lock expires on its own after this long
+LOCK_TIMEOUT = 24 * 3600
+
+# Runs broadcasts off the request path; each run brings its own sending pool
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='broadcasts')
+
+
+def unknown_placeholders(*templates):
+    """Return the placeholders used in the templates that no recipient can fill."""
+    used = set()
+    for template in templates:
+        used.update(Template(template).get_identifiers())
+    return sorted(used - set(PLACEHOLDERS))
+
+
+class RateLimiter:
+    """Space calls from any number of threads at most `rate` per second apart (no limit when rate is 0)."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Sender:
+    """Send personalized messages from a thread pool, within a rate limit."""
+
+    def __init__(self, workers, rate):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='broadcast-send')
+        self.limiter = RateLimiter(rate)
+        self.local = threading.local()
+
+    def _session(self):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            import requests
+            session = self.local.session = requests.Session()
+        return session
+
+    def _send(self, message):
+        delivery_id, email, full_name, subject, body = message
+        self.limiter.wait()
+        try:
+            if EmailServices.send_email(email, full_name, subject, body, session=self._session()):
+                return delivery_id, None
+            return delivery_id, 'The email service did not accept the message'
+        except Exception as exc:
+            return delivery_id, str(exc)[:500] or type(exc).__name__
+
+    def send(self, messages):
+        """
+        Send a batch of messages and wait for all of them.
+
+        :param messages: (delivery_id, email, full_name, subject, message) tuples
+        :return: (delivery_id, error) pairs, where error is None for delivered messages
+        """
+        return list(self.pool.map(self._send, messages))
+
+    def close(self):
+        self.pool.shutdown()
+
+
+def queue_recipients(broadcast):
+    """
+    Add a pending delivery for every registrant of the event who has not cancelled.
+
+    :param broadcast: The Broadcast
+    :return: The number of recipients
+    """
+    recipients = (
+        Attendee.objects.filter(event_id=broadcast.event_id).exclude(status='cancelled').exclude(email='')
+        .order_by('id').values_list('id', 'email').iterator(chunk_size=STREAM_CHUNK_SIZE)
+    )
+    while chunk := list(islice(recipients, STREAM_CHUNK_SIZE)):
+        BroadcastDelivery.objects.bulk_create(
+            [BroadcastDelivery(broadcast_id=broadcast.id, event_id=broadcast.event_id, attendee_id=attendee_id,
+                               email=email)
+             for attendee_id, email in chunk],
+            ignore_conflicts=True
+        )
+    return BroadcastDelivery.objects.filter(broadcast_id=broadcast.id).count()
+
+
+def _record(broadcast_id, batch, results):
+    """Write the outcome of a sent batch back with a few bulk updates."""
+    attempts = {delivery_id: tried for delivery_id, tried in batch}
+    delivered, retried, failed = [], {}, {}
+    for delivery_id, error in results:
+        if error is None:
+            delivered.append(delivery_id)
+        elif attempts[delivery_id] + 1 >= MAX_ATTEMPTS:
+            failed.setdefault(error, []).append(delivery_id)
+        else:
+            retried.setdefault(error, []).append(delivery_id)
+
+    with transaction.atomic():
+        deliveries = BroadcastDelivery.objects.filter(broadcast_id=broadcast_id)
+        if delivered:
+            deliveries.filter(id__in=delivered).update(
+                status='sent', attempts=F('attempts') + 1, sent_at=timezone.now(), error=''
+            )
+        for error, ids in retried.items():
+            deliveries.filter(id__in=ids).update(attempts=F('attempts') + 1, error=error)
+        for error, ids in failed.items():
+            deliveries.filter(id__in=ids).update(status='failed', attempts=F('attempts') + 1, error=error)
+        failed_count = sum(len(ids) for ids in failed.values())
+        Broadcast.objects.filter(pk=broadcast_id).update(
+            sent=F('sent') + len(delivered), failed=F('failed') + failed_count
+        )
+    return len(delivered), failed_count
+
+
+def _deliver(broadcast, sender, on_progress, retry_delay):
+    subject, message = Template(broadcast.subject), Template(broadcast.message)
+    event_title = broadcast.event.title
+    # Naming the event lets a partitioned attendee table prune to its partition
+    pending = BroadcastDelivery.objects.filter(
+        broadcast_id=broadcast.id, status='pending', attendee__event_id=broadcast.event_id
+    )
+    sent, failed = broadcast.sent, broadcast.failed
+
+    # Each pass walks the pending deliveries once; failures left pending are retried by the next pass
+    for attempt in range(MAX_ATTEMPTS):
+        if attempt and retry_delay:
+            time.sleep(retry_delay)
+        last_id = 0
+        while batch := list(
+            pending.filter(id__gt=last_id).order_by('id').values_list(
+                'id', 'attempts', 'email', 'attendee__first_name', 'attendee__last_name'
+            )[:SEND_BATCH_SIZE]
+        ):
+            last_id = batch[-1][0]
+            messages = []
+            for delivery_id, _, email, first_name, last_name in batch:
+                context = {
+                    'first_name': first_name, 'last_name': last_name,
+                    'full_name': f'{first_name} {last_name}'.strip(), 'event_title': event_title,
+                }
+                messages.append((
+                    delivery_id, email, context['full_name'],
+                    subject.safe_substitute(context), message.safe_substitute(context),
+                ))
+            delivered, given_up = _record(
+                broadcast.id, [(delivery_id, tried) for delivery_id, tried, *_ in batch], sender.send(messages)
+            )
+            sent, failed = sent + delivered, failed + given_up
+            if on_progress:
+                on_progress(sent + failed, broadcast.total)
+        if not pending.exists():
+            break
+
+
+def run_broadcast(broadcast_id, workers=None, rate=None, on_progress=None, retry_delay=RETRY_DELAY_SECONDS):
+    """
+    Deliver a broadcast to every registrant of its event, or resume it where an earlier run stopped.
+
+    :param broadcast_id: The ID of the Broadcast
+    :param workers: Concurrent sends (defaults to BROADCAST_WORKERS)
+    :param rate: Messages per second across all workers, 0 for no limit (defaults to BROADCAST_RATE)
+    :param on_progress: Optional callback receiving (handled, total)
+    :param retry_delay: Seconds to wait before retrying failed sends
+    :return: The Broadcast, or None if another process is running it
+    """
+    workers = workers or settings.BROADCAST_WORKERS
+    rate = settings.BROADCAST_RATE if rate is None else rate
+
+    with advisory_lock(f'registrations.broadcast:{broadcast_id}', timeout=LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            return None
+        broadcast = Broadcast.objects.select_related('event').get(pk=broadcast_id)
+        if broadcast.status == 'done':
+            return broadcast
+
+        sender = Sender(workers, rate)
+        try:
+            # Queuing again is harmless, so only a run that finished queuing skips it
+            if broadcast.status != 'sending':
+                Broadcast.objects.filter(pk=broadcast.id).update(status='queuing', error='')
+                broadcast.total = queue_recipients(broadcast)
+                Broadcast.objects.filter(pk=broadcast.id).update(status='sending', total=broadcast.total)
+            _deliver(broadcast, sender, on_progress, retry_delay)
+        except Exception as exc:
+            logger.exception("Broadcast %s failed", broadcast.id)
+            Broadcast.objects.filter(pk=broadcast.id).update(status='failed', error=str(exc))
+            raise
+        finally:
+            sender.close()
+
+        Broadcast.objects.filter(pk=broadcast.id).update(status='done', finished_at=timezone.now())
+        broadcast.refresh_from_db()
+        return broadcast
+
+
+def _run_in_background(broadcast_id):
+    try:
+        run_broadcast(broadcast_id)
+    except Exception:
+        # Already recorded on the broadcast
+        pass
+    finally:
+        close_old_connections()
+
+
+def start_broadcast(broadcast):
+    """Run a broadcast in the background once the current transaction commits."""
+    transaction.on_commit(lambda: _executor.submit(_run_in_background, broadcast.id))
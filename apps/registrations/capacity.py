@@ -0,0 +1,145 @@
+"""
+Seat allocation and waitlists.
+
+`Event.seats_taken` counts confirmed attendees. A seat is taken with a single
+conditional UPDATE (`seats_taken < capacity`), so concurrent registrations
+serialize on the event row inside the database and can never oversell; there
+is no count-then-insert window. Registrations that find the event full are
+waitlisted, and cancelling a confirmed registration hands its seat to the
+oldest waitlisted attendee. Seat changes touch `Event.updated_at`, which
+validates cached copies of the event (see schedoserver/conditional.py).
+
+Cancelled registrations keep their rows: the attendee is marked cancelled and
+its ticket revoked (`Ticket.cancelled_at`), so scanners syncing manifest
+deltas learn about the revocation and the registrant may register again.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.events.models import Event
+from apps.events import dashboard
+from . import analytics, qr
+from .email_service import EmailServices
+from .live import publish_after_commit
+from .models import Attendee, Ticket
+from .tickets import issue_ticket
+
+logger = logging.getLogger(__name__)
+
+
+def allocate_seat(event_id):
+    """
+    Take a seat at an event if one is free.
+
+    :param event_id: The ID of the event
+    :return: True if a seat was taken, False if the event is full
+    """
+    return Event.objects.filter(pk=event_id).filter(
+        Q(capacity__isnull=True) | Q(seats_taken__lt=F('capacity'))
+    ).update(seats_taken=F('seats_taken') + 1, updated_at=timezone.now()) == 1
+
+
+def release_seat(event_id):
+    """Give a seat back to an event."""
+    Event.objects.filter(pk=event_id, seats_taken__gt=0).update(
+        seats_taken=F('seats_taken') - 1, updated_at=timezone.now()
+    )
+
+
+def sync_seats_taken(event_id):
+    """Recount the confirmed attendees of an event in a single UPDATE (e.g. when a capacity is first set)."""
+    confirmed = Attendee.objects.filter(event_id=OuterRef('pk'), status='confirmed').order_by().values(
+        'event_id'
+    ).annotate(total=Count('id')).values('total')
+    Event.objects.filter(pk=event_id).update(
+        seats_taken=Coalesce(Subquery(confirmed), 0), updated_at=timezone.now()
+    )
+
+
+def waitlist_position(attendee):
+    """Return the 1-based position of a waitlisted attendee."""
+    return Attendee.objects.filter(
+        event_id=attendee.event_id, status='waitlisted'
+    ).filter(
+        Q(registration_date__lt=attendee.registration_date)
+        | Q(registration_date=attendee.registration_date, id__lt=attendee.id)
+    ).count() + 1
+
+
+def promote_waitlist(event_id):
+    """
+    Confirm waitlisted attendees, oldest first, while the event has free seats.
+
+    Waitlisted rows are locked with SKIP LOCKED so concurrent promotions pick
+    different attendees instead of queueing behind each other.
+
+    :param event_id: The ID of the event
+    :return: The promoted attendees
+    """
+    promoted = []
+    while True:
+        with transaction.atomic():
+            attendee = Attendee.objects.select_for_update(skip_locked=True).filter(
+                event_id=event_id, status='waitlisted'
+            ).order_by('registration_date', 'id').first()
+            if attendee is None or not allocate_seat(event_id):
+                break
+            attendee.status = 'confirmed'
+            attendee.save(update_fields=['status'])
+            event = Event.objects.get(pk=event_id)
+            ticket = issue_ticket(event, attendee)
+            publish_after_commit(event_id, 'registrations')
+            dashboard.invalidate(event.created_by_id)
+            transaction.on_commit(lambda a=attendee, e=event, t=ticket: _send_promotion_email(a, e, t))
+        promoted.append(attendee)
+    return promoted
+
+
+def _send_promotion_email(attendee, event, ticket):
+    from .qr import ticket_url
+
+    sent = EmailServices.send_email(
+        email=attendee.email,
+        full_name=f"{attendee.first_name} {attendee.last_name}",
+        subject=f"A seat opened up for {event.title}!",
+        message=(
+            f"Hello {attendee.first_name},\nA seat opened up and you have been moved off the waitlist for "
+            f"{event.title}.\nYou can view your ticket here: {ticket_url(ticket.ticket_code)}\n\n"
+            "Thank you for registering!"
+        ),
+    )
+    if not sent:
+        logger.warning("Failed to send the promotion email to attendee %s", attendee.id)
+
+
+def cancel_registration(attendee_id):
+    """
+    Cancel a registration, freeing its seat and promoting the waitlist.
+
+    :param attendee_id: The ID of the attendee
+    :return: The cancelled attendee, or None if it was already cancelled
+    """
+    with transaction.atomic():
+        attendee = Attendee.objects.select_for_update(of=('self',)).select_related('event').get(pk=attendee_id)
+        if attendee.status == 'cancelled':
+            return None
+        held_seat = attendee.status == 'confirmed'
+        attendee.status = 'cancelled'
+        attendee.cancelled_at = timezone.now()
+        attendee.save(update_fields=['status', 'cancelled_at'])
+        analytics.record_cancellation(attendee)
+        tickets = Ticket.objects.filter(attendee=attendee, cancelled_at__isnull=True)
+        codes = list(tickets.values_list('ticket_code', flat=True))
+        tickets.update(cancelled_at=attendee.cancelled_at)
+        transaction.on_commit(lambda: qr.forget(codes))
+        dashboard.invalidate(attendee.event.created_by_id)
+        if held_seat:
+            release_seat(attendee.event_id)
+            publish_after_commit(attendee.event_id, 'registrations', delta=-1)
+    if held_seat:
+        promote_waitlist(attendee.event_id)
+    return attendee
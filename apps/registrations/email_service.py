@@ -1,18 +1,19 @@
 import os
-import requests
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+from schedoserver.metrics import track_outbound
 
 SERVICE_ID = os.getenv("SERVICE_ID")
 TEMPLATE_ID = os.getenv("TEMPLATE_ID")
 USER_ID = os.getenv("USER_ID")
+API_URL = os.getenv("EMAILJS_API_URL", "https://api.emailjs.com/api/v1.0/email/send")
 
 class EmailServices:
     @staticmethod
-    def send_email(email, full_name, subject, message):
-        url = "https://api.emailjs.com/api/v1.0/email/send"
+    def send_email(email, full_name, subject, message, session=None):
+        # Imported on first use, keeping requests out of worker startup
+        import requests
+
+        url = API_URL
         payload = {
             "service_id": SERVICE_ID,
             "template_id": TEMPLATE_ID,
@@ -32,7 +33,9 @@ class EmailServices:
         }
 
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            with track_outbound('emailjs'):
+                # A session keeps the connection open between messages of a broadcast
+                response = (session or requests).post(url, json=payload, headers=headers)
             response.raise_for_status()
             print("Email sent successfully:", response.json())
             return True  # Return True indicating success
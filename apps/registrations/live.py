@@ -0,0 +1,188 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils.module_loading import import_string
+
+from .models import Attendee, Ticket
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of undelivered messages buffered per client
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class InProcessBackend:
+    """
+    Deliver published messages to subscribers of the current process only.
+
+    Suitable for a single ASGI worker; use a cross-process backend when
+    registrations are served by other workers.
+    """
+
+    def __init__(self):
+        self._deliver = None
+
+    def start(self, deliver):
+        self._deliver = deliver
+
+    def publish(self, message):
+        if self._deliver is not None:
+            self._deliver(message)
+
+
+class PostgresNotifyBackend:
+    """
+    Relay messages between processes with PostgreSQL LISTEN/NOTIFY.
+
+    Publishing is a single `pg_notify` on the request's connection; each ASGI
+    process keeps one dedicated listening connection in a background thread.
+    """
+
+    channel = 'schedo_live'
+
+    def __init__(self):
+        self._thread = None
+
+    def start(self, deliver):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._listen, args=(deliver,), name='live-listener', daemon=True)
+        self._thread.start()
+
+    def publish(self, message):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, message])
+
+    def _listen(self, deliver):
+        wrapper = connections.create_connection('default')
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        with raw.cursor() as cursor:
+            cursor.execute(f'LISTEN {self.channel}')
+        while True:
+            if select.select([raw], [], [], 5) == ([], [], []):
+                continue
+            raw.poll()
+            while raw.notifies:
+                notify = raw.notifies.pop(0)
+                try:
+                    deliver(notify.payload)
+                except Exception:
+                    logger.exception("Failed to deliver live update")
+
+
+class Broadcaster:
+    """
+    Fan registration and check-in deltas out to streaming dashboard clients.
+
+    Totals are seeded from the database once per event and process when the
+    first client subscribes, then kept current from published deltas, so
+    connected clients cost no queries per update.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._subscribers = {}  # event id -> set of (loop, queue)
+        self._totals = {}  # event id -> {'registrations': int, 'check_ins': int}
+        self._started = False
+
+    def _ensure_started(self):
+        if not self._started:
+            self.backend.start(self._deliver)
+            self._started = True
+
+    def publish(self, event_id, kind, delta=1):
+        """
+        Publish a counter change for an event.
+
+        :param event_id: The ID of the event
+        :param kind: 'registrations' or 'check_ins'
+        :param delta: The change to the counter
+        """
+        self._ensure_started()
+        self.backend.publish(json.dumps({'event': event_id, 'kind': kind, 'delta': delta}))
+
+    def subscribe(self, event_id):
+        """
+        Register an asyncio queue receiving the updates of the given event.
+
+        Must be called from the event loop that will consume the queue.
+        """
+        self._ensure_started()
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(event_id, set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, event_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(event_id, set())
+            subscribers.difference_update({item for item in subscribers if item[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(event_id, None)
+                self._totals.pop(event_id, None)
+
+    def totals(self, event_id):
+        """Return the tracked totals of an event, loading them from the database if needed."""
+        with self._lock:
+            totals = self._totals.get(event_id)
+            if totals is not None:
+                return dict(totals)
+        loaded = {
+            'registrations': Attendee.objects.filter(event_id=event_id, status='confirmed').count(),
+            'check_ins': Ticket.objects.filter(event_id=event_id, is_used=True).count(),
+        }
+        with self._lock:
+            # Keep totals that a concurrent delta may already have advanced
+            totals = self._totals.setdefault(event_id, loaded)
+            return dict(totals)
+
+    def _deliver(self, message):
+        data = json.loads(message)
+        event_id = data['event']
+        with self._lock:
+            subscribers = list(self._subscribers.get(event_id, ()))
+            if not subscribers:
+                return
+            totals = self._totals.get(event_id)
+            if totals is not None:
+                totals[data['kind']] = totals.get(data['kind'], 0) + data['delta']
+                data['totals'] = dict(totals)
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._offer, queue, data)
+
+    @staticmethod
+    def _offer(queue, data):
+        if queue.full():
+            # Drop the oldest update; every message carries the absolute totals
+            queue.get_nowait()
+        queue.put_nowait(data)
+
+
+_broadcaster = None
+
+
+def get_broadcaster():
+    """Return the process-wide broadcaster using the LIVE_BROADCAST_BACKEND setting."""
+    global _broadcaster
+    if _broadcaster is None:
+        backend_path = getattr(settings, 'LIVE_BROADCAST_BACKEND', 'apps.registrations.live.InProcessBackend')
+        _broadcaster = Broadcaster(import_string(backend_path)())
+    return _broadcaster
+
+
+def publish_after_commit(event_id, kind, delta=1):
+    """Publish a counter change once the current transaction has committed."""
+    def publish():
+        try:
+            get_broadcaster().publish(event_id, kind, delta)
+        except Exception:
+            logger.exception("Failed to publish live update for event %s", event_id)
+
+    transaction.on_commit(publish)
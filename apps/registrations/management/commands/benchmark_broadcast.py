@@ -0,0 +1,142 @@
+import io
+import json
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from apps.accounts.models import User
+from apps.events.models import Event
+from apps.events.seeding import FIRST_NAMES, GENDERS, LAST_NAMES
+from apps.registrations import broadcasts
+from apps.registrations.models import Attendee, Broadcast
+
+BATCH_SIZE = 5000
+
+
+class StubEmailService(ThreadingHTTPServer):
+    """A local stand-in for the email API that counts the messages it receives."""
+    daemon_threads = True
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.received = Counter()
+        super().__init__(('127.0.0.1', 0), StubHandler)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/api/v1.0/email/send'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+    # Headers and body go out in separate writes, which Nagle's algorithm would hold back for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        params = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['template_params']
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.received[params['to_email']] += 1
+        body = b'{"status": "OK"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure broadcast throughput against a local stub of the email API in a throwaway test database '
+        '(retries, resuming and the rate limit are checked by the test suite).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', type=int, default=100_000, help='Registrants of the benchmarked event.')
+        parser.add_argument('--workers', type=int, default=16, help='Concurrent sends.')
+        parser.add_argument('--rate', type=float, default=0, help='Messages per second, 0 for no limit.')
+        parser.add_argument('--latency-ms', type=float, default=20, help='Stub response time per message.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with ExitStack() as stack:
+                # EmailServices prints every send
+                stack.enter_context(redirect_stdout(io.StringIO()))
+                delivered = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        if not delivered:
+            raise CommandError('Not every registrant got exactly one message')
+
+    def event_with_registrants(self, organizer, count, rng):
+        event = Event.objects.create(
+            title=f'Broadcast {count}', description='Generated event.', start_date='2030-01-01',
+            end_date='2030-01-01', start_time='10:00', end_time='18:00', location='Accra', category='Tech',
+            created_by=organizer,
+        )
+        for first in range(0, count, BATCH_SIZE):
+            Attendee.objects.bulk_create([
+                Attendee(
+                    first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                    email=f'guest{event.id}-{number}@example.com', phone_number='0200000000',
+                    gender=rng.choice(GENDERS), event=event,
+                    status=rng.choice(['confirmed', 'confirmed', 'waitlisted']),
+                )
+                for number in range(first, min(first + BATCH_SIZE, count))
+            ])
+        return event
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        organizer = User.objects.create(email='organizer@example.com')
+        count = options['recipients']
+        self.stdout.write(f'Loading {count:,} registrants')
+        event = self.event_with_registrants(organizer, count, rng)
+        broadcast = Broadcast.objects.create(
+            event=event, created_by=organizer, subject='Update for $event_title',
+            message='Hello $first_name,\nThe venue of $event_title has moved.'
+        )
+        phases = {}
+        queue_recipients = broadcasts.queue_recipients
+
+        def timed_queue(*args):
+            started = time.perf_counter()
+            total = queue_recipients(*args)
+            phases['queue'] = time.perf_counter() - started
+            return total
+
+        with ExitStack() as stack:
+            stub = StubEmailService(options['latency_ms'] / 1000)
+            threading.Thread(target=stub.serve_forever, daemon=True).start()
+            stack.callback(stub.server_close)
+            stack.callback(stub.shutdown)
+            stack.enter_context(mock.patch('apps.registrations.email_service.API_URL', stub.url))
+            stack.enter_context(mock.patch.object(broadcasts, 'queue_recipients', timed_queue))
+            started = time.perf_counter()
+            broadcast = broadcasts.run_broadcast(broadcast.id, workers=options['workers'], rate=options['rate'])
+            elapsed = time.perf_counter() - started
+        send = elapsed - phases['queue']
+        limit = f', limited to {options["rate"]:g}/s' if options['rate'] else ''
+        self.stdout.write(
+            f'Queued {broadcast.total:,} recipients in {phases["queue"]:.1f}s ({broadcast.total / phases["queue"]:,.0f}/s)\n'
+            f'Sent {broadcast.sent:,} messages in {send:.1f}s ({broadcast.sent / send:,.0f}/s) with '
+            f'{options["workers"]} workers, {options["latency_ms"]:g} ms stub latency{limit}'
+        )
+        return broadcast.sent == count and len(stub.received) == count and max(stub.received.values()) == 1
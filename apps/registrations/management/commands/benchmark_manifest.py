@@ -0,0 +1,78 @@
+import gzip
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.events.models import Event
+from apps.registrations.manifest import build_manifest
+from apps.registrations.models import Attendee, Ticket
+
+
+class Command(BaseCommand):
+    help = 'Measure ticket manifest build time and size against a throwaway test database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickets', type=int, default=100000, help='Tickets of the benchmarked event.')
+        parser.add_argument('--used-ratio', type=float, default=0.01,
+                            help='Fraction of tickets scanned after the full manifest (delta size).')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.run(options['tickets'], options['used_ratio'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, count, used_ratio):
+        organizer = User.objects.create_user('organizer@example.com', 'benchmark-password')
+        event = Event.objects.create(
+            title='Manifest benchmark', description='Benchmark event', location='Accra', category='Tech',
+            start_date='2030-01-01', end_date='2030-01-01', start_time='10:00', end_time='18:00', created_by=organizer,
+        )
+        self.stdout.write(f'Seeding {count:,} tickets...')
+        attendees = Attendee.objects.bulk_create(
+            [Attendee(first_name='Bench', last_name=str(i), email=f'a{i}@example.com', event=event) for i in range(count)],
+            batch_size=5000,
+        )
+        Ticket.objects.bulk_create(
+            [
+                Ticket(event=event, attendee=attendee, event_title=event.title, first_name='Bench',
+                       last_name=attendee.last_name, ticket_code=f'BENCH{attendee.id:010d}', created_by=organizer)
+                for attendee in attendees
+            ],
+            batch_size=5000,
+        )
+        # Spread issue times over the hour before the manifest so the delta only holds the scans
+        ticket_ids = list(Ticket.objects.filter(event=event).order_by('id').values_list('id', flat=True))
+        issued_from = timezone.now() - timedelta(hours=1)
+        for offset in range(0, len(ticket_ids), 1000):
+            Ticket.objects.filter(id__in=ticket_ids[offset:offset + 1000]).update(
+                issued_date=issued_from + timedelta(seconds=offset // 1000)
+            )
+
+        started = time.perf_counter()
+        manifest = build_manifest(event.id)
+        build_seconds = time.perf_counter() - started
+        self.report('Full manifest', manifest, build_seconds)
+
+        # Scan a slice of the tickets and measure the delta since the full manifest
+        scanned = Ticket.objects.filter(event=event).order_by('id').values_list('id', flat=True)[:int(count * used_ratio)]
+        Ticket.objects.filter(id__in=list(scanned)).update(is_used=True, used_at=timezone.now())
+        started = time.perf_counter()
+        delta = build_manifest(event.id, since=manifest['version'])
+        self.report('Delta manifest', delta, time.perf_counter() - started)
+
+    def report(self, label, manifest, seconds):
+        body = json.dumps(manifest).encode()
+        self.stdout.write(
+            f"{label}: {manifest['count']:,} entries in {seconds * 1000:,.0f} ms, "
+            f"{len(body) / 1024:,.1f} KiB JSON, {len(gzip.compress(body)) / 1024:,.1f} KiB gzipped"
+        )
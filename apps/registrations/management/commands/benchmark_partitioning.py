@@ -0,0 +1,154 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from apps.accounts.models import User
+from apps.events.models import Event
+from apps.registrations import partitioning
+from apps.registrations.models import Attendee, Ticket
+
+# Rows generated per INSERT ... SELECT
+LOAD_CHUNK = 1_000_000
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure registration hot-path latency (duplicate check, ticket lookups, registration insert) on '
+        'large attendee and ticket tables in a throwaway PostgreSQL database, first unpartitioned, then '
+        'after partition_registrations converts them. Loading 50M rows takes a while and tens of GB.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50_000_000, help='Attendees (and tickets) to generate.')
+        parser.add_argument('--attendees-per-event', type=int, default=100)
+        parser.add_argument('--partition-size', type=int, default=partitioning.DEFAULT_PARTITION_SIZE,
+                            help='Event ids per partition.')
+        parser.add_argument('--samples', type=int, default=2000, help='Lookups timed per hot path and layout.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning needs PostgreSQL')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.run(options)
+        finally:
+            connection.close()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def execute_sql(self, sql, params=None):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def load(self, rows, events):
+        organizer = User.objects.create(email='organizer@example.com')
+        self.execute_sql(
+            "INSERT INTO events_event (id, title, description, start_date, end_date, start_time, end_time, location, "
+            "category, meeting_id, created_by_id, created_at, updated_at, is_active, is_public, is_online, seats_taken) "
+            "SELECT g, 'Event ' || g, 'Benchmark event', '2024-01-01', '2024-01-01', '10:00', '18:00', 'Accra', "
+            "'Tech', '000', %s, now(), now(), true, true, false, 0 FROM generate_series(1, %s) g",
+            [organizer.id, events]
+        )
+        started = time.perf_counter()
+        for first in range(1, rows + 1, LOAD_CHUNK):
+            last = min(first + LOAD_CHUNK - 1, rows)
+            # Registrations of all events interleave, as they arrive over time
+            self.execute_sql(
+                "INSERT INTO registrations_attendee (id, first_name, last_name, email, phone_number, gender, event_id, "
+                "registration_date, status) SELECT g, 'Guest', 'Number ' || g, 'guest' || g || '@example.com', "
+                "'0200000000', 'other', 1 + (g - 1) %% %s, now(), 'confirmed' FROM generate_series(%s, %s) g",
+                [events, first, last]
+            )
+            self.execute_sql(
+                "INSERT INTO registrations_ticket (id, event_id, attendee_id, event_title, first_name, last_name, "
+                "ticket_code, created_by_id, issued_date, is_used) SELECT g, 1 + (g - 1) %% %s, g, 'Event', 'Guest', "
+                "'Number ' || g, 'T' || to_hex(g), %s, now(), false FROM generate_series(%s, %s) g",
+                [events, organizer.id, first, last]
+            )
+            self.stdout.write(f'  loaded {last:,} attendees and tickets ({time.perf_counter() - started:.0f}s)')
+        with connection.cursor() as cursor:
+            for statement in connection.ops.sequence_reset_sql(no_style(), [Event, Attendee, Ticket]):
+                cursor.execute(statement)
+        self.execute_sql('ANALYZE')
+        return organizer
+
+    def time_calls(self, call, keys):
+        durations = []
+        for key in keys:
+            started = time.perf_counter()
+            call(key)
+            durations.append((time.perf_counter() - started) * 1e6)
+        durations.sort()
+        return {
+            'p50': statistics.median(durations),
+            'p95': durations[int(len(durations) * 0.95)],
+            'p99': durations[int(len(durations) * 0.99)],
+        }
+
+    def measure(self, organizer, rows, events, samples, rng, label):
+        keys = [rng.randrange(1, rows + 1) for _ in range(samples)]
+        new_emails = iter(range(samples * 2))
+
+        def event_of(row):
+            return 1 + (row - 1) % events
+
+        def register(row):
+            with transaction.atomic():
+                attendee = Attendee.objects.create(
+                    email=f'{label}{next(new_emails)}@example.com', first_name='New', last_name='Guest',
+                    event_id=event_of(row)
+                )
+                Ticket.objects.create(
+                    event_id=attendee.event_id, attendee=attendee, event_title='Event', first_name='New',
+                    last_name='Guest', ticket_code=f'{label}-{attendee.id}', created_by=organizer
+                )
+
+        hot_paths = {
+            'duplicate check (create_attendee)': lambda row: Attendee.objects.filter(
+                email=f'guest{row}@example.com', event=event_of(row)
+            ).exists(),
+            'ticket by code (scan_ticket)': lambda row: Ticket.objects.get(
+                created_by=organizer, ticket_code=f'T{row:x}'
+            ),
+            'ticket by id + event (signed scan)': lambda row: Ticket.objects.filter(
+                pk=row, event_id=event_of(row), created_by=organizer
+            ).exists(),
+            'registration insert': register,
+        }
+        # Warm up connections and caches before timing
+        for call in hot_paths.values():
+            for row in keys[:50]:
+                call(row)
+        return {name: self.time_calls(call, keys) for name, call in hot_paths.items()}
+
+    def run(self, options):
+        rows = options['rows']
+        events = max(1, rows // options['attendees_per_event'])
+        self.stdout.write(f'Loading {rows:,} attendees and tickets across {events:,} events')
+        organizer = self.load(rows, events)
+
+        results = {'unpartitioned': self.measure(organizer, rows, events, options['samples'],
+                                                 random.Random(options['seed']), 'flat')}
+
+        started = time.perf_counter()
+        partitioning.convert(options['partition_size'])
+        self.execute_sql('ANALYZE')
+        partition_count = len(partitioning.partitions(Attendee))
+        self.stdout.write(f'Converted to {partition_count} partitions per table in {time.perf_counter() - started:.1f}s')
+        results['partitioned'] = self.measure(organizer, rows, events, options['samples'],
+                                              random.Random(options['seed']), 'part')
+
+        self.stdout.write(f'\n{"hot path":<38}{"layout":<16}{"p50 us":>10}{"p95 us":>10}{"p99 us":>10}')
+        for name in results['unpartitioned']:
+            for layout, measured in results.items():
+                timing = measured[name]
+                self.stdout.write(
+                    f'{name:<38}{layout:<16}{timing["p50"]:>10.0f}{timing["p95"]:>10.0f}{timing["p99"]:>10.0f}'
+                )
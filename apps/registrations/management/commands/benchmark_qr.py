@@ -0,0 +1,41 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from apps.registrations import qr
+from apps.registrations.tickets import generate_ticket_code
+
+
+class Command(BaseCommand):
+    help = 'Measure QR code renders per second: cold, warm (cached) and in the bulk process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=500, help='Distinct ticket codes to render.')
+        parser.add_argument('--workers', type=int, default=None, help='Process pool size (defaults to the CPU count).')
+
+    def handle(self, *args, **options):
+        codes = [generate_ticket_code() for _ in range(options['count'])]
+        for fmt in qr.FORMATS:
+            for size in (qr.DEFAULT_SIZE, max(qr.SIZES)):
+                for code in codes:
+                    cache.delete(qr._cache_key(code, fmt, size))
+
+                started = time.perf_counter()
+                images = [qr.render_cached(code, fmt, size) for code in codes]
+                cold = time.perf_counter() - started
+
+                started = time.perf_counter()
+                for code in codes:
+                    qr.render_cached(code, fmt, size)
+                warm = time.perf_counter() - started
+
+                started = time.perf_counter()
+                qr.render_many(codes, fmt, size, workers=options['workers'])
+                pool = time.perf_counter() - started
+
+                average = sum(len(image) for image in images) / len(images)
+                self.stdout.write(
+                    f'{fmt} {size:>4}px  cold {len(codes) / cold:>9,.0f}/s  warm {len(codes) / warm:>9,.0f}/s  '
+                    f'pool {len(codes) / pool:>9,.0f}/s  avg {average:,.0f} bytes'
+                )
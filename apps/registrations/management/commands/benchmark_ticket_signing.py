@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.registrations import signing
+
+
+class Command(BaseCommand):
+    help = 'Measure signed ticket code issue and verification throughput.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200000, help='Codes signed and verified.')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        issued_at = int(time.time())
+
+        started = time.perf_counter()
+        codes = [signing.sign_ticket(ticket_id, ticket_id % 1000, issued_at) for ticket_id in range(1, iterations + 1)]
+        sign_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        valid = sum(1 for code in codes if signing.verify_ticket(code) is not None)
+        verify_seconds = time.perf_counter() - started
+
+        # Flip one character of each code to measure the forged-code rejection path
+        forged = [code[:-1] + ('A' if code[-1] != 'A' else 'B') for code in codes]
+        started = time.perf_counter()
+        rejected = sum(1 for code in forged if signing.verify_ticket(code) is None)
+        reject_seconds = time.perf_counter() - started
+
+        self.stdout.write(f'Code length: {signing.SIGNED_CODE_LENGTH} characters')
+        self.stdout.write(f'Sign:   {iterations / sign_seconds:>12,.0f} codes/s')
+        self.stdout.write(f'Verify: {iterations / verify_seconds:>12,.0f} codes/s ({valid:,} valid)')
+        self.stdout.write(f'Reject: {iterations / reject_seconds:>12,.0f} codes/s ({rejected:,} forged rejected)')
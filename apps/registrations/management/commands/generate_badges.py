@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.events.models import Event
+from apps.registrations.badges import run_badge_job
+from apps.registrations.models import BadgeJob
+
+
+class Command(BaseCommand):
+    help = 'Render the printable badges of an event in the foreground, reporting progress.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int, help='The event whose badges are printed.')
+        parser.add_argument('--format', choices=['pdf', 'zip'], default='pdf', help='Output format.')
+        parser.add_argument('--workers', type=int, default=None, help='Process pool size (defaults to the CPU count).')
+
+    def handle(self, *args, **options):
+        event = Event.objects.filter(pk=options['event_id']).first()
+        if event is None:
+            raise CommandError(f"Event {options['event_id']} does not exist")
+        job = BadgeJob.objects.create(event=event, created_by=event.created_by, format=options['format'])
+        started = time.perf_counter()
+
+        def report(processed, total):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{processed:,}/{total:,} badges  {processed / elapsed if elapsed else 0:,.0f}/s')
+
+        job = run_badge_job(job.id, workers=options['workers'], on_progress=report)
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {job.processed:,} badges to {job.file_path} in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.registrations import partitioning
+
+
+class Command(BaseCommand):
+    help = (
+        'Partition the attendee and ticket tables by event id range on PostgreSQL (converting them on the '
+        'first run, which locks both tables while their rows are copied) and keep partitions ready for new '
+        'events. Safe to run repeatedly, e.g. daily.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--partition-size', type=int, default=partitioning.DEFAULT_PARTITION_SIZE,
+                            help='Event ids per partition (new partitions default to the size of the last one).')
+        parser.add_argument('--ahead', type=int, default=partitioning.DEFAULT_AHEAD,
+                            help='Empty partitions kept beyond the newest event.')
+        parser.add_argument('--status', action='store_true', help='Only list the partitions.')
+
+    def handle(self, *args, **options):
+        try:
+            partitioning.check_supported()
+            if not options['status']:
+                for model in partitioning.convert(options['partition_size'], options['ahead']):
+                    self.stdout.write(f'Partitioned {model._meta.db_table}')
+                for name in partitioning.ensure_partitions(options['ahead']):
+                    self.stdout.write(f'Created {name}')
+        except partitioning.PartitioningError as exc:
+            raise CommandError(str(exc))
+
+        for model in partitioning.PARTITIONED_MODELS:
+            if not partitioning.is_partitioned(model):
+                self.stdout.write(f'{model._meta.db_table}: not partitioned')
+                continue
+            sizes = partitioning.partition_sizes(model)
+            self.stdout.write(f'{model._meta.db_table}:')
+            for name, lower, upper in partitioning.partitions(model):
+                rows, size = sizes.get(name, (0, 0))
+                bounds = 'default' if lower is None else f'events {lower}-{upper - 1}'
+                self.stdout.write(f'  {name:<48} {bounds:<22} ~{rows:>12,} rows {size / 2 ** 20:>10,.1f} MiB')
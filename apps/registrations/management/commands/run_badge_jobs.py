@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.registrations.badges import run_badge_job
+from apps.registrations.models import BadgeJob
+
+
+class Command(BaseCommand):
+    help = (
+        'Render badge jobs in the foreground. Without IDs, every unfinished job is picked up, e.g. after a '
+        'worker crashed or restarted mid-job; jobs still rendering elsewhere are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('job_ids', nargs='*', type=int, help='Badge jobs to render (failed ones included).')
+        parser.add_argument('--workers', type=int, default=None, help='Process pool size (defaults to the CPU count).')
+
+    def handle(self, *args, **options):
+        jobs = BadgeJob.objects.order_by('id')
+        if options['job_ids']:
+            jobs = jobs.filter(id__in=options['job_ids'])
+        else:
+            jobs = jobs.filter(status__in=['pending', 'running'])
+
+        for job_id in jobs.values_list('id', flat=True):
+            started = time.perf_counter()
+            job = run_badge_job(job_id, workers=options['workers'])
+            if job is None:
+                self.stdout.write(self.style.WARNING(f'Badge job {job_id} is being rendered by another process'))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f'Badge job {job.id}: {job.processed:,} badges in {time.perf_counter() - started:.1f}s'
+            ))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.registrations.broadcasts import run_broadcast
+from apps.registrations.models import Broadcast
+
+
+class Command(BaseCommand):
+    help = (
+        'Send broadcasts in the foreground, resuming each from its first undelivered recipient. Without IDs, '
+        'every unfinished broadcast is picked up, e.g. after a worker crashed or restarted mid-send.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('broadcast_ids', nargs='*', type=int, help='Broadcasts to send (failed ones included).')
+        parser.add_argument('--workers', type=int, default=None, help='Concurrent sends (defaults to BROADCAST_WORKERS).')
+        parser.add_argument('--rate', type=float, default=None,
+                            help='Messages per second, 0 for no limit (defaults to BROADCAST_RATE).')
+
+    def handle(self, *args, **options):
+        broadcasts = Broadcast.objects.order_by('id')
+        if options['broadcast_ids']:
+            broadcasts = broadcasts.filter(id__in=options['broadcast_ids'])
+        else:
+            broadcasts = broadcasts.filter(status__in=['pending', 'queuing', 'sending'])
+
+        for broadcast_id in broadcasts.values_list('id', flat=True):
+            started = time.perf_counter()
+
+            def report(handled, total):
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'Broadcast {broadcast_id}: {handled:,}/{total:,} messages  '
+                                  f'{handled / elapsed if elapsed else 0:,.0f}/s')
+
+            broadcast = run_broadcast(broadcast_id, workers=options['workers'], rate=options['rate'],
+                                      on_progress=report)
+            if broadcast is None:
+                self.stdout.write(self.style.WARNING(f'Broadcast {broadcast_id} is being sent by another process'))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f'Broadcast {broadcast.id}: {broadcast.sent:,} sent, {broadcast.failed:,} failed '
+                f'in {time.perf_counter() - started:.1f}s'
+            ))
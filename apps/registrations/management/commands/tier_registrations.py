@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.registrations import partitioning
+from apps.registrations.models import Attendee
+
+
+class Command(BaseCommand):
+    help = (
+        'Move cold attendee and ticket partitions, whose events all ended more than --days days ago or no '
+        'longer exist, out of the hot tables: --mode detach keeps them as standalone tables, --mode export '
+        'writes them to gzipped CSV files under COLD_STORAGE_ROOT and drops them. --restore brings a range back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Days since the last event of a range ended.')
+        parser.add_argument('--mode', choices=['detach', 'export'], default='detach')
+        parser.add_argument('--restore', action='append', default=[], metavar='LOWER-UPPER',
+                            help='Re-attach a detached or exported event id range, e.g. 0-10000 (repeatable).')
+        parser.add_argument('--dry-run', action='store_true', help='Only list the cold ranges.')
+
+    def handle(self, *args, **options):
+        try:
+            partitioning.check_supported()
+            if not partitioning.is_partitioned(Attendee):
+                raise CommandError('Registrations are not partitioned yet; run partition_registrations first')
+            if options['restore']:
+                for argument in options['restore']:
+                    lower, upper = partitioning.parse_range(argument)
+                    for name in partitioning.restore_partition(lower, upper):
+                        self.stdout.write(f'Restored {name}')
+                return
+
+            ranges = partitioning.cold_partitions(options['days'])
+            if not ranges:
+                self.stdout.write('No cold partitions')
+            for lower, upper in ranges:
+                if options['dry_run']:
+                    self.stdout.write(f'Cold: events {lower}-{upper - 1}')
+                    continue
+                started = time.perf_counter()
+                if options['mode'] == 'export':
+                    action, moved = 'exported to', partitioning.export_partition(lower, upper)
+                else:
+                    action, moved = 'detached', partitioning.detach_partition(lower, upper)
+                self.stdout.write(
+                    f'Events {lower}-{upper - 1}: {action} {", ".join(moved)} in {time.perf_counter() - started:.2f}s'
+                )
+        except partitioning.PartitioningError as exc:
+            raise CommandError(str(exc))
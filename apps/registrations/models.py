@@ -2,6 +2,14 @@ from django.db import models
 from apps.accounts.models import User  # Importing the User model from the accounts app
 from apps.events.models import Event  # Importing the Event model from the events app
 
+def _event_label(instance):
+    """Title of the instance's event, or its former id once the event is archived."""
+    try:
+        return instance.event.title
+    except Event.DoesNotExist:
+        return f"archived event {instance.event_id}"
+
+
 # Model class for Attendee
 class Attendee(models.Model):
     id = models.AutoField(primary_key=True)  # Unique identifier for the attendee
@@ -14,22 +22,32 @@ class Attendee(models.Model):
         ('female', 'Female'),
         ('other', 'Other')
     ], default='other')  # Default gender set to 'Other'
-    event = models.ForeignKey(Event, on_delete=models.CASCADE)  # Link to the Event model (the event they are attending)
+    event = models.ForeignKey(Event, on_delete=models.DO_NOTHING, db_constraint=False)  # Link to the Event model (the event they are attending, kept when it is archived)
     registration_date = models.DateTimeField(auto_now_add=True)  # Date and time when the attendee registered
     status = models.CharField(max_length=20, choices=[  # Status of the registration
         ('confirmed', 'Confirmed'),
         ('pending', 'Pending'),
+        ('waitlisted', 'Waitlisted'),
         ('cancelled', 'Cancelled')
     ], default='confirmed')  # Default status set to 'Confirmed'
+    cancelled_at = models.DateTimeField(null=True, blank=True)  # Date and time when the registration was cancelled
+
+    class Meta:
+        indexes = [
+            # Waitlist promotion in registration order
+            models.Index(fields=['event', 'status', 'registration_date'], name='attendee_event_status_idx'),
+            # Duplicate registration check
+            models.Index(fields=['event', 'email'], name='attendee_event_email_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.first_name} {self.last_name} attending {self.event.title}"
+        return f"{self.first_name} {self.last_name} attending {_event_label(self)}"
     
 
 # Model class for Ticket
 class Ticket(models.Model):
     id = models.AutoField(primary_key=True)  # Unique identifier for the ticket
-    event = models.ForeignKey(Event, on_delete=models.CASCADE)  # Link to the Event model (the event for which the ticket is valid)
+    event = models.ForeignKey(Event, on_delete=models.DO_NOTHING, db_constraint=False)  # Link to the Event model (the event for which the ticket is valid, kept when it is archived)
     attendee = models.ForeignKey(Attendee, on_delete=models.CASCADE, default='')  # Link to the Attendee model
     event_title = models.CharField(max_length=300, default='')  # Event title
     first_name = models.CharField(max_length=100)  # Attendee's first name
@@ -38,6 +56,116 @@ class Ticket(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, default='', related_name='tickets_created')  # Reference User instead of Event
     issued_date = models.DateTimeField(auto_now_add=True)  # Date and time when the ticket was issued
     is_used = models.BooleanField(default=False)  # Indicates if the ticket has been used (default is False)
+    used_at = models.DateTimeField(null=True, blank=True)  # Date and time when the ticket was scanned
+    cancelled_at = models.DateTimeField(null=True, blank=True)  # Date and time when the ticket was revoked by a cancellation
+
+    class Meta:
+        indexes = [
+            # Delta updates of scanner manifests
+            models.Index(fields=['event', 'issued_date'], name='ticket_event_issued_idx'),
+            models.Index(fields=['event', 'used_at'], name='ticket_event_used_idx'),
+            models.Index(fields=['event', 'cancelled_at'], name='ticket_event_cancelled_idx'),
+        ]
+
+    def __str__(self):
+        return f"Ticket with code {self.ticket_code} for {self.first_name} {self.last_name} to {_event_label(self)}"
+
+
+# Model class for a background badge printing job
+class BadgeJob(models.Model):
+    id = models.AutoField(primary_key=True)  # Unique identifier for the job
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='badge_jobs')  # The event whose badges are printed
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='badge_jobs')  # The organizer who started the job
+    format = models.CharField(max_length=10, choices=[  # Output format
+        ('pdf', 'PDF'),
+        ('zip', 'ZIP of PDFs')
+    ], default='pdf')
+    status = models.CharField(max_length=20, choices=[  # Progress of the job
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed')
+    ], default='pending')
+    total = models.PositiveIntegerField(default=0)  # Number of badges to render
+    processed = models.PositiveIntegerField(default=0)  # Number of badges rendered so far
+    file_path = models.CharField(max_length=500, blank=True, default='')  # Where the finished document is stored
+    error = models.TextField(blank=True, default='')  # Failure reason, if any
+    created_at = models.DateTimeField(auto_now_add=True)  # Date and time when the job was started
+    finished_at = models.DateTimeField(null=True, blank=True)  # Date and time when the job finished
+
+    def __str__(self):
+        return f"Badge job {self.id} for {_event_label(self)} ({self.status})"
+
+
+# Model class for hourly registration analytics, maintained incrementally
+class RegistrationRollup(models.Model):
+    id = models.BigAutoField(primary_key=True)  # Unique identifier for the rollup bucket
+    event = models.ForeignKey(Event, on_delete=models.DO_NOTHING, db_constraint=False, related_name='registration_rollups')  # The event the bucket belongs to (kept when it is archived)
+    bucket = models.DateTimeField()  # Start of the hour the counts cover
+    gender = models.CharField(max_length=20)  # Gender of the attendees counted
+    registrations = models.PositiveIntegerField(default=0)  # Registrations made during the hour
+    cancellations = models.PositiveIntegerField(default=0)  # Registrations cancelled during the hour
+    check_ins = models.PositiveIntegerField(default=0)  # Tickets scanned during the hour
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'bucket', 'gender'], name='unique_registration_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} {self.bucket:%Y-%m-%d %H:00} {self.gender}"
+
+
+# Model class for a message an organizer sends to every registrant of an event
+class Broadcast(models.Model):
+    id = models.AutoField(primary_key=True)  # Unique identifier for the broadcast
+    event = models.ForeignKey(Event, on_delete=models.DO_NOTHING, db_constraint=False, related_name='broadcasts')  # The event whose registrants are messaged (kept when it is archived)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='broadcasts')  # The organizer who sent the message
+    subject = models.CharField(max_length=200)  # Subject template
+    message = models.TextField()  # Message template, personalized with $first_name, $last_name and $event_title
+    status = models.CharField(max_length=20, choices=[  # Progress of the delivery
+        ('pending', 'Pending'),
+        ('queuing', 'Queuing recipients'),
+        ('sending', 'Sending'),
+        ('done', 'Done'),
+        ('failed', 'Failed')
+    ], default='pending')
+    total = models.PositiveIntegerField(default=0)  # Number of recipients
+    sent = models.PositiveIntegerField(default=0)  # Number of messages delivered
+    failed = models.PositiveIntegerField(default=0)  # Number of messages given up on
+    error = models.TextField(blank=True, default='')  # Failure reason, if any
+    created_at = models.DateTimeField(auto_now_add=True)  # Date and time when the broadcast was requested
+    finished_at = models.DateTimeField(null=True, blank=True)  # Date and time when the last message was handled
+
+    def __str__(self):
+        return f"Broadcast {self.id} for {_event_label(self)} ({self.status})"
+
+
+# Model class for the delivery of a broadcast to one registrant
+class BroadcastDelivery(models.Model):
+    id = models.BigAutoField(primary_key=True)  # Unique identifier for the delivery
+    broadcast = models.ForeignKey(Broadcast, on_delete=models.CASCADE, related_name='deliveries')  # The broadcast delivered
+    event = models.ForeignKey(Event, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')  # The event of the registrant (attendees are partitioned by event)
+    attendee = models.ForeignKey(Attendee, on_delete=models.CASCADE, db_constraint=False)  # The registrant messaged (no database constraint, which a partitioned attendee table could not carry)
+    email = models.EmailField()  # Address the message goes to, as registered when the broadcast was queued
+    status = models.CharField(max_length=20, choices=[  # Delivery status
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed')
+    ], default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)  # Number of sends tried
+    sent_at = models.DateTimeField(null=True, blank=True)  # Date and time when the message was delivered
+    error = models.CharField(max_length=500, blank=True, default='')  # Reason of the last failed attempt
+
+    class Meta:
+        constraints = [
+            # Queuing again after a crash never adds a recipient twice
+            models.UniqueConstraint(fields=['broadcast', 'attendee'], name='unique_broadcast_delivery'),
+        ]
+        indexes = [
+            # Resuming from the first undelivered recipient
+            models.Index(fields=['broadcast', 'status', 'id'], name='delivery_broadcast_status_idx'),
+        ]
 
     def __str__(self):
-        return f"Ticket with code {self.ticket_code} for {self.first_name} {self.last_name} to {self.event.title}"
+        return f"Broadcast {self.broadcast_id} to {self.email} ({self.status})"
@@ -0,0 +1,426 @@
+"""
+PostgreSQL range partitioning of attendees and tickets by event id.
+
+Registrations are only ever looked up within an event (duplicate checks,
+attendee lists, manifests, signed ticket scans), so partitioning on `event_id`
+lets PostgreSQL prune to one partition and keeps each partition's indexes
+small however many past events accumulate. Each partition covers a fixed range
+of event ids (`{table}_e{lower}_{upper}`); a default partition catches rows
+outside every range until `ensure_partitions` creates the range for them.
+
+Partitioned tables need the partition key in every unique constraint, so the
+primary keys become (id, event_id), ticket codes are unique per event rather
+than globally (random and signed codes do not collide in practice) and tickets
+reference attendees through (attendee_id, event_id). Lookups that know the
+event prune to one partition; lookups by ticket code alone probe every
+partition's index.
+
+Cold partitions, whose events all ended long ago or no longer exist, can be
+detached (kept as standalone tables outside the hot table) or exported to
+gzipped CSV files and dropped, and brought back later with `restore_partition`.
+Archived events keep their registrations under their former id, so a range
+counts as cold only once its archived events ended long ago too, and
+restoring such an archive brings its registrations back only after its range
+is restored.
+
+Schema changes to the partitioned tables must be applied by hand; Django's
+migrations only know the unpartitioned layout.
+"""
+import gzip
+import os
+import re
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from apps.events.models import Archive, Event
+from .models import Attendee, Ticket
+
+# Attendees first: tickets reference them
+PARTITIONED_MODELS = (Attendee, Ticket)
+PARTITION_KEY = 'event_id'
+# Event ids per partition
+DEFAULT_PARTITION_SIZE = 10000
+# Partitions kept ready beyond the newest event
+DEFAULT_AHEAD = 2
+# Foreign key from tickets to the partitioned attendee table
+TICKET_ATTENDEE_KEY = 'registrations_ticket_attendee_event_fk'
+
+_BOUNDS = re.compile(r"FOR VALUES FROM \('?(\d+)'?\) TO \('?(\d+)'?\)")
+
+
+class PartitioningError(Exception):
+    pass
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _fetch(sql, params=None):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _execute(*statements):
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def check_supported():
+    if connection.vendor != 'postgresql':
+        raise PartitioningError('Partitioning needs PostgreSQL')
+
+
+def is_partitioned(model):
+    rows = _fetch("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [model._meta.db_table])
+    return bool(rows) and rows[0][0] == 'p'
+
+
+def partition_name(model, lower, upper):
+    return f'{model._meta.db_table}_e{lower}_{upper}'
+
+
+def partitions(model):
+    """
+    List the partitions of a model's table.
+
+    :return: (name, lower, upper) tuples ordered by range; the default partition has None bounds and comes last
+    """
+    rows = _fetch(
+        "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid WHERE pg_inherits.inhparent = to_regclass(%s)",
+        [model._meta.db_table]
+    )
+    ranged, default = [], []
+    for name, bound in rows:
+        match = _BOUNDS.search(bound)
+        if match:
+            ranged.append((name, int(match.group(1)), int(match.group(2))))
+        else:
+            default.append((name, None, None))
+    return sorted(ranged, key=lambda partition: partition[1]) + default
+
+
+def partition_sizes(model):
+    """Return {partition name: (estimated rows, bytes on disk)} from the catalog statistics."""
+    return {
+        name: (max(int(rows), 0), size)
+        for name, rows, size in _fetch(
+            "SELECT child.relname, child.reltuples, pg_total_relation_size(child.oid) FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid WHERE pg_inherits.inhparent = to_regclass(%s)",
+            [model._meta.db_table]
+        )
+    }
+
+
+def next_event_id():
+    """The id the next event will get (a lower bound while other transactions insert)."""
+    table = Event._meta.db_table
+    rows = _fetch(
+        f"SELECT GREATEST((SELECT last_value FROM pg_sequences WHERE schemaname || '.' || sequencename = "
+        f"pg_get_serial_sequence(%s, 'id')), (SELECT MAX(id) FROM {_quote(table)}), 0) + 1",
+        [table]
+    )
+    return rows[0][0]
+
+
+def _constraints(table):
+    return _fetch(
+        "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s)",
+        [table]
+    )
+
+
+def _plain_indexes(table):
+    # Indexes not backing a primary key or unique constraint
+    return _fetch(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN "
+        "(SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'u'))",
+        [table, table]
+    )
+
+
+def _with_partition_key(definition):
+    # 'PRIMARY KEY (id)' -> 'PRIMARY KEY (id, event_id)'
+    return re.sub(r'\)$', f', {PARTITION_KEY})', definition, count=1)
+
+
+def _convert_table(model, partition_size, upper):
+    table = model._meta.db_table
+    old = f'{table}_unpartitioned'
+    incoming = _fetch(
+        "SELECT conrelid::regclass::text FROM pg_constraint WHERE contype = 'f' AND confrelid = to_regclass(%s) "
+        "AND conrelid <> confrelid", [table]
+    )
+    others = {name for (name,) in incoming} - {other._meta.db_table for other in PARTITIONED_MODELS}
+    if others:
+        raise PartitioningError(f'{table} is referenced by {", ".join(sorted(others))}')
+
+    constraints = _constraints(table)
+    indexes = _plain_indexes(table)
+    sequence = _fetch("SELECT pg_get_serial_sequence(%s, 'id')", [table])[0][0]
+
+    _execute(
+        f'ALTER TABLE {_quote(table)} RENAME TO {_quote(old)}',
+        f'CREATE TABLE {_quote(table)} (LIKE {_quote(old)} INCLUDING DEFAULTS INCLUDING IDENTITY '
+        f'INCLUDING CONSTRAINTS) PARTITION BY RANGE ({PARTITION_KEY})',
+    )
+    for lower in range(0, upper, partition_size):
+        _execute(
+            f'CREATE TABLE {_quote(partition_name(model, lower, lower + partition_size))} '
+            f'PARTITION OF {_quote(table)} FOR VALUES FROM ({lower}) TO ({lower + partition_size})'
+        )
+    _execute(
+        f'CREATE TABLE {_quote(table + "_default")} PARTITION OF {_quote(table)} DEFAULT',
+        f'INSERT INTO {_quote(table)} OVERRIDING SYSTEM VALUE SELECT * FROM {_quote(old)}',
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+        f"COALESCE((SELECT MAX(id) FROM {_quote(table)}), 0) + 1, false)",
+        f'DROP TABLE {_quote(old)} CASCADE',
+    )
+    new_sequence = _fetch("SELECT pg_get_serial_sequence(%s, 'id')", [table])[0][0]
+    if sequence and new_sequence != sequence:
+        # The new identity sequence takes over the old one's name
+        _execute(f'ALTER SEQUENCE {new_sequence} RENAME TO {sequence.rsplit(".", 1)[-1]}')
+
+    for name, kind, definition in constraints:
+        if kind in ('p', 'u'):
+            definition = _with_partition_key(definition)
+        elif kind == 'f' and any(
+            definition.split('REFERENCES ')[1].startswith(other._meta.db_table + '(') for other in PARTITIONED_MODELS
+        ):
+            # Re-created against the partitioned table by _link_tickets
+            continue
+        elif kind != 'f':
+            # CHECK constraints came along with LIKE
+            continue
+        _execute(f'ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(name)} {definition}')
+    for name, definition in indexes:
+        _execute(re.sub(rf' ON (\S+\.)?{old} ', f' ON {_quote(table)} ', definition, count=1))
+
+
+def _link_tickets():
+    """Make tickets reference attendees by (attendee_id, event_id), as the attendee key requires."""
+    if _fetch("SELECT 1 FROM pg_constraint WHERE conname = %s", [TICKET_ATTENDEE_KEY]):
+        return
+    _execute(
+        f'ALTER TABLE {_quote(Ticket._meta.db_table)} ADD CONSTRAINT {_quote(TICKET_ATTENDEE_KEY)} '
+        f'FOREIGN KEY (attendee_id, {PARTITION_KEY}) REFERENCES {_quote(Attendee._meta.db_table)} '
+        f'(id, {PARTITION_KEY}) DEFERRABLE INITIALLY DEFERRED'
+    )
+
+
+def _target_upper(partition_size, ahead):
+    return (next_event_id() // partition_size + 1 + ahead) * partition_size
+
+
+def convert(partition_size=DEFAULT_PARTITION_SIZE, ahead=DEFAULT_AHEAD):
+    """
+    Turn the attendee and ticket tables into partitioned tables, moving their rows.
+
+    Runs in one transaction and holds exclusive locks on both tables while the
+    rows are copied, so run it in a maintenance window. Tables that are
+    already partitioned are left alone.
+
+    :param partition_size: Event ids per partition
+    :param ahead: Empty partitions to create beyond the newest event
+    :return: The models that were converted
+    """
+    check_supported()
+    converted = []
+    with transaction.atomic():
+        upper = _target_upper(partition_size, ahead)
+        for model in PARTITIONED_MODELS:
+            if not is_partitioned(model):
+                _convert_table(model, partition_size, upper)
+                converted.append(model)
+        if is_partitioned(Attendee):
+            _link_tickets()
+    return converted
+
+
+def _partition_size(model):
+    ranged = [partition for partition in partitions(model) if partition[1] is not None]
+    return ranged[-1][2] - ranged[-1][1] if ranged else DEFAULT_PARTITION_SIZE
+
+
+def _add_partition(lower, upper):
+    """Create the partitions of a range, moving any rows the default partitions hold for it."""
+    names = [partition_name(model, lower, upper) for model in PARTITIONED_MODELS]
+    stray = _fetch(
+        f'SELECT 1 FROM {_quote(Attendee._meta.db_table + "_default")} WHERE {PARTITION_KEY} >= %s '
+        f'AND {PARTITION_KEY} < %s LIMIT 1', [lower, upper]
+    )
+    if not stray:
+        for model, name in zip(PARTITIONED_MODELS, names):
+            _execute(
+                f'CREATE TABLE {_quote(name)} PARTITION OF {_quote(model._meta.db_table)} '
+                f'FOR VALUES FROM ({lower}) TO ({upper})'
+            )
+        return names
+
+    # Rows cannot change partitions under the ticket -> attendee key, so it is dropped while they move.
+    # Re-adding it validates every ticket; this only happens when events outran the partitions.
+    _execute(f'ALTER TABLE {_quote(Ticket._meta.db_table)} DROP CONSTRAINT {_quote(TICKET_ATTENDEE_KEY)}')
+    for model, name in zip(PARTITIONED_MODELS, names):
+        _execute(
+            f'CREATE TABLE {_quote(name)} (LIKE {_quote(model._meta.db_table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+            f'WITH moved AS (DELETE FROM {_quote(model._meta.db_table + "_default")} WHERE {PARTITION_KEY} >= {lower} '
+            f'AND {PARTITION_KEY} < {upper} RETURNING *) INSERT INTO {_quote(name)} SELECT * FROM moved',
+            f'ALTER TABLE {_quote(model._meta.db_table)} ATTACH PARTITION {_quote(name)} '
+            f'FOR VALUES FROM ({lower}) TO ({upper})',
+        )
+    _link_tickets()
+    return names
+
+
+def ensure_partitions(ahead=DEFAULT_AHEAD, partition_size=None):
+    """
+    Create the partitions needed for new events, keeping `ahead` empty ones ready.
+
+    :param ahead: Partitions to keep beyond the one the newest event falls in
+    :param partition_size: Event ids per new partition (defaults to the size of the last one)
+    :return: Names of the partitions created
+    """
+    check_supported()
+    if not is_partitioned(Attendee):
+        return []
+    size = partition_size or _partition_size(Attendee)
+    ranged = [partition for partition in partitions(Attendee) if partition[1] is not None]
+    lower = ranged[-1][2] if ranged else 0
+    created = []
+    with transaction.atomic():
+        target = _target_upper(size, ahead)
+        while lower < target:
+            created.extend(_add_partition(lower, lower + size))
+            lower += size
+    return created
+
+
+def cold_partitions(days):
+    """
+    Find the ranges whose events, live or archived, all ended more than `days` ago (or no longer exist).
+
+    Event end dates are stored as 'YYYY-MM-DD' text, which compares correctly as a string.
+
+    :return: (lower, upper) ranges, oldest first
+    """
+    check_supported()
+    cutoff = (date.today() - timedelta(days=days)).isoformat()
+    first_unassigned = next_event_id()
+    ranges = []
+    for name, lower, upper in partitions(Attendee):
+        if lower is None or upper > first_unassigned:
+            # Still receiving events
+            continue
+        if not Event.objects.filter(id__gte=lower, id__lt=upper, end_date__gte=cutoff).exists() and not (
+            Archive.objects.filter(former_event_id__gte=lower, former_event_id__lt=upper, end_date__gte=cutoff).exists()
+        ):
+            ranges.append((lower, upper))
+    return ranges
+
+
+def _drop_foreign_keys(table):
+    for name, kind, _ in _constraints(table):
+        if kind == 'f':
+            # Cold rows must not block deleting the events and attendees they point at
+            _execute(f'ALTER TABLE {_quote(table)} DROP CONSTRAINT {_quote(name)}')
+
+
+def detach_partition(lower, upper):
+    """
+    Detach the attendee and ticket partitions of a range; they stay in the database as standalone tables.
+
+    :return: Names of the detached tables
+    """
+    check_supported()
+    detached = []
+    with transaction.atomic():
+        # Tickets first: they reference attendees
+        for model in reversed(PARTITIONED_MODELS):
+            name = partition_name(model, lower, upper)
+            _execute(f'ALTER TABLE {_quote(model._meta.db_table)} DETACH PARTITION {_quote(name)}')
+            _drop_foreign_keys(name)
+            detached.append(name)
+    return detached
+
+
+def cold_storage_root():
+    return getattr(settings, 'COLD_STORAGE_ROOT', os.path.join(settings.BASE_DIR, 'cold_storage'))
+
+
+def _export_path(name):
+    return os.path.join(cold_storage_root(), f'{name}.csv.gz')
+
+
+def export_partition(lower, upper):
+    """
+    Detach the partitions of a range, write their rows to gzipped CSV files and drop them.
+
+    :return: Paths of the files written
+    """
+    check_supported()
+    os.makedirs(cold_storage_root(), exist_ok=True)
+    paths = []
+    with transaction.atomic():
+        for name in detach_partition(lower, upper):
+            path = _export_path(name)
+            with gzip.open(path + '.part', 'wb') as handle, connection.cursor() as cursor:
+                cursor.copy_expert(f'COPY {_quote(name)} TO STDOUT WITH (FORMAT csv, HEADER)', handle)
+            os.replace(path + '.part', path)
+            _execute(f'DROP TABLE {_quote(name)}')
+            paths.append(path)
+    return paths
+
+
+def restore_partition(lower, upper):
+    """
+    Bring the range back into the hot tables, from detached tables or exported files.
+
+    Rows whose event (or attendee) was deleted in the meantime are discarded; rows of archived events are
+    kept for the archive to attach again.
+
+    :return: Names of the partitions restored
+    """
+    check_supported()
+    restored = []
+    with transaction.atomic():
+        for model in PARTITIONED_MODELS:
+            table = model._meta.db_table
+            name = partition_name(model, lower, upper)
+            if not _fetch("SELECT 1 FROM pg_class WHERE oid = to_regclass(%s)", [name]):
+                path = _export_path(name)
+                if not os.path.exists(path):
+                    raise PartitioningError(f'{name} is neither a table nor exported to {path}')
+                _execute(f'CREATE TABLE {_quote(name)} (LIKE {_quote(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+                with gzip.open(path, 'rb') as handle, connection.cursor() as cursor:
+                    cursor.copy_expert(f'COPY {_quote(name)} FROM STDIN WITH (FORMAT csv, HEADER)', handle)
+            _execute(
+                f'DELETE FROM {_quote(name)} cold WHERE NOT EXISTS '
+                f'(SELECT 1 FROM {_quote(Event._meta.db_table)} event WHERE event.id = cold.{PARTITION_KEY}) '
+                f'AND NOT EXISTS (SELECT 1 FROM {_quote(Archive._meta.db_table)} archive '
+                f'WHERE archive.former_event_id = cold.{PARTITION_KEY})'
+            )
+            if model is Ticket:
+                _execute(
+                    f'DELETE FROM {_quote(name)} cold WHERE NOT EXISTS (SELECT 1 FROM {_quote(Attendee._meta.db_table)} '
+                    f'attendee WHERE attendee.id = cold.attendee_id AND attendee.{PARTITION_KEY} = cold.{PARTITION_KEY})'
+                )
+            _execute(f'ALTER TABLE {_quote(table)} ATTACH PARTITION {_quote(name)} FOR VALUES FROM ({lower}) TO ({upper})')
+            restored.append(name)
+    for model in PARTITIONED_MODELS:
+        path = _export_path(partition_name(model, lower, upper))
+        if os.path.exists(path):
+            os.remove(path)
+    return restored
+
+
+def parse_range(name):
+    """Parse the 'lower-upper' range of a partition name or argument."""
+    match = re.search(r'(\d+)[-_](\d+)$', name)
+    if not match:
+        raise PartitioningError(f'Not a partition range: {name}')
+    return int(match.group(1)), int(match.group(2))
@@ -0,0 +1,163 @@
+"""
+Server-side QR code rendering for tickets.
+
+Ticket codes never change, so a rendering is fully determined by
+(code, format, size): results are cached and served with a deterministic
+ETag. A cancellation revokes its ticket, so renderings are dropped from the
+cache then and every request checks that the ticket is still valid.
+"""
+import hashlib
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.cache import cache
+
+# Bump when the rendering changes so cached images and ETags are invalidated
+RENDER_VERSION = 1
+FORMATS = {
+    'svg': 'image/svg+xml',
+    'png': 'image/png',
+}
+SIZES = (128, 256, 512, 1024)
+DEFAULT_SIZE = 256
+CACHE_TIMEOUT = 60 * 60 * 24
+
+TICKET_URL = "https://schedo.vercel.app/ticket/{}"
+
+
+def ticket_url(ticket_code):
+    """Return the public URL encoded in a ticket's QR code."""
+    return TICKET_URL.format(ticket_code)
+
+
+def qr_matrix(data):
+    """Return the QR module matrix (including the quiet zone) as a list of rows of booleans."""
+    import qrcode
+
+    code = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=4)
+    code.add_data(data)
+    code.make(fit=True)
+    return code.get_matrix()
+
+
+def _dark_runs(row):
+    """Yield (start, length) of consecutive dark modules in a row."""
+    start = None
+    for x, dark in enumerate(row):
+        if dark and start is None:
+            start = x
+        elif not dark and start is not None:
+            yield start, x - start
+            start = None
+    if start is not None:
+        yield start, len(row) - start
+
+
+def render_svg(matrix, size):
+    modules = len(matrix)
+    path = ''.join(
+        f'M{x} {y}h{length}v1h-{length}z'
+        for y, row in enumerate(matrix)
+        for x, length in _dark_runs(row)
+    )
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {modules} {modules}" shape-rendering="crispEdges">'
+        f'<rect width="{modules}" height="{modules}" fill="#fff"/><path d="{path}" fill="#000"/></svg>'
+    ).encode()
+
+
+def _png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def render_png(matrix, size):
+    """Encode the matrix as a 1-bit greyscale PNG of exactly `size` pixels square."""
+    modules = len(matrix)
+    scale = max(1, size // modules)
+    size = max(size, modules)
+    # Spread the remainder into the (white) quiet zone so the image is exactly `size` wide
+    offset = (size - modules * scale) // 2
+    row_bytes = (size + 7) // 8
+    raw = bytearray()
+    for row in matrix:
+        # Bits are 1 for white; build the scaled scanline as one big integer
+        bits = (1 << size) - 1
+        for x, length in _dark_runs(row):
+            start = offset + x * scale
+            run = ((1 << (length * scale)) - 1) << (size - start - length * scale)
+            bits &= ~run
+        scanline = b'\0' + (bits << (row_bytes * 8 - size)).to_bytes(row_bytes, 'big')
+        raw += scanline * scale
+    white = b'\0' + b'\xff' * row_bytes
+    padding = white * offset
+    raw = padding + raw + white * (size - offset - modules * scale)
+    return b''.join((
+        b'\x89PNG\r\n\x1a\n',
+        _png_chunk(b'IHDR', struct.pack('>IIBBBBB', size, size, 1, 0, 0, 0, 0)),
+        _png_chunk(b'IDAT', zlib.compress(bytes(raw), 9)),
+        _png_chunk(b'IEND', b''),
+    ))
+
+
+def render(ticket_code, fmt, size):
+    """
+    Render the QR code of a ticket.
+
+    :param ticket_code: The ticket code
+    :param fmt: 'svg' or 'png'
+    :param size: Target width/height in pixels
+    :return: The encoded image bytes
+    """
+    matrix = qr_matrix(ticket_url(ticket_code))
+    if fmt == 'svg':
+        return render_svg(matrix, size)
+    return render_png(matrix, size)
+
+
+def _cache_key(ticket_code, fmt, size):
+    digest = hashlib.sha256(ticket_code.encode()).hexdigest()
+    return f'qr:{RENDER_VERSION}:{fmt}:{size}:{digest}'
+
+
+def etag(ticket_code, fmt, size):
+    """Return the strong ETag of a rendering; it only depends on the request parameters."""
+    return '"{}"'.format(hashlib.sha256(_cache_key(ticket_code, fmt, size).encode()).hexdigest()[:32])
+
+
+def render_cached(ticket_code, fmt, size):
+    """Return the rendering from the cache, rendering and storing it on a miss."""
+    key = _cache_key(ticket_code, fmt, size)
+    image = cache.get(key)
+    if image is None:
+        image = render(ticket_code, fmt, size)
+        cache.set(key, image, CACHE_TIMEOUT)
+    return image
+
+
+def forget(ticket_codes):
+    """Drop the cached renderings of revoked tickets."""
+    cache.delete_many([
+        _cache_key(code, fmt, size) for code in ticket_codes for fmt in FORMATS for size in SIZES
+    ])
+
+
+def _render_args(args):
+    return render(*args)
+
+
+def render_many(ticket_codes, fmt, size, workers=None, chunksize=64):
+    """
+    Render many QR codes in a process pool (e.g. for badge printing).
+
+    :param ticket_codes: A list of ticket codes
+    :param fmt: 'svg' or 'png'
+    :param size: Target width/height in pixels
+    :param workers: Number of worker processes (defaults to the CPU count)
+    :return: A list of image bytes in the order of `ticket_codes`
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(
+            _render_args, [(code, fmt, size) for code in ticket_codes], chunksize=chunksize
+        ))
@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import Attendee, Ticket
+from .models import Attendee, Ticket, BadgeJob, Broadcast
+from .broadcasts import PLACEHOLDERS, unknown_placeholders
+from schedoserver.serializers import ValuesSerializer
 
 class AttendeeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -13,3 +15,52 @@ class TicketSerializer(serializers.ModelSerializer):
         fields = ['id', 'event', 'attendee', 'event_title', 'first_name', 'last_name', 'ticket_code', 'issued_date', 'is_used', 'created_by']
         read_only_fields = ['id', 'issued_date']
 
+class AttendeeValuesSerializer(ValuesSerializer):
+    """Read-only AttendeeSerializer for lists, built from value rows."""
+    model_serializer = AttendeeSerializer
+
+class TicketValuesSerializer(ValuesSerializer):
+    """Read-only TicketSerializer for lists, built from value rows."""
+    model_serializer = TicketSerializer
+
+class BadgeJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BadgeJob
+        fields = ['id', 'event', 'format', 'status', 'total', 'processed', 'progress', 'error', 'created_at', 'finished_at']
+        read_only_fields = fields
+
+    def get_progress(self, obj):
+        """Return the share of badges rendered, between 0 and 1."""
+        if obj.status == 'done':
+            return 1.0
+        return round(obj.processed / obj.total, 4) if obj.total else 0.0
+
+
+class BroadcastSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Broadcast
+        fields = [
+            'id', 'event', 'subject', 'message', 'status', 'total', 'sent', 'failed', 'progress', 'error',
+            'created_at', 'finished_at'
+        ]
+        read_only_fields = [
+            'id', 'event', 'status', 'total', 'sent', 'failed', 'error', 'created_at', 'finished_at'
+        ]
+
+    def validate(self, attrs):
+        unknown = unknown_placeholders(attrs.get('subject', ''), attrs.get('message', ''))
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown placeholders: {', '.join(unknown)} (available: {', '.join(PLACEHOLDERS)})"
+            )
+        return attrs
+
+    def get_progress(self, obj):
+        """Return the share of recipients handled (delivered or given up on), between 0 and 1."""
+        if obj.status == 'done':
+            return 1.0
+        return round((obj.sent + obj.failed) / obj.total, 4) if obj.total else 0.0
@@ -1,3 +1,776 @@
-from django.test import TestCase
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+import zipfile
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from apps.accounts.models import User
+from apps.events.archiving import archive_events, restore_archives
+from apps.events.models import Archive, Event
+from schedoserver.renderers import dumps
+from schedoserver.throttling import SlidingWindowThrottle
+from . import analytics, badges, broadcasts, live, partitioning, qr, signing
+from .email_service import EmailServices
+from .manifest import build_manifest, ticket_hash
+from .models import Attendee, BadgeJob, Broadcast, BroadcastDelivery, RegistrationRollup, Ticket
+from .serializers import AttendeeSerializer, AttendeeValuesSerializer, TicketSerializer, TicketValuesSerializer
+
+
+class RegistrationTestCase(TestCase):
+    """Base class: an organizer with a token and a capacity-limited event, with emails and rate limits off."""
+    capacity = 1
+
+    def setUp(self):
+        for patcher in (
+            mock.patch.object(EmailServices, 'send_email', return_value=True),
+            mock.patch.object(SlidingWindowThrottle, 'allow_request', return_value=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.organizer = User.objects.create(email='organizer@example.com')
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=self.organizer).key}'}
+        self.event = Event.objects.create(
+            title='Workshop', description='Hands-on', location='Accra', category='Tech', start_date='2030-01-01',
+            end_date='2030-01-01', start_time='10:00', end_time='18:00', created_by=self.organizer,
+            capacity=self.capacity,
+        )
+
+    def register(self, email, **extra):
+        return self.client.post('/registrations/attendee/create/', {
+            'email': email, 'first_name': 'Ama', 'last_name': 'Mensah', 'phone_number': '0200000000',
+            'gender': 'female', 'event': self.event.id,
+        }, **extra)
+
+    def ticket_of(self, email):
+        return Ticket.objects.get(attendee__email=email, attendee__event=self.event, cancelled_at__isnull=True)
+
+
+class CancellationTests(RegistrationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.assertEqual(self.register('first@example.com').status_code, 201)
+        self.assertTrue(self.register('second@example.com').json()['waitlisted'])
+        self.code = self.ticket_of('first@example.com').ticket_code
+        response = self.client.post(f'/registrations/ticket/{self.code}/cancel/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_cancelled_ticket_is_revoked_not_deleted(self):
+        ticket = Ticket.objects.get(ticket_code=self.code)
+        self.assertIsNotNone(ticket.cancelled_at)
+        self.assertEqual(Attendee.objects.get(pk=ticket.attendee_id).status, 'cancelled')
+        # The seat went to the waitlist
+        self.assertEqual(Attendee.objects.get(email='second@example.com').status, 'confirmed')
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 1)
+
+    def test_revoked_ticket_no_longer_scans_renders_or_cancels(self):
+        scan = self.client.get(f'/registrations/ticket/scan/{self.code}/', **self.auth)
+        self.assertEqual(scan.json()['status'], 'Not Registered')
+        self.assertEqual(self.client.get(f'/registrations/ticket/{self.code}/').json()['message'],
+                         'Ticket has been cancelled')
+        self.assertEqual(self.client.get(f'/registrations/ticket/{self.code}/qr.svg').status_code, 404)
+        self.assertEqual(self.client.post(f'/registrations/ticket/{self.code}/cancel/').status_code, 400)
+
+    def test_cancelled_registrant_can_register_again(self):
+        response = self.register('first@example.com')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.json()['waitlisted'])
+        self.assertEqual(self.register('first@example.com').status_code, 400)
+
+
+class CheckInTests(RegistrationTestCase):
+    def test_a_ticket_checks_in_once(self):
+        self.register('guest@example.com')
+        code = self.ticket_of('guest@example.com').ticket_code
+        scans = [self.client.get(f'/registrations/ticket/scan/{code}/', **self.auth).json()['status']
+                 for _ in range(2)]
+        self.assertEqual(scans, ['Registered', 'Ticket used'])
+        self.assertEqual(RegistrationRollup.objects.aggregate(Sum('check_ins'))['check_ins__sum'], 1)
+
+
+class LiveUpdateTests(RegistrationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.broadcaster = live.Broadcaster(live.InProcessBackend())
+        patcher = mock.patch.object(live, '_broadcaster', self.broadcaster)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def listen(self, event_ids, publish, count):
+        """Subscribe to events, run `publish`, and return the first event's first `count` updates and the queues."""
+        async def run():
+            queues = [self.broadcaster.subscribe(event_id) for event_id in event_ids]
+            publish()
+            updates = [await asyncio.wait_for(queues[0].get(), 1) for _ in range(count)]
+            return updates, queues
+
+        return asyncio.run(run())
+
+    def test_registrations_check_ins_and_cancellations_are_published_after_commit(self):
+        with mock.patch.object(live.InProcessBackend, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.register('first@example.com')
+                self.register('second@example.com')
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(f"/registrations/ticket/{self.ticket_of('first@example.com').ticket_code}/cancel/")
+            with self.captureOnCommitCallbacks(execute=True):
+                code = self.ticket_of('second@example.com').ticket_code
+                self.client.get(f'/registrations/ticket/scan/{code}/', **self.auth)
+        messages = [json.loads(call.args[0]) for call in publish.call_args_list]
+        # The waitlisted registration only counts once it is promoted
+        self.assertEqual([(message['kind'], message['delta']) for message in messages], [
+            ('registrations', 1), ('registrations', -1), ('registrations', 1), ('check_ins', 1),
+        ])
+        self.assertEqual({message['event'] for message in messages}, {self.event.id})
+
+    def test_subscribers_get_the_deltas_of_their_event_with_totals(self):
+        self.register('first@example.com')
+        self.assertEqual(self.broadcaster.totals(self.event.id), {'registrations': 1, 'check_ins': 0})
+
+        def publish():
+            self.broadcaster.publish(self.event.id + 1, 'registrations')
+            self.broadcaster.publish(self.event.id, 'registrations')
+            self.broadcaster.publish(self.event.id, 'check_ins')
+
+        updates, [_, other] = self.listen([self.event.id, self.event.id + 1], publish, 2)
+        self.assertEqual([update['totals'] for update in updates], [
+            {'registrations': 2, 'check_ins': 0}, {'registrations': 2, 'check_ins': 1},
+        ])
+        self.assertEqual(other.qsize(), 1)
+
+    def test_a_slow_subscriber_loses_the_oldest_updates(self):
+        def publish():
+            for delta in range(1, 5):
+                self.broadcaster.publish(self.event.id, 'registrations', delta)
+
+        with mock.patch.object(live, 'SUBSCRIBER_QUEUE_SIZE', 2):
+            updates, _ = self.listen([self.event.id], publish, 2)
+        self.assertEqual([update['delta'] for update in updates], [3, 4])
+
+    def test_totals_are_reloaded_once_the_last_subscriber_leaves(self):
+        self.broadcaster.totals(self.event.id)
+        _, [queue] = self.listen([self.event.id], lambda: None, 0)
+        self.register('first@example.com')
+        self.assertEqual(self.broadcaster.totals(self.event.id)['registrations'], 0)
+        self.broadcaster.unsubscribe(self.event.id, queue)
+        self.assertEqual(self.broadcaster.totals(self.event.id)['registrations'], 1)
+
+
+class QRCodeTests(RegistrationTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.register('guest@example.com')
+        self.code = self.ticket_of('guest@example.com').ticket_code
+        self.matrix = qr.qr_matrix(qr.ticket_url(self.code))
+
+    def fetch(self, fmt='png', params=None, **headers):
+        return self.client.get(f'/registrations/ticket/{self.code}/qr.{fmt}', params, **headers)
+
+    @staticmethod
+    def read_png(image):
+        """Decode a 1-bit greyscale PNG into (size, rows of booleans that are True for black)."""
+        position, data, size = 8, b'', None
+        while position < len(image):
+            length, kind = struct.unpack('>I4s', image[position:position + 8])
+            chunk = image[position + 8:position + 8 + length]
+            if kind == b'IHDR':
+                size = struct.unpack('>II', chunk[:8])
+            elif kind == b'IDAT':
+                data += chunk
+            position += length + 12
+        width, height = size
+        raw, stride = zlib.decompress(data), (width + 7) // 8 + 1
+        rows = []
+        for y in range(height):
+            line = raw[y * stride + 1:(y + 1) * stride]
+            rows.append([not line[x // 8] >> (7 - x % 8) & 1 for x in range(width)])
+        return size, rows
+
+    def test_png_modules_land_on_the_pixel_grid(self):
+        for size in (256, 1024):
+            (width, height), pixels = self.read_png(qr.render(self.code, 'png', size))
+            self.assertEqual((width, height), (size, size))
+            modules = len(self.matrix)
+            scale = size // modules
+            offset = (size - modules * scale) // 2
+            decoded = [[pixels[offset + y * scale + scale // 2][offset + x * scale + scale // 2]
+                        for x in range(modules)] for y in range(modules)]
+            self.assertEqual(decoded, self.matrix)
+
+    def test_svg_paths_cover_the_dark_modules(self):
+        svg = qr.render(self.code, 'svg', 128).decode()
+        modules = len(self.matrix)
+        self.assertIn(f'width="128" height="128" viewBox="0 0 {modules} {modules}"', svg)
+        decoded = [[False] * modules for _ in range(modules)]
+        for x, y, length in re.findall(r'M(\d+) (\d+)h(\d+)', svg):
+            for column in range(int(x), int(x) + int(length)):
+                decoded[int(y)][column] = True
+        self.assertEqual(decoded, self.matrix)
+
+    def test_renderings_are_cached_and_revalidated(self):
+        with mock.patch.object(qr, 'render', wraps=qr.render) as render:
+            first = self.fetch()
+            second = self.fetch()
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual((first['Content-Type'], first.content), ('image/png', second.content))
+        self.assertEqual(self.fetch(HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertNotEqual(self.fetch('svg')['ETag'], first['ETag'])
+
+        self.assertEqual(self.fetch('gif').status_code, 404)
+        self.assertEqual(self.fetch(params={'size': 300}).status_code, 400)
+
+    def test_cancellation_drops_the_cached_renderings(self):
+        self.fetch()
+        self.fetch('svg', {'size': 512})
+        keys = [qr._cache_key(self.code, fmt, size) for fmt, size in (('png', 256), ('svg', 512))]
+        self.assertEqual(len(cache.get_many(keys)), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/registrations/ticket/{self.code}/cancel/')
+        self.assertEqual(cache.get_many(keys), {})
+        self.assertEqual(self.fetch().status_code, 404)
+
+
+class AnalyticsTests(RegistrationTestCase):
+    capacity = 3
+
+    def setUp(self):
+        super().setUp()
+        for name, gender in (('ama', 'female'), ('kofi', 'male'), ('sena', 'other'), ('esi', 'female')):
+            self.assertEqual(self.register(f'{name}@example.com', gender=gender).status_code, 201)
+        # Esi was waitlisted and takes Ama's seat
+        self.client.post(f"/registrations/ticket/{self.ticket_of('ama@example.com').ticket_code}/cancel/")
+        for name in ('kofi', 'esi'):
+            self.client.get(f"/registrations/ticket/scan/{self.ticket_of(f'{name}@example.com').ticket_code}/",
+                            **self.auth)
+
+    def register(self, email, gender='female', **extra):
+        return self.client.post('/registrations/attendee/create/', {
+            'email': email, 'first_name': 'Ama', 'last_name': 'Mensah', 'phone_number': '0200000000',
+            'gender': gender, 'event': self.event.id,
+        }, **extra)
+
+    def rollups(self):
+        return list(RegistrationRollup.objects.order_by('bucket', 'gender').values(
+            'event_id', 'bucket', 'gender', 'registrations', 'cancellations', 'check_ins'
+        ))
+
+    def timeline(self, **params):
+        response = self.client.get(f'/registrations/analytics/{self.event.id}/timeline/', params, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return [(bucket['registrations'], bucket['cancellations'], bucket['check_ins'])
+                for bucket in response.json()['timeline']]
+
+    def test_rollups_on_write_match_a_rebuild(self):
+        on_write = self.rollups()
+        self.assertEqual(analytics.rebuild_rollups([self.event.id]), len(on_write))
+        self.assertEqual(self.rollups(), on_write)
+
+    def test_summary(self):
+        response = self.client.get(f'/registrations/analytics/{self.event.id}/', **self.auth)
+        self.assertEqual(response.json()['analytics'], {
+            'event': self.event.id,
+            'totals': {'registrations': 4, 'cancellations': 1, 'check_ins': 2, 'active': 3},
+            'check_in_rate': 0.6667,
+            'gender': {'female': 1, 'male': 1, 'other': 1},
+        })
+
+    def test_timeline(self):
+        # Spread the activity over two days, then count it again from the raw rows
+        opened = datetime(2030, 1, 1, 10, 15, tzinfo=dt_timezone.utc)
+        Attendee.objects.update(registration_date=opened)
+        Attendee.objects.filter(cancelled_at__isnull=False).update(cancelled_at=opened + timedelta(hours=1))
+        Ticket.objects.filter(used_at__isnull=False).update(used_at=opened + timedelta(hours=26))
+        analytics.rebuild_rollups([self.event.id])
+
+        self.assertEqual(self.timeline(), [(4, 0, 0), (0, 1, 0), (0, 0, 2)])
+        self.assertEqual(self.timeline(granularity='day'), [(4, 1, 0), (0, 0, 2)])
+        self.assertEqual(self.timeline(since='2030-01-01T11:00:00Z', until='2030-01-02T00:00:00'), [(0, 1, 0)])
+
+    def test_analytics_are_for_the_organizer_only(self):
+        url = f'/registrations/analytics/{self.event.id}/'
+        stranger = User.objects.create(email='stranger@example.com')
+        stranger = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=stranger).key}'}
+        self.assertEqual(self.client.get(url, **stranger).status_code, 404)
+        self.assertEqual(self.client.get(url + 'timeline/', **stranger).status_code, 404)
+        self.assertEqual(self.client.get(url + 'timeline/', {'granularity': 'week'}, **self.auth).status_code, 400)
+        self.assertEqual(self.client.get(url + 'timeline/', {'since': 'yesterday'}, **self.auth).status_code, 400)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'SQLite serializes all writes')
+class ConcurrencyTestCase(TransactionTestCase):
+    """Base class for requests racing each other, each thread on its own database connection."""
+    capacity = None
+
+    def setUp(self):
+        for patcher in (
+            mock.patch.object(EmailServices, 'send_email', return_value=True),
+            mock.patch.object(SlidingWindowThrottle, 'allow_request', return_value=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.organizer = User.objects.create(email='organizer@example.com')
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=self.organizer).key}'}
+        self.event = Event.objects.create(
+            title='Flash sale', description='Hands-on', location='Accra', category='Tech', start_date='2030-01-01',
+            end_date='2030-01-01', start_time='10:00', end_time='18:00', created_by=self.organizer,
+            capacity=self.capacity,
+        )
+
+    def concurrently(self, request, arguments, workers=16):
+        """Call `request` with each argument from a pool of threads and return the results in order."""
+        def run(argument):
+            try:
+                return request(argument)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(run, arguments))
+
+
+class ConcurrentRegistrationTests(ConcurrencyTestCase):
+    """A flash sale: far more registrations than seats, all at once (REGISTRATION_STRESS_COUNT to scale up)."""
+    capacity = 100
+    registrations = int(os.environ.get('REGISTRATION_STRESS_COUNT', 1000))
+
+    def register(self, number):
+        return self.client_class().post('/registrations/attendee/create/', {
+            'email': f'attendee{number}@example.com', 'first_name': 'Ama', 'last_name': str(number),
+            'phone_number': '0200000000', 'gender': 'female', 'event': self.event.id,
+        }).status_code
+
+    def assertSeats(self, registrations):
+        self.event.refresh_from_db()
+        attendees = Attendee.objects.filter(event=self.event)
+        confirmed = attendees.filter(status='confirmed').count()
+        self.assertEqual(confirmed, self.capacity)
+        self.assertEqual(attendees.filter(status='waitlisted').count(), registrations - self.capacity)
+        self.assertEqual(self.event.seats_taken, confirmed)
+        self.assertEqual(Ticket.objects.filter(event=self.event, cancelled_at__isnull=True).count(), confirmed)
+
+    def test_seats_are_never_oversold(self):
+        statuses = self.concurrently(self.register, range(self.registrations))
+        self.assertEqual(set(statuses), {201})
+        self.assertSeats(self.registrations)
+
+        # Cancellations free seats for the waitlist, again all at once
+        codes = Ticket.objects.filter(event=self.event, cancelled_at__isnull=True).values_list('ticket_code', flat=True)
+        statuses = self.concurrently(
+            lambda code: self.client_class().post(f'/registrations/ticket/{code}/cancel/').status_code,
+            list(codes[:10])
+        )
+        self.assertEqual(set(statuses), {200})
+        self.assertSeats(self.registrations - 10)
+
+
+class ConcurrentCheckInTests(ConcurrencyTestCase):
+    scanners = 8
+
+    def test_concurrent_scans_check_a_ticket_in_once(self):
+        attendee = Attendee.objects.create(email='guest@example.com', first_name='Ama', last_name='Mensah',
+                                           phone_number='0200000000', gender='female', event=self.event)
+        Ticket.objects.create(attendee=attendee, event=self.event, created_by=self.organizer,
+                              ticket_code='LEGACY-CODE', first_name='Ama', last_name='Mensah',
+                              event_title=self.event.title)
+        # Every scan has read the ticket before any of them checks it in
+        all_read = threading.Barrier(self.scanners, timeout=10)
+        now = timezone.now
+
+        def read_then_now():
+            all_read.wait()
+            return now()
+
+        def scan(_):
+            return self.client_class().get('/registrations/ticket/scan/LEGACY-CODE/', **self.auth).json()['status']
+
+        with mock.patch('apps.registrations.views.timezone', now=read_then_now):
+            statuses = self.concurrently(scan, range(self.scanners), workers=self.scanners)
+        self.assertEqual(sorted(statuses), ['Registered'] + ['Ticket used'] * (self.scanners - 1))
+        self.assertEqual(RegistrationRollup.objects.get(event=self.event).check_ins, 1)
+
+
+class ConcurrentIdempotencyTests(ConcurrencyTestCase):
+    """Identical registrations racing with one Idempotency-Key, as a client retrying over a flaky network."""
+    duplicates = 20
+
+    def test_a_registration_runs_once(self):
+        key = str(uuid.uuid4())
+        registration = {
+            'email': 'retry@example.com', 'first_name': 'Ama', 'last_name': 'Mensah',
+            'phone_number': '0200000000', 'gender': 'female', 'event': self.event.id,
+        }
+        with mock.patch.object(EmailServices, 'send_email', return_value=True) as send_email:
+            responses = self.concurrently(lambda _: self.client_class().post(
+                '/registrations/attendee/create/', registration, HTTP_IDEMPOTENCY_KEY=key
+            ), range(self.duplicates), workers=self.duplicates)
+        # Every duplicate gets the first response back
+        self.assertEqual(len({response.content for response in responses}), 1)
+        replayed = [response for response in responses if response.get('Idempotent-Replayed') == 'true']
+        self.assertEqual(len(replayed), self.duplicates - 1)
+        self.assertEqual(Attendee.objects.filter(event=self.event).count(), 1)
+        self.assertEqual(send_email.call_count, 1)
+
+        # The key cannot be reused for another request
+        reused = self.client.post('/registrations/attendee/create/', dict(registration, email='other@example.com'),
+                                  HTTP_IDEMPOTENCY_KEY=key)
+        self.assertEqual(reused.status_code, 422)
+
+
+class ManifestRevocationTests(RegistrationTestCase):
+    capacity = 2
+
+    def setUp(self):
+        super().setUp()
+        self.register('kept@example.com')
+        self.register('cancelled@example.com')
+        self.version = build_manifest(self.event.id)['version']
+        self.code = self.ticket_of('cancelled@example.com').ticket_code
+        self.client.post(f'/registrations/ticket/{self.code}/cancel/')
+
+    def hashes(self, encoded):
+        raw = base64.b64decode(encoded)
+        return {raw[offset:offset + 8] for offset in range(0, len(raw), 8)}
+
+    def test_delta_carries_revoked_tickets(self):
+        delta = build_manifest(self.event.id, since=self.version)
+        self.assertEqual(self.hashes(delta['revoked']), {ticket_hash(self.event.id, self.code)})
+        self.assertNotIn(ticket_hash(self.event.id, self.code), self.hashes(delta['hashes']))
+        self.assertGreater(delta['version'], self.version)
+        # Nothing changed after the revocation
+        self.assertEqual(build_manifest(self.event.id, since=delta['version'] + 10 ** 7)['revoked'], '')
+
+    def test_full_manifest_leaves_revoked_tickets_out(self):
+        manifest = build_manifest(self.event.id)
+        kept = self.ticket_of('kept@example.com').ticket_code
+        self.assertEqual(self.hashes(manifest['hashes']), {ticket_hash(self.event.id, kept)})
+        self.assertNotIn('revoked', manifest)
+
+
+class ValuesSerializerTests(RegistrationTestCase):
+    capacity = 2
+
+    def setUp(self):
+        super().setUp()
+        for email in ('ama@example.com', 'kofi@example.com', 'esi@example.com'):
+            self.register(email)
+        self.client.get(f'/registrations/ticket/scan/{self.ticket_of("ama@example.com").ticket_code}/', **self.auth)
+        self.client.post(f'/registrations/ticket/{self.ticket_of("kofi@example.com").ticket_code}/cancel/')
+
+    def assertSameJSON(self, model_serializer, values_serializer, queryset):
+        self.assertEqual(dumps(values_serializer(queryset).data), dumps(model_serializer(queryset, many=True).data))
+
+    def test_attendees_render_like_the_model_serializer(self):
+        self.assertSameJSON(AttendeeSerializer, AttendeeValuesSerializer, Attendee.objects.order_by('id'))
+
+    def test_tickets_render_like_the_model_serializer(self):
+        self.assertSameJSON(TicketSerializer, TicketValuesSerializer, Ticket.objects.order_by('id'))
+
+
+class BroadcastTests(RegistrationTestCase):
+    registrants = 60
+
+    def setUp(self):
+        super().setUp()
+        Attendee.objects.bulk_create([
+            Attendee(first_name=f'Guest{number}', last_name='Mensah', email=f'guest{number}@example.com',
+                     phone_number='0200000000', gender='female', event=self.event,
+                     status='cancelled' if number >= self.registrants else 'confirmed')
+            for number in range(self.registrants + 5)
+        ])
+        self.broadcast = Broadcast.objects.create(
+            event=self.event, created_by=self.organizer, subject='Update for $event_title',
+            message='Hello $first_name,\nThe venue of $event_title has moved.'
+        )
+        self.lock, self.attempts, self.delivered, self.messages = threading.Lock(), Counter(), Counter(), {}
+
+    def send_email(self, email, full_name, subject, message, session=None):
+        """Accept messages, except the first try of every third recipient and every try of guest0."""
+        with self.lock:
+            self.attempts[email] += 1
+            number = int(email[len('guest'):email.index('@')])
+            if number == 0 or (number % 3 == 0 and self.attempts[email] == 1):
+                return False
+            self.delivered[email] += 1
+            self.messages[email] = (subject, message)
+            return True
+
+    def run_broadcast(self):
+        with mock.patch.object(EmailServices, 'send_email', side_effect=self.send_email):
+            return broadcasts.run_broadcast(self.broadcast.id, workers=4, rate=0, retry_delay=0)
+
+    def test_failed_sends_are_retried_until_they_run_out_of_attempts(self):
+        broadcast = self.run_broadcast()
+        self.assertEqual((broadcast.status, broadcast.total, broadcast.sent, broadcast.failed), ('done', 60, 59, 1))
+        self.assertEqual(self.attempts['guest0@example.com'], broadcasts.MAX_ATTEMPTS)
+        self.assertEqual(self.attempts['guest3@example.com'], 2)
+        statuses = Counter(BroadcastDelivery.objects.filter(broadcast=broadcast).values_list('status', flat=True))
+        self.assertEqual(statuses, {'sent': 59, 'failed': 1})
+        # Cancelled registrants are left out
+        self.assertNotIn('guest60@example.com', self.attempts)
+
+    def test_messages_are_personalized(self):
+        self.run_broadcast()
+        self.assertEqual(self.messages['guest1@example.com'],
+                         ('Update for Workshop', 'Hello Guest1,\nThe venue of Workshop has moved.'))
+
+    def test_an_interrupted_run_resumes_where_it_stopped(self):
+        record, batches = broadcasts._record, []
+
+        def crash_after_two_batches(*args):
+            if len(batches) == 2:
+                raise RuntimeError('Worker killed')
+            batches.append(args)
+            return record(*args)
+
+        with mock.patch.object(broadcasts, 'SEND_BATCH_SIZE', 10), \
+                mock.patch.object(broadcasts, '_record', crash_after_two_batches):
+            with self.assertRaises(RuntimeError), self.assertLogs(broadcasts.logger, 'ERROR'):
+                self.run_broadcast()
+        self.broadcast.refresh_from_db()
+        # The progress of the two recorded batches was kept
+        self.assertEqual(self.broadcast.status, 'failed')
+        sent = BroadcastDelivery.objects.filter(broadcast=self.broadcast, status='sent').count()
+        self.assertEqual(self.broadcast.sent, sent)
+        self.assertGreater(sent, 0)
+
+        with mock.patch.object(broadcasts, 'SEND_BATCH_SIZE', 10):
+            broadcast = self.run_broadcast()
+        self.assertEqual((broadcast.status, broadcast.sent, broadcast.failed), ('done', 59, 1))
+        self.assertEqual(len(self.delivered), 59)
+        # Only the batch in flight when the run stopped is sent again
+        self.assertLessEqual(sum(count - 1 for count in self.delivered.values()), 10)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Partitioning needs PostgreSQL')
+class PartitioningTests(RegistrationTestCase):
+    """Partitioning runs in the test transaction; PostgreSQL rolls the DDL back with it."""
+    capacity = None
+
+    def setUp(self):
+        super().setUp()
+        for email in ('ama@example.com', 'kofi@example.com'):
+            self.register(email)
+        self.broadcast = Broadcast.objects.create(event=self.event, created_by=self.organizer,
+                                                  subject='Update', message='Hello $first_name')
+        broadcasts.run_broadcast(self.broadcast.id, rate=0, retry_delay=0)
+        # Altering tables is refused while deferred constraint checks are pending
+        connection.check_constraints()
+
+    def partition(self):
+        out = StringIO()
+        call_command('partition_registrations', partition_size=10, stdout=out)
+        return out.getvalue()
+
+    def test_the_full_model_set_partitions(self):
+        output = self.partition()
+        self.assertIn('Partitioned registrations_attendee', output)
+        self.assertIn('Partitioned registrations_ticket', output)
+        self.assertTrue(partitioning.is_partitioned(Attendee) and partitioning.is_partitioned(Ticket))
+        # Running it again only keeps partitions ready
+        self.assertNotIn('Partitioned', self.partition())
+
+        # Registrations, scans and broadcasts work on the partitioned tables
+        self.assertEqual(self.register('esi@example.com').status_code, 201)
+        code = self.ticket_of('esi@example.com').ticket_code
+        self.assertEqual(self.client.get(f'/registrations/ticket/scan/{code}/', **self.auth).json()['status'],
+                         'Registered')
+        broadcast = Broadcast.objects.create(event=self.event, created_by=self.organizer,
+                                             subject='Update', message='Hello $first_name')
+        broadcast = broadcasts.run_broadcast(broadcast.id, rate=0, retry_delay=0)
+        self.assertEqual((broadcast.status, broadcast.sent), ('done', 3))
+        self.assertEqual(BroadcastDelivery.objects.filter(broadcast=self.broadcast, status='sent').count(), 2)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Partitioning needs PostgreSQL')
+class PartitionTieringTests(RegistrationTestCase):
+    """Ended, archived and deleted events sharing a range of their own, moved to cold storage and back."""
+    capacity = None
+    size = 100
+
+    def setUp(self):
+        super().setUp()
+        self.lower = (partitioning.next_event_id() // self.size + 1) * self.size
+        self.ended, self.archived, self.deleted = [
+            self.past_event(self.lower + offset) for offset in range(3)
+        ]
+        # A newer event closes the range
+        self.past_event(self.lower + self.size, end_date='2030-01-01')
+        archive_events([self.archived.id])
+        Event.objects.filter(pk=self.deleted.id).delete()
+        connection.check_constraints()
+        call_command('partition_registrations', partition_size=self.size, stdout=StringIO())
+        self.storage = tempfile.TemporaryDirectory()
+        self.addCleanup(self.storage.cleanup)
+
+    def past_event(self, event_id, end_date='2020-01-01'):
+        event = Event.objects.create(
+            id=event_id, title=f'Event {event_id}', description='Past', location='Accra', category='Tech',
+            start_date=end_date, end_date=end_date, start_time='10:00', end_time='18:00', created_by=self.organizer,
+            seats_taken=1,
+        )
+        attendee = Attendee.objects.create(first_name='Ama', last_name='Mensah', email=f'guest{event_id}@example.com',
+                                           gender='female', event=event)
+        Ticket.objects.create(event=event, attendee=attendee, created_by=self.organizer, first_name='Ama',
+                              last_name='Mensah', event_title=event.title, ticket_code=f'CODE-{event_id}')
+        return event
+
+    def tier(self, *args):
+        out = StringIO()
+        with self.settings(COLD_STORAGE_ROOT=self.storage.name):
+            call_command('tier_registrations', *args, stdout=out)
+        return out.getvalue()
+
+    def registered(self):
+        return set(Ticket.objects.filter(event_id__gte=self.lower).values_list('event_id', flat=True))
+
+    def test_cold_range_round_trip_keeps_archived_registrations(self):
+        cold = f'{self.lower}-{self.lower + self.size}'
+        self.assertIn(f'Cold: events {self.lower}-{self.lower + self.size - 1}', self.tier('--dry-run'))
+        self.assertIn(f'Events {self.lower}-{self.lower + self.size - 1}: exported to', self.tier('--mode', 'export'))
+        self.assertEqual(self.registered(), {self.lower + self.size})
+        name = partitioning.partition_name(Attendee, self.lower, self.lower + self.size)
+        self.assertTrue(os.path.exists(os.path.join(self.storage.name, f'{name}.csv.gz')))
+
+        self.tier('--restore', cold)
+        # The deleted event's registrations are discarded; the archived event's are kept for its archive
+        self.assertEqual(self.registered(), {self.ended.id, self.archived.id, self.lower + self.size})
+        self.assertFalse(os.path.exists(os.path.join(self.storage.name, f'{name}.csv.gz')))
+        event, = restore_archives(Archive.objects.filter(former_event_id=self.archived.id))
+        self.assertEqual((event.id, event.seats_taken), (self.archived.id, 1))
+
+    def test_ranges_with_recently_ended_archives_stay_hot(self):
+        Archive.objects.filter(former_event_id=self.archived.id).update(end_date='2030-01-01')
+        self.assertNotIn(f'Cold: events {self.lower}-', self.tier('--dry-run'))
+
+
+class BadgeJobTests(RegistrationTestCase):
+    """Rendering runs in spawned worker processes, as in production."""
+    capacity = None
+
+    def setUp(self):
+        super().setUp()
+        for number in range(10):
+            self.register(f'guest{number}@example.com')
+        self.client.post(f'/registrations/ticket/{self.ticket_of("guest0@example.com").ticket_code}/cancel/')
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        badge_root = override_settings(BADGE_ROOT=root.name)
+        badge_root.enable()
+        self.addCleanup(badge_root.disable)
+
+    def job(self, **fields):
+        return BadgeJob.objects.create(event=self.event, created_by=self.organizer, **fields)
+
+    def test_a_pdf_holds_a_badge_for_every_valid_ticket(self):
+        job = badges.run_badge_job(self.job().id, workers=1)
+        self.assertEqual((job.status, job.total, job.processed), ('done', 9, 9))
+        with open(job.file_path, 'rb') as handle:
+            document = handle.read()
+        self.assertTrue(document.startswith(b'%PDF-'))
+        # Eight badges per page
+        self.assertIn(b'/Count 2 >>', document)
+
+    def test_a_zip_splits_badges_into_documents(self):
+        with mock.patch.object(badges, 'BADGES_PER_FILE', 4):
+            job = badges.run_badge_job(self.job(format='zip').id, workers=1)
+        with zipfile.ZipFile(job.file_path) as archive:
+            self.assertEqual(archive.namelist(), ['badges-0001.pdf', 'badges-0002.pdf', 'badges-0003.pdf'])
+
+    def test_jobs_left_running_by_a_dead_worker_are_picked_up(self):
+        stale = self.job(status='running', total=9, processed=3)
+        finished = self.job(status='done', file_path='/kept.pdf')
+        out = StringIO()
+        call_command('run_badge_jobs', workers=1, stdout=out)
+        stale.refresh_from_db()
+        self.assertEqual((stale.status, stale.processed), ('done', 9))
+        self.assertIn(f'Badge job {stale.id}: 9 badges', out.getvalue())
+        self.assertNotIn(f'Badge job {finished.id}', out.getvalue())
+
+    def test_a_job_running_elsewhere_is_left_alone(self):
+        job = self.job(status='running')
+        with mock.patch.object(badges, 'advisory_lock') as lock:
+            lock.return_value.__enter__.return_value = False
+            self.assertIsNone(badges.run_badge_job(job.id))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'running')
+
+
+class RateLimiterTests(SimpleTestCase):
+    def test_calls_from_many_threads_are_spaced(self):
+        limiter = broadcasts.RateLimiter(200)
+        started = time.monotonic()
+        threads = [threading.Thread(target=limiter.wait) for _ in range(21)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # The first call goes right away, the other 20 are 5 ms apart
+        self.assertGreaterEqual(time.monotonic() - started, 0.099)
+
+
+@override_settings(TICKET_SIGNING_KEYS={'1': 'first-secret', '2': 'second-secret'}, TICKET_SIGNING_KEY_ID='2')
+class TicketSigningTests(SimpleTestCase):
+    def test_signed_code_verifies_for_its_event_only(self):
+        code = signing.sign_ticket(7, 42, issued_at=1_700_000_000)
+        self.assertEqual(len(code), signing.SIGNED_CODE_LENGTH)
+        self.assertEqual(signing.verify_ticket(code), signing.TicketClaims(2, 7, 42, 1_700_000_000))
+        self.assertIsNotNone(signing.verify_ticket(code, event_id=42))
+        self.assertIsNone(signing.verify_ticket(code, event_id=43))
+
+    def test_tampered_code_is_rejected(self):
+        code = signing.sign_ticket(7, 42)
+        self.assertIsNone(signing.verify_ticket(code[:-1] + ('A' if code[-1] != 'A' else 'B')))
+
+    def test_codes_signed_with_an_older_listed_key_keep_verifying(self):
+        with override_settings(TICKET_SIGNING_KEY_ID='1'):
+            code = signing.sign_ticket(7, 42)
+        self.assertEqual(signing.verify_ticket(code).key_id, 1)
+
+    def test_scanner_keys_cannot_sign_tickets_of_other_events(self):
+        keys = signing.scanner_keys(42)
+        self.assertEqual(set(keys), {1, 2})
+        event_key = base64.urlsafe_b64decode(keys[2])
+
+        def forge(event_id):
+            payload = signing._PAYLOAD.pack(2, 99, event_id, 1_700_000_000)
+            tag = hmac.new(event_key, payload, hashlib.sha256).digest()[:signing.TAG_SIZE]
+            return base64.urlsafe_b64encode(payload + tag).rstrip(b'=').decode()
+
+        # A scanner verifies codes of its own event with the key it was given
+        self.assertIsNotNone(signing.verify_ticket(forge(42)))
+        self.assertIsNone(signing.verify_ticket(forge(43)))
+        self.assertNotEqual(signing.scanner_keys(43)[2], keys[2])
+
+    def test_out_of_range_key_ids_are_rejected_up_front(self):
+        for key_id in ('256', '-1', 'main'):
+            with self.subTest(key_id=key_id), override_settings(TICKET_SIGNING_KEYS={key_id: 'secret'}):
+                with self.assertRaises(ImproperlyConfigured):
+                    signing.sign_ticket(7, 42)
+        with override_settings(TICKET_SIGNING_KEY_ID='3'):
+            with self.assertRaises(ImproperlyConfigured):
+                signing.sign_ticket(7, 42)
@@ -0,0 +1,40 @@
+import random
+import string
+
+from . import signing
+from .models import Ticket
+
+
+def generate_ticket_code():
+    """Generate a random and unique 10-character alphanumeric string."""
+    chars = string.ascii_letters + string.digits
+    return ''.join(random.choice(chars) for _ in range(10))
+
+
+def sign_issued_ticket(ticket):
+    """Replace a freshly issued ticket's random code with a signed one when signed tickets are enabled."""
+    if signing.signed_tickets_enabled():
+        # Scanners can verify signed codes offline
+        ticket.ticket_code = signing.sign_ticket(ticket.id, ticket.event_id, ticket.issued_date.timestamp())
+        Ticket.objects.filter(pk=ticket.pk).update(ticket_code=ticket.ticket_code)
+    return ticket
+
+
+def issue_ticket(event, attendee):
+    """
+    Issue the ticket of a confirmed attendee.
+
+    :param event: The event the ticket admits to
+    :param attendee: The confirmed attendee
+    :return: The new Ticket
+    """
+    ticket = Ticket.objects.create(
+        event=event,
+        attendee=attendee,
+        event_title=event.title,
+        first_name=attendee.first_name,
+        last_name=attendee.last_name,
+        ticket_code=generate_ticket_code(),
+        created_by_id=event.created_by_id,
+    )
+    return sign_issued_ticket(ticket)
@@ -5,8 +5,20 @@ app_name = 'registrations'
 
 urlpatterns = [
     path('attendee/create/', views.create_attendee, name='create_attendee'),
+    path('attendee/cancel/<int:attendee_id>/', views.cancel_attendee, name='cancel_attendee'),
     path('attendees/<int:event_id>/', views.fetch_attendees, name='fetch_attendees'),
     path('ticket/<str:ticket_code>/', views.fetch_ticket, name='fetch_ticket'),
+    path('ticket/<str:ticket_code>/qr.<str:fmt>', views.fetch_ticket_qr, name='fetch_ticket_qr'),
+    path('ticket/<str:ticket_code>/cancel/', views.cancel_ticket, name='cancel_ticket'),
     path('ticket/scan/<str:ticket_code>/', views.scan_ticket, name='scan_ticket'),
+    path('live/<int:event_id>/', views.live_attendance, name='live_attendance'),
+    path('badges/<int:event_id>/', views.create_badge_job, name='create_badge_job'),
+    path('badges/job/<int:job_id>/', views.fetch_badge_job, name='badge_job'),
+    path('badges/job/<int:job_id>/download/', views.download_badges, name='download_badges'),
+    path('broadcasts/<int:event_id>/', views.create_broadcast, name='create_broadcast'),
+    path('broadcasts/broadcast/<int:broadcast_id>/', views.fetch_broadcast, name='broadcast'),
+    path('analytics/<int:event_id>/', views.fetch_event_analytics, name='event_analytics'),
+    path('analytics/<int:event_id>/timeline/', views.fetch_event_timeline, name='event_timeline'),
+    path('manifest/<int:event_id>/', views.fetch_ticket_manifest, name='ticket_manifest'),
 ]
 
@@ -1,34 +1,56 @@
-from .serializers import AttendeeSerializer
-from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from .serializers import AttendeeSerializer, AttendeeValuesSerializer
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, throttle_classes
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import TokenAuthentication
+from schedoserver.authentication import ExpiringTokenAuthentication, token_expired
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import TicketSerializer
-from .models import Attendee, Ticket
+from .serializers import TicketSerializer, BadgeJobSerializer, BroadcastSerializer
+from .models import Attendee, Ticket, BadgeJob, Broadcast
 from apps.events.models import Event
+from apps.events import dashboard
 from rest_framework.permissions import AllowAny
 from django.core.exceptions import ObjectDoesNotExist
 import logging
 from rest_framework.exceptions import ValidationError
 from .email_service import EmailServices
 from django.urls import reverse
+from django.utils import timezone
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from django.utils.http import parse_etags
+from django.utils.dateparse import parse_datetime
+from datetime import timezone as dt_timezone
+from rest_framework.authtoken.models import Token
+from asgiref.sync import sync_to_async
+from .live import get_broadcaster, publish_after_commit
+from . import signing
+from .manifest import build_manifest
+from .badges import start_badge_job
+from .broadcasts import start_broadcast
+from .tickets import generate_ticket_code, sign_issued_ticket
+from . import capacity
+from . import analytics
+from . import qr
+from schedoserver.throttling import (
+    RegistrationEventEmailThrottle, RegistrationEventIPThrottle, RegistrationIPThrottle, TicketIPThrottle
+)
+from schedoserver.db_router import primary
+from schedoserver.idempotency import idempotent
+import asyncio
+import json
+import os
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-import string
-import random
-
-def generate_ticket_code():
-    """Generate a random and unique 10-character alphanumeric string."""
-    chars = string.ascii_letters + string.digits
-    return ''.join(random.choice(chars) for _ in range(10))
-
 
 @api_view(['POST'])
 @authentication_classes([])  # No authentication required for signup
 @permission_classes([AllowAny])  # Allow all users to access this view
+@throttle_classes([RegistrationIPThrottle, RegistrationEventIPThrottle, RegistrationEventEmailThrottle])
+@idempotent
 def create_attendee(request):
     """
     Create a new attendee based on the provided data.
@@ -43,8 +65,8 @@ def create_attendee(request):
     gender = request.data.get('gender')
     event_id = request.data.get('event')
 
-    # Check if email already exists for this event
-    if Attendee.objects.filter(email=email, event=event_id).exists():
+    # Check if email already exists for this event; a cancelled registrant may register again
+    if Attendee.objects.filter(email=email, event=event_id).exclude(status='cancelled').exists():
         return Response(
             {
                 'status': 'error',
@@ -66,10 +88,6 @@ def create_attendee(request):
     )
 
     if serializer.is_valid():
-        # Save the attendee data
-        attendee = serializer.save()
-        print("Added Attendee")
-
         # Fetch the event instance using the event ID
         try:
             event = Event.objects.get(pk=event_id)
@@ -94,60 +112,95 @@ def create_attendee(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        ticket_code = generate_ticket_code()  # Generate the ticket code
-        ticket_serializer = TicketSerializer(
-            data={
-                'ticket_code': ticket_code,
-                'event': event.id,
-                'attendee': attendee.id,
-                'created_by': event.created_by.id,
-                'is_used': False,
-                'event_title': event.title,
-                'first_name': attendee.first_name,
-                'last_name': attendee.last_name
-            }
-        )
-
-        # Validate and save ticket
-        if ticket_serializer.is_valid():
-            ticket = ticket_serializer.save()
-            print("Added Ticket")
-
-            # Send congratulatory email
-            ticket_url = f"https://schedo.vercel.app/ticket/{ticket_code}"
-            subject = "Congratulations on Registering for the Event!"
-            message = f"Hello {first_name},\nYou have successfully registered for {event.title}.\nYou can view your ticket here: {ticket_url}\n\nThank you for registering!"
-
-            # Attempt to send the email
+        with transaction.atomic():
+            # Take a seat with one conditional UPDATE; a full event puts the attendee on the waitlist
+            seated = capacity.allocate_seat(event.id)
+            dashboard.invalidate(event.created_by_id)
+
+            # Save the attendee data
+            attendee = serializer.save(status='confirmed' if seated else 'waitlisted')
+            analytics.record_registration(attendee)
+            print("Added Attendee")
+
+            if not seated:
+                position = capacity.waitlist_position(attendee)
+                # A seat freed while this registration was in flight goes to the waitlist
+                transaction.on_commit(lambda: capacity.promote_waitlist(event.id))
+            else:
+                ticket_code = generate_ticket_code()  # Generate the ticket code
+                ticket_serializer = TicketSerializer(
+                    data={
+                        'ticket_code': ticket_code,
+                        'event': event.id,
+                        'attendee': attendee.id,
+                        'created_by': event.created_by.id,
+                        'is_used': False,
+                        'event_title': event.title,
+                        'first_name': attendee.first_name,
+                        'last_name': attendee.last_name
+                    }
+                )
+                if not ticket_serializer.is_valid():
+                    # Give the seat and the registration back
+                    transaction.set_rollback(True)
+                    return Response(
+                        {
+                            'status': 'error',
+                            'message': 'Ticket creation failed.',
+                            'ticket_errors': ticket_serializer.errors
+                        },
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                ticket = sign_issued_ticket(ticket_serializer.save())
+                ticket_code = ticket.ticket_code
+                print("Added Ticket")
+                publish_after_commit(event.id, 'registrations')
+
+        if not seated:
             email_success = EmailServices.send_email(
                 email=email,
                 full_name=f"{first_name} {last_name}",
-                subject=subject,
-                message=message
+                subject=f"You are on the waitlist for {event.title}",
+                message=f"Hello {first_name},\n{event.title} is fully booked, so you have been added to the waitlist at position {position}.\nWe will email your ticket as soon as a seat opens up.\n\nThank you for registering!"
             )
-
-            if email_success:
-                print("Email sent successfully.")
-            else:
+            if not email_success:
                 print("Failed to send the email.")
-
             return Response(
                 {
                     'status': 'success',
-                    'attendee': serializer.data,
-                    'ticket': ticket_serializer.data
+                    'waitlisted': True,
+                    'waitlist_position': position,
+                    'attendee': AttendeeSerializer(attendee).data
                 },
                 status=status.HTTP_201_CREATED
             )
+
+        # Send congratulatory email
+        ticket_url = qr.ticket_url(ticket_code)
+        subject = "Congratulations on Registering for the Event!"
+        message = f"Hello {first_name},\nYou have successfully registered for {event.title}.\nYou can view your ticket here: {ticket_url}\n\nThank you for registering!"
+
+        # Attempt to send the email
+        email_success = EmailServices.send_email(
+            email=email,
+            full_name=f"{first_name} {last_name}",
+            subject=subject,
+            message=message
+        )
+
+        if email_success:
+            print("Email sent successfully.")
         else:
-            return Response(
-                {
-                    'status': 'error',
-                    'message': 'Ticket creation failed.',
-                    'ticket_errors': ticket_serializer.errors
-                },
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            print("Failed to send the email.")
+
+        return Response(
+            {
+                'status': 'success',
+                'attendee': serializer.data,
+                'ticket': TicketSerializer(ticket).data
+            },
+            status=status.HTTP_201_CREATED
+        )
 
     # Return detailed errors if Attendee validation fails
     return Response(
@@ -160,8 +213,80 @@ def create_attendee(request):
     )
 
 
+@api_view(['POST'])
+@authentication_classes([ExpiringTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def cancel_attendee(request, attendee_id):
+    """
+    Cancel a registration on behalf of the event organizer.
+
+    Cancelling a confirmed registration frees its seat for the oldest waitlisted attendee.
+
+    :param request: The request
+    :param attendee_id: The ID of the attendee
+    :return: A JSON response containing the cancelled attendee
+    """
+    if not Attendee.objects.filter(pk=attendee_id, event__created_by=request.user).exists():
+        return Response(
+            {'status': 'error', 'message': 'Attendee not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    attendee = capacity.cancel_registration(attendee_id)
+    if attendee is None:
+        return Response(
+            {'status': 'error', 'message': 'Registration is already cancelled'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response(
+        {'status': 'success', 'attendee': AttendeeSerializer(attendee).data},
+        status=status.HTTP_200_OK
+    )
+
+
+@api_view(['POST'])
+@authentication_classes([])  # No authentication required, the ticket code identifies the registration
+@permission_classes([AllowAny])
+@throttle_classes([TicketIPThrottle])
+def cancel_ticket(request, ticket_code):
+    """
+    Cancel the registration a ticket belongs to, on behalf of the ticket holder.
+
+    :param request: The request
+    :param ticket_code: The ticket code
+    :return: A JSON response with the cancellation status
+    """
+    ticket = Ticket.objects.filter(ticket_code=ticket_code).only(
+        'attendee_id', 'event_id', 'is_used', 'cancelled_at'
+    ).first()
+    if ticket is None:
+        return Response(
+            {'status': 'error', 'message': 'Ticket not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    if not Event.objects.filter(pk=ticket.event_id).exists():
+        return Response(
+            {'status': 'error', 'message': 'Event has been archived'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if ticket.cancelled_at:
+        return Response(
+            {'status': 'error', 'message': 'Registration is already cancelled'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if ticket.is_used:
+        return Response(
+            {'status': 'error', 'message': 'Ticket has been used'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    capacity.cancel_registration(ticket.attendee_id)
+    return Response(
+        {'status': 'success', 'message': 'Registration cancelled'},
+        status=status.HTTP_200_OK
+    )
+
+
 @api_view(['GET'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def fetch_attendees(request, event_id):
     """
@@ -172,7 +297,7 @@ def fetch_attendees(request, event_id):
     :return: A JSON response containing the list of attendees
     """
     attendees = Attendee.objects.filter(event__id=event_id)
-    serializer = AttendeeSerializer(attendees, many=True)
+    serializer = AttendeeValuesSerializer(attendees)
     return Response(
         {
             'status': 'success',
@@ -185,6 +310,7 @@ def fetch_attendees(request, event_id):
 @api_view(['GET'])
 @authentication_classes([])  # No authentication required for signup
 @permission_classes([AllowAny])  # Allow all users to access this view
+@throttle_classes([TicketIPThrottle])
 def fetch_ticket(request, ticket_code):
     """
     Fetch an attendee's ticket by their ticket_code.
@@ -198,8 +324,25 @@ def fetch_ticket(request, ticket_code):
             status=status.HTTP_200_OK
         )
     try:
-        ticket = Ticket.objects.get(ticket_code=ticket_code)
+        if signing.is_signed_code(ticket_code):
+            # Forged codes are rejected without a database lookup
+            claims = signing.verify_ticket(ticket_code)
+            if claims is None:
+                raise Ticket.DoesNotExist
+            ticket = Ticket.objects.get(pk=claims.ticket_id, event_id=claims.event_id, ticket_code=ticket_code)
+        else:
+            ticket = Ticket.objects.get(ticket_code=ticket_code)
         ticket_serializer = TicketSerializer(ticket)
+        if not Event.objects.filter(pk=ticket.event_id).exists():
+            return Response(
+                {'status': 'error', 'message': 'Event has been archived'},
+                status=status.HTTP_200_OK
+            )
+        if ticket.cancelled_at:
+            return Response(
+                {'status': 'error', 'message': 'Ticket has been cancelled'},
+                status=status.HTTP_200_OK
+            )
         if ticket.is_used:
             return Response(
                 {'status': 'error', 'message': 'Ticket has been used'},
@@ -217,12 +360,16 @@ def fetch_ticket(request, ticket_code):
 
 
 @api_view(['GET'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
+@primary
 def scan_ticket(request, ticket_code):
     """
     Check if an attendee is registered for an event.
 
+    Signed ticket codes are verified without a database lookup; the optional
+    `event` query parameter rejects tickets issued for another event.
+
     :param request: The request containing the attendee's ticket_code
     :param ticket_code: The ticket code to check
     :return: A JSON response with "Registered" or "Not Registered" status
@@ -232,13 +379,402 @@ def scan_ticket(request, ticket_code):
             {'status': 'error', 'message': 'Ticket code is required'},
             status=status.HTTP_400_BAD_REQUEST
         )
+    if signing.is_signed_code(ticket_code):
+        return _scan_signed_ticket(request, ticket_code)
+    ticket = Ticket.objects.filter(created_by=request.user, ticket_code=ticket_code).only(
+        'event_id', 'is_used', 'cancelled_at'
+    ).first()
+    if ticket is None:
+        return Response({'status': 'Not Registered'}, status=status.HTTP_200_OK)
+    if ticket.cancelled_at:
+        return Response(
+            {'status': 'Not Registered', 'message': 'Ticket was cancelled'}, status=status.HTTP_200_OK
+        )
+    # A conditional UPDATE lets only one of several concurrent scans check the ticket in
+    updated = not ticket.is_used and Ticket.objects.filter(
+        _event_exists(), pk=ticket.pk, is_used=False, cancelled_at__isnull=True
+    ).update(is_used=True, used_at=timezone.now())
+    if not updated:
+        if not Event.objects.filter(pk=ticket.event_id).exists():
+            return Response(
+                {'status': 'Not Registered', 'message': 'Event has been archived'}, status=status.HTTP_200_OK
+            )
+        return Response({'status': 'Ticket used'}, status=status.HTTP_200_OK)
+    analytics.record_check_in(ticket.id, ticket.event_id)
+    publish_after_commit(ticket.event_id, 'check_ins')
+    dashboard.invalidate(request.user.id)
+    return Response({'status': 'Registered'}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@authentication_classes([ExpiringTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def fetch_event_analytics(request, event_id):
+    """
+    Fetch registration totals, the check-in rate and the gender breakdown of an event.
+
+    :param request: The request
+    :param event_id: The ID of the event
+    :return: A JSON response containing the analytics
+    """
+    if not Event.objects.filter(pk=event_id, created_by=request.user).exists():
+        return Response(
+            {'status': 'error', 'message': 'Event with ID {} does not exist'.format(event_id)},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return Response(
+        {'status': 'success', 'analytics': analytics.event_summary(event_id)},
+        status=status.HTTP_200_OK
+    )
+
+
+@api_view(['GET'])
+@authentication_classes([ExpiringTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def fetch_event_timeline(request, event_id):
+    """
+    Fetch registrations, cancellations and check-ins of an event over time.
+
+    :param request: The request, optionally with `granularity` ('hour' or 'day'), `since` and `until` (ISO 8601)
+    :param event_id: The ID of the event
+    :return: A JSON response containing the timeline
+    """
+    if not Event.objects.filter(pk=event_id, created_by=request.user).exists():
+        return Response(
+            {'status': 'error', 'message': 'Event with ID {} does not exist'.format(event_id)},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    granularity = request.query_params.get('granularity', 'hour')
+    if granularity not in ('hour', 'day'):
+        return Response(
+            {'status': 'error', 'message': 'granularity must be hour or day'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    bounds = {}
+    for name in ('since', 'until'):
+        value = request.query_params.get(name)
+        if value is None:
+            continue
+        try:
+            moment = parse_datetime(value)
+        except ValueError:
+            moment = None
+        if moment is None:
+            return Response(
+                {'status': 'error', 'message': f'{name} must be an ISO 8601 date and time'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        bounds[name] = moment if timezone.is_aware(moment) else timezone.make_aware(moment, dt_timezone.utc)
+    return Response(
+        {
+            'status': 'success',
+            'granularity': granularity,
+            'timeline': analytics.event_timeline(event_id, granularity=granularity, **bounds)
+        },
+        status=status.HTTP_200_OK
+    )
+
+
+@api_view(['GET'])
+@authentication_classes([ExpiringTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def fetch_ticket_manifest(request, event_id):
+    """
+    Fetch the compact ticket manifest scanner devices preload before doors open, with the event's
+    signing keys when tickets are signed.
+
+    :param request: The request, optionally with `since` (a previous manifest version) for a delta
+    :param event_id: The ID of the event
+    :return: A JSON response containing the manifest
+    """
+    if not Event.objects.filter(pk=event_id, created_by=request.user).exists():
+        return Response(
+            {'status': 'error', 'message': 'Event with ID {} does not exist'.format(event_id)},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    since = request.query_params.get('since')
+    if since is not None and not since.isdigit():
+        return Response(
+            {'status': 'error', 'message': 'since must be a manifest version'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    manifest = build_manifest(event_id, since=since)
+    if signing.signed_tickets_enabled():
+        # Per-event keys, so the devices can verify this event's signed codes offline
+        manifest['keys'] = signing.scanner_keys(event_id)
+    return Response(
+        {'status': 'success', 'manifest': manifest},
+        status=status.HTTP_200_OK
+    )
+
+
+@api_view(['POST'])
+@authentication_classes([ExpiringTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def create_badge_job(request, event_id):
+    """
+    Start rendering printable badges for every ticket of an event in the background.
+
+    :param request: The request, optionally with `format` ('pdf' or 'zip')
+    :param event_id: The ID of the event
+    :return: A JSON response containing the job to poll
+    """
+    if not Event.objects.filter(pk=event_id, created_by=request.user).exists():
+        return Response(
+            {'status': 'error', 'message': 'Event with ID {} does not exist'.format(event_id)},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    output_format = request.data.get('format', 'pdf')
+    if output_format not in ('pdf', 'zip'):
+        return Response(
+            {'status': 'error', 'message': 'Format must be pdf or zip'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    job = BadgeJob.objects.create(event_id=event_id, created_by=request.user, format=output_format)
+    start_badge_job(job)
+    return Response(
+        {'status': 'success', 'job': BadgeJobSerializer(job).data},
+        status=status.HTTP_202_ACCEPTED
+    )
+
+
+@api_view(['GET'])
+@authentication_classes([ExpiringTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def fetch_badge_job(request, job_id):
+    """
+    Fetch the progress of a badge job.
+
+    :param request: The request
+    :param job_id: The ID of the badge job
+    :return: A JSON response containing the job
+    """
     try:
-        ticket = Ticket.objects.get(created_by=request.user, ticket_code=ticket_code)
-        if ticket.is_used: 
-            return Response({'status': 'Ticket used'}, status=status.HTTP_200_OK)
-        else:
-            ticket.is_used = True
-            ticket.save()
-            return Response({'status': 'Registered'}, status=status.HTTP_200_OK)
-    except Ticket.DoesNotExist:
+        job = BadgeJob.objects.get(pk=job_id, created_by=request.user)
+    except BadgeJob.DoesNotExist:
+        return Response(
+            {'status': 'error', 'message': 'Badge job not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return Response(
+        {'status': 'success', 'job': BadgeJobSerializer(job).data},
+        status=status.HTTP_200_OK
+    )
+
+
+@api_view(['GET'])
+@authentication_classes([ExpiringTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def download_badges(request, job_id):
+    """
+    Download the document of a finished badge job.
+
+    :param request: The request
+    :param job_id: The ID of the badge job
+    :return: The PDF or ZIP file
+    """
+    job = BadgeJob.objects.filter(pk=job_id, created_by=request.user, status='done').first()
+    if job is None or not os.path.exists(job.file_path):
+        return Response(
+            {'status': 'error', 'message': 'Badges are not ready'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return FileResponse(
+        open(job.file_path, 'rb'),
+        as_attachment=True,
+        filename=os.path.basename(job.file_path),
+        content_type='application/pdf' if job.format == 'pdf' else 'application/zip'
+    )
+
+
+@api_view(['POST'])
+@authentication_classes([ExpiringTokenAuthentication])
+@permission_classes([IsAuthenticated])
+@idempotent
+def create_broadcast(request, event_id):
+    """
+    Start sending a message to every registrant of an event in the background.
+
+    :param request: The request, with `subject` and `message`; both may use the placeholders
+                    $first_name, $last_name, $full_name and $event_title
+    :param event_id: The ID of the event
+    :return: A JSON response containing the broadcast to poll
+    """
+    if not Event.objects.filter(pk=event_id, created_by=request.user).exists():
+        return Response(
+            {'status': 'error', 'message': 'Event with ID {} does not exist'.format(event_id)},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    serializer = BroadcastSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(
+            {'status': 'error', 'message': 'Broadcast data is invalid.', 'errors': serializer.errors},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    broadcast = serializer.save(event_id=event_id, created_by=request.user)
+    start_broadcast(broadcast)
+    return Response(
+        {'status': 'success', 'broadcast': BroadcastSerializer(broadcast).data},
+        status=status.HTTP_202_ACCEPTED
+    )
+
+
+@api_view(['GET'])
+@authentication_classes([ExpiringTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def fetch_broadcast(request, broadcast_id):
+    """
+    Fetch the progress of a broadcast.
+
+    :param request: The request
+    :param broadcast_id: The ID of the broadcast
+    :return: A JSON response containing the broadcast
+    """
+    try:
+        broadcast = Broadcast.objects.get(pk=broadcast_id, created_by=request.user)
+    except Broadcast.DoesNotExist:
+        return Response(
+            {'status': 'error', 'message': 'Broadcast not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return Response(
+        {'status': 'success', 'broadcast': BroadcastSerializer(broadcast).data},
+        status=status.HTTP_200_OK
+    )
+
+
+@require_GET
+def fetch_ticket_qr(request, ticket_code, fmt):
+    """
+    Render the QR code of a ticket for emails and printed badges.
+
+    Renderings never change for a given code, so they are cached server-side and
+    served with a deterministic ETag, for as long as the ticket is not revoked.
+
+    :param request: The request, optionally with `size` (one of qr.SIZES)
+    :param ticket_code: The ticket code
+    :param fmt: 'svg' or 'png'
+    :return: The image, or a JSON error response
+    """
+    if fmt not in qr.FORMATS:
+        return JsonResponse(
+            {'status': 'error', 'message': 'Format must be one of {}'.format(', '.join(qr.FORMATS))},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    size = request.GET.get('size', str(qr.DEFAULT_SIZE))
+    if not size.isdigit() or int(size) not in qr.SIZES:
+        return JsonResponse(
+            {'status': 'error', 'message': 'Size must be one of {}'.format(', '.join(map(str, qr.SIZES)))},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    size = int(size)
+
+    # Only serve codes that belong to a ticket that was not revoked
+    if signing.is_signed_code(ticket_code):
+        claims = signing.verify_ticket(ticket_code)
+        exists = claims is not None and Ticket.objects.filter(
+            pk=claims.ticket_id, event_id=claims.event_id, ticket_code=ticket_code, cancelled_at__isnull=True
+        ).exists()
+    else:
+        exists = Ticket.objects.filter(ticket_code=ticket_code, cancelled_at__isnull=True).exists()
+    if not exists:
+        return JsonResponse(
+            {'status': 'error', 'message': 'Ticket not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    etag = qr.etag(ticket_code, fmt, size)
+    # Browsers revalidate daily, so a revoked ticket's image stops being served
+    headers = {'ETag': etag, 'Cache-Control': 'public, max-age=86400'}
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return HttpResponseNotModified(headers=headers)
+    return HttpResponse(qr.render_cached(ticket_code, fmt, size), content_type=qr.FORMATS[fmt], headers=headers)
+
+
+def _event_exists():
+    # Tickets outlive their event when it is archived, and stop checking in
+    return Exists(Event.objects.filter(pk=OuterRef('event_id')))
+
+
+def _scan_signed_ticket(request, ticket_code):
+    """Check in a signed ticket, touching the database only for the used/unused transition."""
+    claims = signing.verify_ticket(ticket_code)
+    if claims is None:
+        return Response({'status': 'Not Registered'}, status=status.HTTP_200_OK)
+    expected_event = request.query_params.get('event')
+    if expected_event and str(claims.event_id) != expected_event:
+        return Response(
+            {'status': 'Not Registered', 'message': 'Ticket is for another event'},
+            status=status.HTTP_200_OK
+        )
+
+    # A single conditional UPDATE marks the ticket used and guards against double check-in
+    updated = Ticket.objects.filter(
+        _event_exists(), pk=claims.ticket_id, event_id=claims.event_id, created_by=request.user, is_used=False,
+        cancelled_at__isnull=True
+    ).update(is_used=True, used_at=timezone.now())
+    if updated:
+        analytics.record_check_in(claims.ticket_id, claims.event_id)
+        publish_after_commit(claims.event_id, 'check_ins')
+        dashboard.invalidate(request.user.id)
+        return Response({'status': 'Registered'}, status=status.HTTP_200_OK)
+    ticket = Ticket.objects.filter(
+        pk=claims.ticket_id, event_id=claims.event_id, created_by=request.user
+    ).only('cancelled_at').first()
+    if ticket is None:
         return Response({'status': 'Not Registered'}, status=status.HTTP_200_OK)
+    if ticket.cancelled_at:
+        return Response({'status': 'Not Registered', 'message': 'Ticket was cancelled'}, status=status.HTTP_200_OK)
+    if not Event.objects.filter(pk=claims.event_id).exists():
+        return Response({'status': 'Not Registered', 'message': 'Event has been archived'}, status=status.HTTP_200_OK)
+    return Response({'status': 'Ticket used'}, status=status.HTTP_200_OK)
+
+
+# Seconds between keep-alive comments on an idle live stream
+LIVE_KEEPALIVE_SECONDS = 15
+
+
+async def live_attendance(request, event_id):
+    """
+    Stream registration and check-in counters of an event as Server-Sent Events.
+
+    Served through the ASGI application. EventSource cannot set headers, so the
+    organizer's token may be passed as the `token` query parameter.
+
+    :param request: The request carrying the organizer's token
+    :param event_id: The ID of the event to watch
+    :return: A text/event-stream response with a snapshot followed by deltas
+    """
+    key = request.GET.get('token')
+    if not key:
+        key = request.headers.get('Authorization', '').removeprefix('Token ').strip()
+    try:
+        token = await Token.objects.select_related('user').aget(key=key)
+    except Token.DoesNotExist:
+        return JsonResponse({'status': 'error', 'message': 'Invalid token'}, status=status.HTTP_401_UNAUTHORIZED)
+    if token_expired(token):
+        return JsonResponse({'status': 'error', 'message': 'Token has expired'}, status=status.HTTP_401_UNAUTHORIZED)
+    if not await Event.objects.filter(pk=event_id, created_by=token.user).aexists():
+        return JsonResponse({'status': 'error', 'message': 'Event not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    broadcaster = get_broadcaster()
+    queue = broadcaster.subscribe(event_id)
+
+    async def stream():
+        try:
+            totals = await sync_to_async(broadcaster.totals)(event_id)
+            yield f"event: snapshot\ndata: {json.dumps({'event': event_id, 'totals': totals})}\n\n"
+            while True:
+                try:
+                    update = await asyncio.wait_for(queue.get(), timeout=LIVE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {update['kind']}\ndata: {json.dumps(update)}\n\n"
+        finally:
+            broadcaster.unsubscribe(event_id, queue)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -5,6 +5,9 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+Live attendance streams (registrations/live/<event_id>/) hold their connection
+open and must be served through this entry point, e.g. with uvicorn workers.
 """
 
 import os
@@ -0,0 +1,107 @@
+"""
+Token lifetime and cleanup of stale authentication data.
+
+API tokens are valid for TOKEN_TTL seconds after they were issued (0 keeps
+them forever). Expired tokens are refused at authentication and replaced at
+the next login; the rows themselves are removed later, together with expired
+sessions, by the purge_expired_auth command.
+
+Purging deletes a bounded batch per statement, each in its own short
+transaction, so no lock is held for long and logins and session writes keep
+flowing while a large backlog is cleared.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from . import db_router
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def token_expiry(now=None):
+    """Return the issue time before which tokens are expired, or None if tokens never expire."""
+    if not settings.TOKEN_TTL:
+        return None
+    return (now or timezone.now()) - timedelta(seconds=settings.TOKEN_TTL)
+
+
+def token_expired(token, now=None):
+    cutoff = token_expiry(now)
+    return cutoff is not None and token.created < cutoff
+
+
+def issue_token(user):
+    """
+    Return the user's token, replacing it first if it has expired.
+
+    :param user: The authenticated user
+    :return: A valid Token
+    """
+    with transaction.atomic():
+        # Concurrent logins replacing the same expired token wait for each other here
+        token, created = Token.objects.select_for_update().get_or_create(user=user)
+        if not created and token_expired(token):
+            token.delete()
+            token, created = Token.objects.create(user=user), True
+    if created:
+        # The client's next request carries the new token, which the replicas may not have yet
+        db_router.pin(f'Token {token.key}')
+    return token
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+    """Token authentication refusing tokens older than TOKEN_TTL seconds."""
+
+    def authenticate_credentials(self, key):
+        user, token = super().authenticate_credentials(key)
+        if token_expired(token):
+            raise AuthenticationFailed('Token has expired.')
+        return user, token
+
+
+def _purge(queryset, batch_size, pause):
+    """Delete the rows of a queryset a batch at a time, walking the primary key once."""
+    deleted, last_pk = 0, None
+    rows = queryset.order_by('pk').values_list('pk', flat=True)
+    while batch := list((rows if last_pk is None else rows.filter(pk__gt=last_pk))[:batch_size]):
+        last_pk = batch[-1]
+        # The condition is checked again, so a session refreshed in the meantime is kept
+        deleted += queryset.filter(pk__in=batch).delete()[0]
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+def purge_expired_tokens(batch_size=DEFAULT_BATCH_SIZE, pause=0, now=None):
+    """
+    Delete tokens issued more than TOKEN_TTL seconds ago.
+
+    :param batch_size: Tokens deleted per statement
+    :param pause: Seconds to sleep between batches, to leave room for other writes
+    :param now: The current time (for tests)
+    :return: The number of deleted tokens
+    """
+    cutoff = token_expiry(now)
+    if cutoff is None:
+        return 0
+    return _purge(Token.objects.filter(created__lt=cutoff), batch_size, pause)
+
+
+def purge_expired_sessions(batch_size=DEFAULT_BATCH_SIZE, pause=0, now=None):
+    """
+    Delete expired sessions, like `clearsessions` but in batches.
+
+    :param batch_size: Sessions deleted per statement
+    :param pause: Seconds to sleep between batches, to leave room for other writes
+    :param now: The current time (for tests)
+    :return: The number of deleted sessions
+    """
+    return _purge(Session.objects.filter(expire_date__lt=now or timezone.now()), batch_size, pause)
@@ -0,0 +1,110 @@
+"""
+Read replica routing with read-your-writes stickiness.
+
+ReplicaRoutingMiddleware decides per request where reads go: safe requests
+(GET, HEAD, OPTIONS) read from one of the replicas in DATABASE_REPLICAS,
+everything else reads from the primary. A client that wrote anything is
+pinned to the primary for REPLICA_PIN_SECONDS afterwards, so a read following
+its own write never hits a replica that has not caught up yet.
+
+Writes always go to the primary, and so do reads inside a transaction, reads
+outside a request (commands, background jobs) and reads in views decorated
+with `@primary`.
+
+Clients are identified by their Authorization header, or by IP when they send
+none. A client that logs in or signs up writes without a token and reads with
+the one it was issued, so `issue_token` pins the new token as well.
+"""
+import functools
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_routing = ContextVar('replica_routing', default=None)
+
+
+class RoutingState:
+    """Where the current request reads from, and whether it has written."""
+
+    def __init__(self, read_alias=None):
+        self.read_alias = read_alias
+        self.wrote = False
+
+
+def begin(read_alias):
+    """Start routing the current context; returns (state, token) for `end`."""
+    state = RoutingState(read_alias)
+    return state, _routing.set(state)
+
+
+def end(token):
+    _routing.reset(token)
+
+
+@contextmanager
+def read_from_primary():
+    """Send the reads of a block to the primary, e.g. before caching what they return."""
+    state = _routing.get()
+    if state is None:
+        yield
+        return
+    read_alias, state.read_alias = state.read_alias, None
+    try:
+        yield
+    finally:
+        state.read_alias = read_alias
+
+
+def primary(view):
+    """Read from the primary in a view that writes even though its method is safe."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with read_from_primary():
+            return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def _pin_key(client):
+    return 'replica-pin:' + hashlib.blake2b(client.encode(), digest_size=12).hexdigest()
+
+
+def pin(client):
+    """
+    Send the reads of a client to the primary for the next REPLICA_PIN_SECONDS.
+
+    :param client: The client's Authorization header value, or its IP when it sends none
+    """
+    if getattr(settings, 'DATABASE_REPLICAS', []):
+        cache.set(_pin_key(client), True, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+
+
+def is_pinned(client):
+    return bool(cache.get(_pin_key(client)))
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or state.read_alias is None:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # A transaction must see its own uncommitted writes
+            return DEFAULT_DB_ALIAS
+        return state.read_alias
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            # Also covers select_for_update(); pins the client once the response is out
+            state.wrote = True
+            state.read_alias = None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
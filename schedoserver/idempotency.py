@@ -0,0 +1,134 @@
+"""
+Idempotency-Key support for endpoints that must not run twice.
+
+The first request with a given key claims it with an atomic cache add(),
+runs, and stores its response for IDEMPOTENCY_TTL seconds; retries with the
+same key get that response replayed (marked with `Idempotent-Replayed: true`).
+A duplicate arriving while the first request is still running waits for its
+result instead of redoing the work. Reusing a key with a different payload is
+rejected with 422. Server errors are not stored, so a retry runs again.
+
+Keys are scoped to the view and the authenticated user, so clients only need
+to make them unique per request (a UUID per user action).
+
+A claim lasts IDEMPOTENCY_CLAIM_SECONDS, which must exceed the longest a
+request can run (the worker timeout): a claim that expired under a request
+still running would let a retry run the view a second time. A claim left by a
+worker that died only expires then, and duplicates get 409 until it does.
+
+The claims and stored responses must be visible to every worker, or a retry
+that lands on another process than the original runs a second time. They go
+to the `idempotency` cache: Redis when REDIS_URL is set, otherwise a database
+table, never the per-process LocMemCache. `migrate` creates that table (see
+`create_cache_table`).
+"""
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.management import call_command
+from django.core.files.uploadedfile import UploadedFile
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05
+
+
+def create_cache_table(using='default', **kwargs):
+    """Create the table of a database-backed idempotency cache; connected to post_migrate."""
+    cache = caches['idempotency']
+    if isinstance(cache, DatabaseCache):
+        call_command('createcachetable', cache._table, database=using, verbosity=0)
+
+
+def _fingerprint(request):
+    """Hash the request payload so a reused key with different data is detected."""
+    data = request.data
+    items = data.lists() if hasattr(data, 'lists') else data.items()
+    digest = hashlib.sha256(request.method.encode() + request.path.encode())
+    for name, values in sorted(items, key=lambda item: item[0]):
+        for value in values if isinstance(values, list) else [values]:
+            if isinstance(value, UploadedFile):
+                value = f'{value.name}:{value.size}'
+            digest.update(f'{name}={value!r};'.encode())
+    return digest.hexdigest()
+
+
+def _replay(stored):
+    return Response(stored['data'], status=stored['status'], headers={'Idempotent-Replayed': 'true'})
+
+
+def _mismatch():
+    return Response(
+        {'status': 'error', 'message': 'Idempotency-Key was already used with a different request'},
+        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+    )
+
+
+def idempotent(view):
+    """
+    Make a DRF function view honour the Idempotency-Key header.
+
+    Apply it below @api_view and the authentication/permission decorators so
+    it sees the authenticated user and the parsed request data.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return view(request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'status': 'error', 'message': f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        user_id = request.user.pk if request.user and request.user.is_authenticated else 'anonymous'
+        scope = hashlib.sha256(f'{view.__module__}.{view.__name__}:{user_id}:{key}'.encode()).hexdigest()
+        result_key, lock_key = f'idempotency:{scope}', f'idempotency-lock:{scope}'
+        fingerprint = _fingerprint(request)
+        ttl = getattr(settings, 'IDEMPOTENCY_TTL', 86400)
+        wait_seconds = getattr(settings, 'IDEMPOTENCY_WAIT_SECONDS', 10)
+        claim_seconds = getattr(settings, 'IDEMPOTENCY_CLAIM_SECONDS', 300)
+
+        cache = caches['idempotency']
+        stored = cache.get(result_key)
+        deadline = time.monotonic() + wait_seconds
+        while stored is None:
+            if cache.add(lock_key, fingerprint, claim_seconds):
+                # The previous holder may have stored its response and released the claim in between
+                stored = cache.get(result_key)
+                if stored is None:
+                    break
+                cache.delete(lock_key)
+            elif time.monotonic() >= deadline:
+                return Response(
+                    {'status': 'error', 'message': 'A request with this Idempotency-Key is still in progress'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            else:
+                # Another request with this key is in flight: wait for its response, or take over
+                # once it releases the claim without storing one
+                time.sleep(POLL_INTERVAL)
+                stored = cache.get(result_key)
+        if stored is not None:
+            return _replay(stored) if stored['fingerprint'] == fingerprint else _mismatch()
+
+        try:
+            response = view(request, *args, **kwargs)
+            if response.status_code < 500:
+                cache.set(result_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'data': response.data,
+                }, ttl)
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    return wrapper
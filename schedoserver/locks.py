@@ -0,0 +1,49 @@
+"""
+Cluster-wide locks for jobs that must only run on one node at a time.
+
+On PostgreSQL these are session-level advisory locks, released when the
+holder unlocks or its connection drops, so a crashed node never leaves the
+lock behind. Other databases fall back to a cache entry that expires after
+`timeout` seconds; it only spans processes when the cache is shared (REDIS_URL).
+"""
+import hashlib
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connection
+
+
+def _lock_id(name):
+    # Advisory locks are keyed by a signed 64-bit integer
+    return int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+@contextmanager
+def advisory_lock(name, timeout=3600):
+    """
+    Try to take a named lock without waiting.
+
+    :param name: The lock name, shared by every node running the job
+    :param timeout: Seconds before the cache fallback expires on its own
+    :return: A context manager yielding True if this process holds the lock, False if another does
+    """
+    if connection.vendor == 'postgresql':
+        lock_id = _lock_id(name)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [lock_id])
+            acquired = cursor.fetchone()[0]
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_unlock(%s)', [lock_id])
+        return
+
+    key = f'lock:{name}'
+    acquired = cache.add(key, True, timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(key)
@@ -0,0 +1,158 @@
+"""
+In-process request metrics exposed in the Prometheus text format.
+
+Metrics are kept per process; with several gunicorn workers each worker
+reports its own series, so scrape every worker or aggregate by instance.
+"""
+import bisect
+import contextvars
+import hmac
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Latency buckets in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Buckets for the number of database queries per request
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+# Buckets for response sizes in bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = labelnames
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, state in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, state):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, ("le", bound))} {cumulative}')
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, ("le", "+Inf"))} {state[-1]}')
+                lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {state[-2]}')
+                lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {state[-1]}')
+        return lines
+
+
+REQUESTS = Counter('schedo_requests_total', 'Requests handled.', ('view', 'method', 'status'))
+REQUEST_DURATION = Histogram('schedo_request_duration_seconds', 'Request latency.', DURATION_BUCKETS, ('view', 'method'))
+DB_QUERIES = Histogram('schedo_db_queries', 'Database queries per request.', QUERY_COUNT_BUCKETS, ('view',))
+DB_DURATION = Histogram('schedo_db_duration_seconds', 'Database time per request.', DURATION_BUCKETS, ('view',))
+OUTBOUND_DURATION = Histogram('schedo_outbound_duration_seconds', 'Outbound HTTP call latency.', DURATION_BUCKETS, ('service',))
+RESPONSE_SIZE = Histogram('schedo_response_size_bytes', 'Response body size.', SIZE_BUCKETS, ('view',))
+N_PLUS_ONE = Counter('schedo_n_plus_one_total', 'Requests that repeated an identical query shape.', ('view',))
+
+REGISTRY = [REQUESTS, REQUEST_DURATION, DB_QUERIES, DB_DURATION, OUTBOUND_DURATION, RESPONSE_SIZE, N_PLUS_ONE]
+
+
+# Per-request accumulator of outbound HTTP time, keyed by service
+_outbound = contextvars.ContextVar('schedo_outbound', default=None)
+
+
+@contextmanager
+def track_outbound(service):
+    """
+    Time an outbound HTTP call (e.g. 'cloudinary', 'emailjs').
+
+    The duration is recorded in the outbound histogram and added to the
+    current request's totals when called inside a request.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        OUTBOUND_DURATION.observe(elapsed, service)
+        totals = _outbound.get()
+        if totals is not None:
+            totals[service] = totals.get(service, 0.0) + elapsed
+
+
+def start_request():
+    """Begin collecting outbound time for the current request and return the accumulator."""
+    totals = {}
+    return totals, _outbound.set(totals)
+
+
+def end_request(token):
+    _outbound.reset(token)
+
+
+def render_prometheus():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.expose())
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Expose the collected metrics in the Prometheus text format.
+
+    Requires `Authorization: Bearer <METRICS_TOKEN>`. Without a token the
+    endpoint only answers requests from INTERNAL_IPS with DEBUG on: behind a
+    reverse proxy on the same host every request comes from 127.0.0.1.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied, token):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG or request.META.get('REMOTE_ADDR') not in getattr(settings, 'INTERNAL_IPS', []):
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,207 @@
+import gzip
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+import brotli
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from rest_framework.throttling import BaseThrottle
+
+from . import db_router, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecorder:
+    """Database execute wrapper counting queries, their time and repeated query shapes."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            # Parameters are kept out of the SQL, so identical text means an identical query shape
+            self.shapes[sql] += 1
+
+
+class MetricsMiddleware:
+    """
+    Record latency, database queries, outbound HTTP time and response size per view.
+
+    With DEBUG on, also warns about N+1 patterns: the same query shape executed
+    at least N_PLUS_ONE_THRESHOLD times within one request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        outbound, token = metrics.start_request()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        elapsed = time.perf_counter() - started
+
+        view = self._view_label(request)
+        metrics.REQUESTS.inc(view, request.method, str(response.status_code))
+        metrics.REQUEST_DURATION.observe(elapsed, view, request.method)
+        metrics.DB_QUERIES.observe(recorder.count, view)
+        metrics.DB_DURATION.observe(recorder.duration, view)
+        if not response.streaming:
+            metrics.RESPONSE_SIZE.observe(len(response.content), view)
+
+        if settings.DEBUG:
+            response['Server-Timing'] = ', '.join(
+                [f'app;dur={elapsed * 1000:.1f}', f'db;dur={recorder.duration * 1000:.1f}']
+                + [f'{service};dur={seconds * 1000:.1f}' for service, seconds in outbound.items()]
+            )
+            self._detect_n_plus_one(request, view, recorder)
+        return response
+
+    @staticmethod
+    def _view_label(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unmatched'
+        # The route pattern keeps label cardinality bounded (no ids)
+        return match.route or match.view_name
+
+    @staticmethod
+    def _detect_n_plus_one(request, view, recorder):
+        threshold = getattr(settings, 'N_PLUS_ONE_THRESHOLD', 5)
+        repeated = [(sql, count) for sql, count in recorder.shapes.items() if count >= threshold]
+        if not repeated:
+            return
+        metrics.N_PLUS_ONE.inc(view)
+        for sql, count in repeated:
+            logger.warning("Possible N+1 in %s %s: query repeated %s times: %s", request.method, request.path, count, sql)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses of at least COMPRESSION_MIN_BYTES with brotli or gzip,
+    whichever the client accepts (brotli when both are equally welcome).
+
+    Only text and JSON bodies are compressed; streamed responses (e.g. the live
+    attendance stream) and responses that already carry a Content-Encoding are
+    left alone. Levels favour speed, as every body is compressed on the fly.
+    """
+    ENCODINGS = ('br', 'gzip')
+    GZIP_LEVEL = 6
+    BROTLI_QUALITY = 5
+    COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (response.streaming or response.has_header('Content-Encoding')
+                or len(response.content) < getattr(settings, 'COMPRESSION_MIN_BYTES', 1024)
+                or not response.get('Content-Type', '').startswith(self.COMPRESSIBLE_TYPES)):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.choose_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+        response.content = self.compress(response.content, encoding)
+        response['Content-Encoding'] = encoding
+        response['Content-Length'] = str(len(response.content))
+        # The compressed body differs byte for byte, so a strong validator no longer holds
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+    @classmethod
+    def compress(cls, content, encoding):
+        if encoding == 'br':
+            return brotli.compress(content, quality=cls.BROTLI_QUALITY)
+        return gzip.compress(content, compresslevel=cls.GZIP_LEVEL, mtime=0)
+
+    @classmethod
+    def choose_encoding(cls, accept_encoding):
+        """
+        Pick the content coding for an Accept-Encoding header.
+
+        :return: 'br', 'gzip', or None when the client accepts neither
+        """
+        weights = {}
+        for item in accept_encoding.split(','):
+            coding, _, params = item.partition(';')
+            weight = 1.0
+            params = params.strip().lower()
+            if params.startswith('q='):
+                try:
+                    weight = float(params[2:])
+                except ValueError:
+                    weight = 0.0
+            if coding.strip():
+                weights[coding.strip().lower()] = weight
+        wildcard = weights.get('*', 0.0)
+        encoding = max(cls.ENCODINGS, key=lambda name: weights.get(name, wildcard))
+        return encoding if weights.get(encoding, wildcard) > 0 else None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Route the reads of safe requests to a read replica, unless the client wrote
+    within the last REPLICA_PIN_SECONDS (see schedoserver.db_router).
+
+    Clients are told apart by their Authorization header, or by IP when they
+    send none, since token authentication only runs later, inside the view.
+    Tokens issued by login and signup are pinned as they are issued.
+
+    Pins live in the default cache, which must be shared by every worker: a pin
+    kept in one process would not stop the next request, served by another,
+    from reading a stale replica. Startup fails when replicas are configured
+    with a per-process cache.
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if getattr(settings, 'DATABASE_REPLICAS', []) and isinstance(caches['default'], (LocMemCache, DummyCache)):
+            raise ImproperlyConfigured(
+                'DATABASE_REPLICA_URLS needs a cache shared by all workers (set REDIS_URL) to pin clients '
+                'to the primary after their writes'
+            )
+
+    def __call__(self, request):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas:
+            return self.get_response(request)
+
+        client = request.headers.get('Authorization') or BaseThrottle().get_ident(request)
+        safe = request.method in self.SAFE_METHODS
+        read_alias = random.choice(replicas) if safe and not db_router.is_pinned(client) else None
+        state, token = db_router.begin(read_alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            db_router.end(token)
+        if not safe or state.wrote:
+            db_router.pin(client)
+        return response
@@ -0,0 +1,49 @@
+"""
+JSON rendering with orjson.
+
+ORJSONRenderer writes compact UTF-8 JSON like DRF's JSONRenderer, several
+times faster. Types orjson does not encode itself the way DRF does (datetimes,
+dates, times, decimals, timedeltas, querysets, lazy strings) go through DRF's
+own JSONEncoder, so the API's strings, dates and decimals keep their format.
+
+The output is the same value but not always the same bytes:
+
+* floats are written in orjson's shortest form (1e20, where DRF writes 1e+20);
+* NaN and infinities become null, where DRF refuses to render them.
+
+Data orjson cannot encode at all, such as integers beyond 64 bits, is rendered
+by DRF instead.
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_encoder = JSONEncoder()
+# Datetimes are left to DRF's encoder, which writes UTC as 'Z' where orjson writes '+00:00'
+OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(data):
+    """
+    Encode data to compact JSON bytes with orjson.
+
+    :raise orjson.JSONEncodeError: If orjson cannot encode the data (e.g. an integer beyond 64 bits)
+    """
+    # Escaped like DRF does, so the output can be embedded in JavaScript
+    return orjson.dumps(data, default=_encoder.default, option=OPTIONS).replace(
+        b'\xe2\x80\xa8', b'\\u2028'
+    ).replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer encoding with orjson; indented output (?indent) still goes through DRF."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            return dumps(data)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
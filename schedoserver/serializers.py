@@ -0,0 +1,107 @@
+"""
+Read-only list serialization straight from `.values_list()` rows.
+
+A ModelSerializer with many=True builds a model instance per row and runs
+every field through DRF's get_attribute/to_representation machinery. A
+ValuesSerializer mirrors an existing ModelSerializer instead: the field list,
+sources and output names are compiled once per class, the rows are fetched as
+tuples, and only fields whose representation is not the database value itself
+(datetimes, decimals, ...) go through the DRF field. The output is identical
+to `ModelSerializer(queryset, many=True).data`.
+"""
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# Representations that return a non-null database value unchanged
+PASSTHROUGH_REPRESENTATIONS = (
+    serializers.CharField.to_representation,
+    serializers.IntegerField.to_representation,
+    serializers.BooleanField.to_representation,
+)
+
+
+def _passthrough(field):
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        return field.pk_field is None
+    if type(field).to_representation is serializers.ChoiceField.to_representation:
+        # Values are looked up by their string form, so only string keys map to themselves
+        return all(isinstance(key, str) for key in field.choices)
+    return type(field).to_representation in PASSTHROUGH_REPRESENTATIONS
+
+
+def _converter(field):
+    """Return a callable giving the representation of a non-null value of a field."""
+    if (type(field).to_representation is serializers.DateTimeField.to_representation
+            and str(getattr(field, 'format', api_settings.DATETIME_FORMAT)).lower() == ISO_8601):
+        # Resolved once per list instead of once per value
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if field_timezone is not None:
+            def convert(value):
+                if isinstance(value, datetime) and timezone.is_aware(value):
+                    value = value.astimezone(field_timezone).isoformat()
+                    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+                return field.to_representation(value)
+            return convert
+    return field.to_representation
+
+
+class ValuesSerializer:
+    """
+    Serialize a queryset like `model_serializer(queryset, many=True)`, from value rows.
+
+    Subclasses set `model_serializer` to a ModelSerializer whose readable fields
+    are all concrete model fields (no method fields or dotted sources).
+    """
+    model_serializer = None
+    _compiled = None
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    @classmethod
+    def compile(cls):
+        """
+        Resolve the output names and value sources of the serialized fields, and which need converting.
+
+        :return: A (names, sources, fields) tuple, where fields maps column positions to the DRF fields that
+                 convert their values
+        :raises ImproperlyConfigured: If a field cannot be read from a value row
+        """
+        if cls.__dict__.get('_compiled') is None:
+            model = cls.model_serializer.Meta.model
+            names, sources, converted = [], [], {}
+            for name, field in cls.model_serializer().fields.items():
+                if field.write_only:
+                    continue
+                try:
+                    model_field = model._meta.get_field(field.source)
+                except FieldDoesNotExist:
+                    raise ImproperlyConfigured(f'{cls.__name__}: {name} is not a model field')
+                if not model_field.concrete or model_field.many_to_many:
+                    raise ImproperlyConfigured(f'{cls.__name__}: {name} is not a column')
+                if not _passthrough(field):
+                    converted[len(names)] = field
+                names.append(name)
+                sources.append(model_field.attname)
+            cls._compiled = (tuple(names), tuple(sources), converted)
+        return cls._compiled
+
+    @property
+    def data(self):
+        names, sources, converted = self.compile()
+        converters = {position: _converter(field) for position, field in converted.items()}
+        rows = self.queryset.values_list(*sources)
+        if not converters:
+            return [dict(zip(names, row)) for row in rows]
+        data = []
+        for row in rows:
+            row = list(row)
+            for position, convert in converters.items():
+                if row[position] is not None:
+                    row[position] = convert(row[position])
+            data.append(dict(zip(names, row)))
+        return data
@@ -13,11 +13,15 @@ import os
 import sys
 import dj_database_url
 
+from dotenv import load_dotenv
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Read a local .env once, before any setting (variables already in the environment win)
+load_dotenv(os.path.join(BASE_DIR, '.env'))
+
 #todo: Add the apps/ directory to the Python path
 sys.path.insert(0, os.path.join(BASE_DIR, 'apps'))
 
@@ -51,10 +55,16 @@ INSTALLED_APPS = [
     'corsheaders',
     'rest_framework',
     'rest_framework.authtoken',
-    'django_extensions',
 ]
 
+# Development tools (shell_plus, runserver_plus, ...) are kept out of production workers
+if DEBUG:
+    INSTALLED_APPS.append('django_extensions')
+
 MIDDLEWARE = [
+    'schedoserver.middleware.MetricsMiddleware',
+    'schedoserver.middleware.CompressionMiddleware',
+    'schedoserver.middleware.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -69,13 +79,61 @@ MIDDLEWARE = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',  # Use session authentication
-        'rest_framework.authentication.TokenAuthentication',  # Optionally add token authentication
+        'schedoserver.authentication.ExpiringTokenAuthentication',  # Optionally add token authentication
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',  # Enforce authentication globally
     ],
+    # Limits of the public endpoints (see schedoserver/throttling.py)
+    'DEFAULT_THROTTLE_RATES': {
+        'registration_ip': os.environ.get("THROTTLE_REGISTRATION_IP", "30/min"),
+        'registration_event_email': os.environ.get("THROTTLE_REGISTRATION_EVENT_EMAIL", "5/hour"),
+        'registration_event_ip': os.environ.get("THROTTLE_REGISTRATION_EVENT_IP", "20/hour"),
+        'login_ip': os.environ.get("THROTTLE_LOGIN_IP", "20/min"),
+        'login_failure': os.environ.get("THROTTLE_LOGIN_FAILURE", "10/hour"),
+        'signup_ip': os.environ.get("THROTTLE_SIGNUP_IP", "10/hour"),
+        'ticket_ip': os.environ.get("THROTTLE_TICKET_IP", "120/min"),
+    },
+    # Number of reverse proxies in front of the app, so throttles see the real client IP; unset, throttles
+    # ignore X-Forwarded-For, which clients could otherwise forge
+    'NUM_PROXIES': int(os.environ["NUM_PROXIES"]) if os.environ.get("NUM_PROXIES") else None,
+    # orjson-based JSON rendering (see schedoserver/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'schedoserver.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# Responses smaller than this many bytes are sent uncompressed (see CompressionMiddleware)
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+
+# Shared cache for rate limits and rendered QR codes; without REDIS_URL each process has its own
+REDIS_URL = os.environ.get("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+        'idempotency': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        # Idempotency keys must be seen by every worker, so without Redis they live in a
+        # database table, which `migrate` creates
+        'idempotency': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'idempotency_keys',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        },
+    }
+
 #TODO: setup session cookie
 SESSION_COOKIE_AGE = 1209600  # 2 weeks in seconds
 SESSION_SAVE_EVERY_REQUEST = True
@@ -129,6 +187,19 @@ database_url = os.environ.get("DATABASE_URL")
 
 DATABASES["default"] = dj_database_url.parse(database_url)
 
+# Read replicas (space separated URLs), added as replica_1, replica_2, ...
+# Tests mirror them to the test copy of the primary. Replicas need REDIS_URL, so that every
+# worker sees which clients are pinned to the primary (see ReplicaRoutingMiddleware)
+DATABASE_REPLICAS = []
+for replica_url in os.environ.get("DATABASE_REPLICA_URLS", "").split():
+    DATABASE_REPLICAS.append(f"replica_{len(DATABASE_REPLICAS) + 1}")
+    DATABASES[DATABASE_REPLICAS[-1]] = dict(dj_database_url.parse(replica_url), TEST={"MIRROR": "default"})
+
+DATABASE_ROUTERS = ["schedoserver.db_router.ReplicaRouter"]
+
+# Seconds a client reads from the primary after writing, so it sees its own writes
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", "5"))
+
 
 
 # Password validation
@@ -181,3 +252,50 @@ AUTHENTICATION_BACKENDS = [
 AUTH_USER_MODEL = 'accounts.User'  #TODO: Custom User model name
 
 
+# Serve unfiltered public facet counts from the incrementally maintained EventFacetCount table
+EVENT_FACET_COUNTS_TABLE = os.environ.get("EVENT_FACET_COUNTS_TABLE", "False").lower() == "true"
+
+# Days the event change log is kept; sync cursors older than this get a reset
+EVENT_CHANGES_RETENTION_DAYS = int(os.environ.get("EVENT_CHANGES_RETENTION_DAYS", "30"))
+
+# Backend relaying live attendance updates between processes
+# (apps.registrations.live.InProcessBackend or apps.registrations.live.PostgresNotifyBackend)
+LIVE_BROADCAST_BACKEND = os.environ.get("LIVE_BROADCAST_BACKEND", "apps.registrations.live.InProcessBackend")
+
+# Internal metrics endpoint (Prometheus text format), scraped with the token; without one only INTERNAL_IPS
+# may scrape it, and only with DEBUG on
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+INTERNAL_IPS = os.environ.get("INTERNAL_IPS", "127.0.0.1").split(" ")
+
+# Dev-mode N+1 detector: warn when one query shape repeats this many times in a request
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("N_PLUS_ONE_THRESHOLD", "5"))
+
+# Issue HMAC-signed ticket codes that scanners can verify without a database lookup
+SIGNED_TICKETS = os.environ.get("SIGNED_TICKETS", "False").lower() == "true"
+# Signing keys as "id:secret,id:secret" (ids 0-255); defaults to a key derived from SECRET_KEY
+TICKET_SIGNING_KEYS = dict(
+    item.split(":", 1) for item in os.environ.get("TICKET_SIGNING_KEYS", "").split(",") if item
+)
+TICKET_SIGNING_KEY_ID = os.environ.get("TICKET_SIGNING_KEY_ID")
+
+# Local storage for generated badge documents
+BADGE_ROOT = os.environ.get("BADGE_ROOT", os.path.join(BASE_DIR, "badges"))
+
+# Organizer broadcasts: concurrent sends, and messages per second across them (0 for no limit)
+BROADCAST_WORKERS = int(os.environ.get("BROADCAST_WORKERS", "8"))
+BROADCAST_RATE = float(os.environ.get("BROADCAST_RATE", "10"))
+
+# Where tier_registrations --mode export writes cold attendee and ticket partitions
+COLD_STORAGE_ROOT = os.environ.get("COLD_STORAGE_ROOT", os.path.join(BASE_DIR, "cold_storage"))
+
+# API tokens are valid for this many seconds after login or signup (0 never expires);
+# purge_expired_auth deletes expired tokens and sessions
+TOKEN_TTL = int(os.environ.get("TOKEN_TTL", str(30 * 24 * 3600)))
+
+# Responses to requests with an Idempotency-Key are replayed to retries for this many seconds
+IDEMPOTENCY_TTL = int(os.environ.get("IDEMPOTENCY_TTL", "86400"))
+# How long a duplicate waits for the in-flight original before giving up with 409
+IDEMPOTENCY_WAIT_SECONDS = int(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", "10"))
+# How long the first request holds its key; keep it well above the worker timeout, so no request
+# still running loses its claim to a retry
+IDEMPOTENCY_CLAIM_SECONDS = int(os.environ.get("IDEMPOTENCY_CLAIM_SECONDS", "300"))
@@ -0,0 +1,168 @@
+import gzip
+import json
+import math
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import brotli
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from rest_framework.renderers import JSONRenderer
+
+from apps.accounts.models import User
+from . import metrics
+from .middleware import CompressionMiddleware, MetricsMiddleware
+from .renderers import ORJSONRenderer
+
+
+class IdempotencyCacheTests(TestCase):
+    def test_migrate_creates_the_database_cache_table(self):
+        cache = caches['idempotency']
+        if not isinstance(cache, DatabaseCache):
+            self.skipTest('Idempotency keys are kept in Redis')
+        self.assertIn(cache._table, connection.introspection.table_names())
+        self.assertTrue(cache.add('key', 'claimed'))
+
+
+class MetricsViewTests(SimpleTestCase):
+    def scrape(self, **extra):
+        return self.client.get('/metrics/', REMOTE_ADDR='127.0.0.1', **extra)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_scrapes_need_the_token(self):
+        self.assertEqual(self.scrape().status_code, 403)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.scrape(HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE schedo_requests_total counter', response.content.decode())
+
+    @override_settings(METRICS_TOKEN='', INTERNAL_IPS=['127.0.0.1'], DEBUG=False)
+    def test_without_a_token_a_local_proxy_gets_nothing_in_production(self):
+        # Behind a reverse proxy on the same host, every request comes from 127.0.0.1
+        self.assertEqual(self.scrape().status_code, 403)
+
+    @override_settings(METRICS_TOKEN='', INTERNAL_IPS=['127.0.0.1'], DEBUG=True)
+    def test_without_a_token_internal_ips_scrape_in_development(self):
+        self.assertEqual(self.scrape().status_code, 200)
+        self.assertEqual(self.client.get('/metrics/', REMOTE_ADDR='203.0.113.9').status_code, 403)
+
+
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/events/public/')
+
+    def handle(self, view):
+        return MetricsMiddleware(view)(self.request)
+
+    def test_requests_are_counted_per_view(self):
+        counted = metrics.REQUESTS._values.get(('unmatched', 'GET', '200'), 0)
+        sizes = metrics.RESPONSE_SIZE._values.get(('unmatched',), [0])[-1]
+        self.handle(lambda request: HttpResponse('hello'))
+        self.assertEqual(metrics.REQUESTS._values[('unmatched', 'GET', '200')], counted + 1)
+        self.assertEqual(metrics.RESPONSE_SIZE._values[('unmatched',)][-1], sizes + 1)
+
+    def test_database_queries_are_recorded(self):
+        queries = metrics.DB_QUERIES._values.get(('unmatched',), [0, 0])[-2]
+
+        def view(request):
+            list(User.objects.all())
+            list(User.objects.filter(email='a@example.com'))
+            return HttpResponse()
+
+        self.handle(view)
+        self.assertEqual(metrics.DB_QUERIES._values[('unmatched',)][-2], queries + 2)
+
+    @override_settings(DEBUG=True, N_PLUS_ONE_THRESHOLD=3)
+    def test_repeated_query_shapes_are_reported_in_debug(self):
+        reported = metrics.N_PLUS_ONE._values.get(('unmatched',), 0)
+
+        def view(request):
+            for number in range(3):
+                User.objects.filter(pk=number).first()
+            return HttpResponse()
+
+        with self.assertLogs('schedoserver.middleware', 'WARNING') as logs:
+            response = self.handle(view)
+        self.assertIn('query repeated 3 times', logs.output[0])
+        self.assertEqual(metrics.N_PLUS_ONE._values[('unmatched',)], reported + 1)
+        self.assertTrue(response['Server-Timing'].startswith('app;dur='))
+
+    @override_settings(DEBUG=True, N_PLUS_ONE_THRESHOLD=3)
+    def test_distinct_queries_are_not_reported(self):
+        def view(request):
+            User.objects.filter(pk=1).first()
+            User.objects.filter(email='a@example.com').first()
+            User.objects.count()
+            return HttpResponse()
+
+        with self.assertNoLogs('schedoserver.middleware', 'WARNING'):
+            self.handle(view)
+
+
+class RendererTests(SimpleTestCase):
+    def assertRendersLikeDRF(self, data):
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_api_types_render_like_drf(self):
+        self.assertRendersLikeDRF({
+            'title': 'Café \u2028 launch', 'seats': 10, 'price': Decimal('12.50'), 'ratio': 0.5, 'online': None,
+            'starts': datetime(2030, 1, 1, 10, tzinfo=timezone.utc), 'tags': ('tech', 'ai'), 1: 'numeric key',
+        })
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_integers_beyond_64_bits_fall_back_to_drf(self):
+        self.assertRendersLikeDRF({'id': 2 ** 70})
+
+    def test_floats_keep_their_value(self):
+        rendered = ORJSONRenderer().render({'big': 1e20, 'small': 1e-7})
+        self.assertEqual(json.loads(rendered), {'big': 1e20, 'small': 1e-7})
+        self.assertEqual(ORJSONRenderer().render({'nan': math.nan}), b'{"nan":null}')
+
+    def test_indented_output_goes_through_drf(self):
+        rendered = ORJSONRenderer().render({'a': [1]}, 'application/json; indent=2', {})
+        self.assertEqual(rendered, b'{\n  "a": [\n    1\n  ]\n}')
+
+
+@override_settings(COMPRESSION_MIN_BYTES=100)
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = json.dumps({'events': ['Workshop'] * 50}).encode()
+
+    def respond(self, accept_encoding, response=None):
+        request = RequestFactory().get('/events/public/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        response = response or HttpResponse(self.body, content_type='application/json')
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_brotli_is_preferred_and_gzip_is_the_fallback(self):
+        response = self.respond('gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), self.body)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+        response = self.respond('gzip;q=1.0, br;q=0.5')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+    def test_choice_of_encoding(self):
+        self.assertEqual(CompressionMiddleware.choose_encoding('*'), 'br')
+        self.assertEqual(CompressionMiddleware.choose_encoding('br;q=0, *;q=0.5'), 'gzip')
+        self.assertIsNone(CompressionMiddleware.choose_encoding('identity'))
+        self.assertIsNone(CompressionMiddleware.choose_encoding('gzip;q=0, br;q=bad'))
+
+    def test_strong_etags_are_weakened(self):
+        response = HttpResponse(self.body, content_type='application/json')
+        response['ETag'] = '"v1"'
+        self.assertEqual(self.respond('gzip', response)['ETag'], 'W/"v1"')
+
+    def test_bodies_left_alone(self):
+        small = HttpResponse(b'{}', content_type='application/json')
+        self.assertNotIn('Content-Encoding', self.respond('br', small))
+        image = HttpResponse(b'\x89PNG' * 100, content_type='image/png')
+        self.assertNotIn('Content-Encoding', self.respond('br', image))
+        stream = StreamingHttpResponse(iter([self.body]), content_type='text/event-stream')
+        self.assertNotIn('Content-Encoding', self.respond('br', stream))
+        self.assertNotIn('Content-Encoding', self.respond('identity'))
@@ -0,0 +1,196 @@
+"""
+Rate limiting for the public endpoints.
+
+Limits use a sliding window approximated from two fixed-window counters (the
+current and the previous window, weighted by how much of the previous window
+still overlaps). Counters live in the configured cache and are bumped with
+atomic increments, so with a shared cache (REDIS_URL) limits hold across all
+gunicorn workers; without one each process enforces them on its own.
+Refused requests are taken back out of the count, so a client that keeps
+retrying gets in again as soon as its rate drops below the limit.
+
+Each class limits on one key (client IP, submitted email, the event registered
+for) and reads its rate ("<count>/<s|m|h|d>") from
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] under its scope, so a view combines
+several classes to limit on several keys.
+
+The client IP is REMOTE_ADDR. X-Forwarded-For is only trusted when
+REST_FRAMEWORK['NUM_PROXIES'] says how many proxies in front of the app
+append to it; otherwise any client could send a new value with every request
+and get a fresh limit each time.
+
+Failure throttles only count what the view reports through `record_failure`
+(e.g. wrong passwords), so requests that succeed never use up the limit.
+"""
+import hashlib
+import time
+
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """Parse a rate such as '30/min' into (requests, window seconds)."""
+    count, period = rate.split('/')
+    return int(count), DURATIONS[period[0]]
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """Base class: subclasses set `scope` and implement `get_key`."""
+    scope = None
+    cache_alias = 'default'
+    timer = time.time
+    # Whether every allowed request counts; failure throttles count in record_failure instead
+    count_requests = True
+
+    def __init__(self):
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        self.limit, self.window = parse_rate(rate) if rate else (None, None)
+        self.wait_seconds = None
+
+    def get_key(self, request, view):
+        """Return the value to limit on, or None to skip throttling for this request."""
+        raise NotImplementedError
+
+    def get_ident(self, request):
+        if api_settings.NUM_PROXIES is None:
+            return request.META.get('REMOTE_ADDR', '')
+        return super().get_ident(request)
+
+    def _windows(self, key):
+        """Return the counter keys of the current and previous window, and how far the current one has run."""
+        now = self.timer()
+        current_window = int(now // self.window)
+        prefix = f'throttle:{self.scope}:{key}:'
+        return prefix + str(current_window), prefix + str(current_window - 1), now / self.window - current_window
+
+    def _increment(self, cache, counter_key):
+        try:
+            return cache.incr(counter_key)
+        except ValueError:
+            # First hit in this window; add() keeps a concurrent creator's count
+            if cache.add(counter_key, 1, self.window * 2):
+                return 1
+            return cache.incr(counter_key)
+
+    def allow_request(self, request, view):
+        if self.limit is None:
+            return True
+        key = self.get_key(request, view)
+        if key is None:
+            return True
+
+        cache = caches[self.cache_alias]
+        current_key, previous_key, elapsed = self._windows(key)
+        if self.count_requests:
+            count = self._increment(cache, current_key)
+        else:
+            # Would this request be one failure too many
+            count = cache.get(current_key, 0) + 1
+        previous = cache.get(previous_key, 0)
+
+        if previous * (1 - elapsed) + count <= self.limit:
+            return True
+        if self.count_requests:
+            cache.decr(current_key)
+        self.wait_seconds = (1 - elapsed) * self.window
+        return False
+
+    def record_failure(self, request, view=None):
+        """Count a failed request against the limit of a failure throttle."""
+        key = self.get_key(request, view) if self.limit is not None else None
+        if key is not None:
+            self._increment(caches[self.cache_alias], self._windows(key)[0])
+
+    def wait(self):
+        return self.wait_seconds
+
+
+def _hashed(value):
+    # Keeps raw emails out of cache keys and bounds the key length
+    return hashlib.blake2b(value.encode(), digest_size=12).hexdigest()
+
+
+def _submitted_email(request):
+    email = request.data.get('email')
+    if not isinstance(email, str) or not email.strip():
+        return None
+    return email.strip().lower()
+
+
+def _submitted_event(request):
+    event = request.data.get('event')
+    if not isinstance(event, (str, int)) or not str(event).strip():
+        return None
+    return str(event).strip()
+
+
+class IPThrottle(SlidingWindowThrottle):
+    """Limit on the client IP (honours REST_FRAMEWORK['NUM_PROXIES'] behind a proxy)."""
+
+    def get_key(self, request, view):
+        return self.get_ident(request)
+
+
+class EmailIPThrottle(SlidingWindowThrottle):
+    """Limit on the email address submitted in the request body together with the client IP."""
+
+    def get_key(self, request, view):
+        email = _submitted_email(request)
+        if email is None:
+            return None
+        return _hashed(f'{email} {self.get_ident(request)}')
+
+
+class EventEmailThrottle(SlidingWindowThrottle):
+    """Limit on the event submitted in the request body together with the submitted email address."""
+
+    def get_key(self, request, view):
+        event, email = _submitted_event(request), _submitted_email(request)
+        if event is None or email is None:
+            return None
+        return _hashed(f'{event} {email}')
+
+
+class EventIPThrottle(SlidingWindowThrottle):
+    """Limit on the event submitted in the request body together with the client IP."""
+
+    def get_key(self, request, view):
+        event = _submitted_event(request)
+        if event is None:
+            return None
+        return _hashed(f'{event} {self.get_ident(request)}')
+
+
+class RegistrationIPThrottle(IPThrottle):
+    scope = 'registration_ip'
+
+
+class RegistrationEventEmailThrottle(EventEmailThrottle):
+    """Registrations of one email address for one event; other events are not held back."""
+    scope = 'registration_event_email'
+
+
+class RegistrationEventIPThrottle(EventIPThrottle):
+    scope = 'registration_event_ip'
+
+
+class LoginIPThrottle(IPThrottle):
+    scope = 'login_ip'
+
+
+class LoginFailureThrottle(EmailIPThrottle):
+    """Failed logins per account and client, so others cannot lock the owner out of an account."""
+    scope = 'login_failure'
+    count_requests = False
+
+
+class SignupIPThrottle(IPThrottle):
+    scope = 'signup_ip'
+
+
+class TicketIPThrottle(IPThrottle):
+    scope = 'ticket_ip'
@@ -19,6 +19,7 @@ from django.urls import path, include
 from django.views.decorators.csrf import csrf_exempt
 from django.middleware.csrf import get_token
 from django.http import HttpResponse, JsonResponse
+from .metrics import metrics_view
 
 
 # Create a simple view that returns the CSRF token as JSON
@@ -34,9 +35,10 @@ def hello_world(request):
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('get-csrf-token/', get_csrf_token),
+    path('metrics/', metrics_view),
     path('accounts/', include('apps.accounts.urls')),
     path('events/', include('apps.events.urls')),
     path('registrations/', include('apps.registrations.urls')),
-    # path('notifications/', include('apps.notifications.urls')),
+    path('notifications/', include('apps.notifications.urls')),
     path('', hello_world),
 ]